@@ -0,0 +1,319 @@
+import json
+import os
+from datetime import date
+import pandas as pd
+from flask import request, jsonify
+from db import connect_first
+from cache import backend, CACHE_TTL
+
+# Time-bucketed body measurement and training volume series.
+#
+# MySQL does the first pass: one row per (athlete, bucket) with the
+# measurement averages and the training volume, sessions and RPE of that
+# bucket, so years of daily rows never leave the database. pandas then
+# combines the athletes of a cohort (mean per bucket across athletes) and
+# adds rolling averages over the last ?window buckets and the change since
+# the previous bucket, all as whole-column operations.
+#
+# Query parameters: bucket=week|month|<N>d (default week), start and end
+# (YYYY-MM-DD) and window (buckets, default ANALYTICS_WINDOW). Custom "Nd"
+# buckets are counted from start, or from ANALYTICS_ORIGIN without it.
+#
+# Cohort ranks: one grouped query returns the volume, adherence and RPE of
+# every athlete in a sports branch or program, pandas ranks them all at
+# once and the ranked snapshot is cached per cohort (GYM_CACHE_TTL), so
+# looking up the other athletes of that cohort costs no queries.
+
+ANALYTICS_WINDOW = int(os.environ.get("GYM_ANALYTICS_WINDOW", 4))
+ANALYTICS_MAX_WINDOW = 52
+ANALYTICS_ORIGIN = date(1970, 1, 5)  # a Monday, so "7d" buckets line up with weeks
+
+MEASUREMENT_METRICS = ["weight", "body_fat_percentage", "muscle_mass", "bmi"]
+VOLUME_METRICS = ["volume", "sessions", "avg_rpe"]
+COHORT_METRICS = ["volume", "adherence", "avg_rpe"]
+COHORT_QUANTILES = [0.25, 0.5, 0.75, 0.9]
+
+# cohort kind -> (join on the athlete column of the row source, condition,
+# condition keeping rows of sources that belong to a program to the cohort's
+# program, or None)
+COHORTS = {
+    "sports_branch": ("JOIN Athlete c ON c.athlete_id = {athlete}", "c.sports_branch = %s", None),
+    "program_id": ("JOIN ProgramEnrollment c ON c.athlete_id = {athlete}", "c.program_id = %s",
+                   "{program} = c.program_id"),
+}
+
+MEASUREMENT_BUCKETS_SQL = """
+    SELECT
+        bm.athlete_id,
+        {bucket} AS bucket,
+        AVG(bm.weight) AS weight,
+        AVG(bm.body_fat_percentage) AS body_fat_percentage,
+        AVG(bm.muscle_mass) AS muscle_mass,
+        AVG(bm.bmi) AS bmi
+    FROM BodyMeasurement bm
+    {join}
+    WHERE {where}
+    GROUP BY bm.athlete_id, bucket
+"""
+
+VOLUME_BUCKETS_SQL = """
+    SELECT
+        v.athlete_id,
+        {bucket} AS bucket,
+        SUM(v.completed_sets * v.completed_reps * v.weight_used) AS volume,
+        COUNT(DISTINCT v.session_id) AS sessions,
+        AVG(v.perceived_exertion) AS avg_rpe
+    FROM v_log_enriched v
+    {join}
+    WHERE {where}
+    GROUP BY v.athlete_id, bucket
+"""
+
+# one row per athlete of the cohort, joined to the volume and the
+# adherence (% of planned sets done) and RPE totals, each grouped per
+# athlete of the cohort in one pass
+COHORT_STATS_SQL = """
+    SELECT
+        a.athlete_id,
+        COALESCE(vol.volume, 0) AS volume,
+        100 * adh.completed_sets / NULLIF(adh.planned_sets, 0) AS adherence,
+        adh.rpe_total / NULLIF(adh.rpe_count, 0) AS avg_rpe
+    FROM Athlete a
+    {join}
+    LEFT JOIN ({volume}) vol ON vol.athlete_id = a.athlete_id
+    LEFT JOIN (
+        SELECT
+            sa.athlete_id,
+            SUM(sa.completed_sets) AS completed_sets,
+            SUM(sa.planned_sets) AS planned_sets,
+            SUM(sa.rpe_total) AS rpe_total,
+            SUM(sa.rpe_count) AS rpe_count
+        FROM SessionAdherence sa
+        {adherence_join}
+        WHERE {adherence_where}
+        GROUP BY sa.athlete_id
+    ) adh ON adh.athlete_id = a.athlete_id
+    WHERE {where}
+"""
+
+# volume of every athlete from the per-exercise summary, or, for cohorts
+# scoped to a program, from the logs of that program's sessions
+COHORT_SUMMARY_VOLUME_SQL = """
+        SELECT aes.athlete_id, SUM(aes.total_volume) AS volume
+        FROM AthleteExerciseSummary aes
+        {join}
+        WHERE {where}
+        GROUP BY aes.athlete_id
+"""
+
+COHORT_LOG_VOLUME_SQL = """
+        SELECT v.athlete_id, SUM(v.completed_sets * v.completed_reps * v.weight_used) AS volume
+        FROM v_log_enriched v
+        {join}
+        WHERE {where}
+        GROUP BY v.athlete_id
+"""
+
+class AnalyticsError(ValueError):
+    pass
+
+def parse_date(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise AnalyticsError(f"{name} must be a date (YYYY-MM-DD)")
+
+def analytics_args():
+    start, end = parse_date("start"), parse_date("end")
+    if start and end and start > end:
+        raise AnalyticsError("start must not be after end")
+
+    bucket = request.args.get("bucket", "week")
+    if bucket not in ("week", "month"):
+        days = bucket[:-1]
+        if not (bucket.endswith("d") and days.isdigit() and 1 <= int(days) <= 366):
+            raise AnalyticsError("bucket must be week, month or a number of days such as 14d")
+
+    window = request.args.get("window", str(ANALYTICS_WINDOW))
+    if not window.isdigit() or not 1 <= int(window) <= ANALYTICS_MAX_WINDOW:
+        raise AnalyticsError(f"window must be between 1 and {ANALYTICS_MAX_WINDOW}")
+    return bucket, start, end, int(window)
+
+def bucket_sql(column, bucket, origin):
+    # first day of the bucket containing column
+    if bucket == "week":
+        return f"DATE_SUB({column}, INTERVAL WEEKDAY({column}) DAY)"
+    if bucket == "month":
+        return f"DATE_SUB({column}, INTERVAL DAYOFMONTH({column}) - 1 DAY)"
+    days = int(bucket[:-1])
+    return f"DATE_ADD('{origin.isoformat()}', INTERVAL FLOOR(DATEDIFF({column}, '{origin.isoformat()}') / {days}) * {days} DAY)"
+
+def cohort_filter(cohort, alias, program_column=None):
+    # (join, conditions, params) keeping the rows of one source to a cohort;
+    # program_column: the source's program column, if its rows belong to a program
+    kind, value = cohort
+    join_sql, condition, scope = COHORTS[kind]
+    conditions = [condition]
+    if scope and program_column:
+        conditions.append(scope.format(program=f"{alias}.{program_column}"))
+    return join_sql.format(athlete=f"{alias}.athlete_id"), conditions, [value]
+
+def bucket_rows(cursor, sql, alias, date_column, bucket, start, end, athlete_id=None, cohort=None,
+                program_column=None):
+    # (athlete, bucket) rows of one source as a DataFrame
+    conditions, params, join = [], [], ""
+    if athlete_id is not None:
+        conditions.append(f"{alias}.athlete_id = %s")
+        params.append(athlete_id)
+    if cohort is not None:
+        join, cohort_conditions, cohort_params = cohort_filter(cohort, alias, program_column)
+        conditions += cohort_conditions
+        params += cohort_params
+    if start:
+        conditions.append(f"{alias}.{date_column} >= %s")
+        params.append(start)
+    if end:
+        conditions.append(f"{alias}.{date_column} <= %s")
+        params.append(end)
+
+    column = f"{alias}.{date_column}"
+    cursor.execute(sql.format(bucket=bucket_sql(column, bucket, start or ANALYTICS_ORIGIN),
+                              join=join, where=" AND ".join(conditions)), params)
+    return pd.DataFrame(cursor.fetchall())
+
+def combine(measurements, volume, window, cohort):
+    # one row per bucket: cohort means (or the athlete's own values), rolling
+    # means over the last window buckets and the change since the previous one
+    sources = [(f, m) for f, m in ((measurements, MEASUREMENT_METRICS), (volume, VOLUME_METRICS)) if not f.empty]
+    if not sources:
+        return []
+    frames = []
+    for frame, metrics in sources:
+        frame[metrics] = frame[metrics].astype(float)
+        frame["bucket"] = pd.to_datetime(frame["bucket"])
+        frames.append(frame.groupby("bucket")[metrics].mean())
+    if cohort:
+        pairs = pd.concat([frame[["bucket", "athlete_id"]] for frame, _ in sources])
+        frames.append(pairs.groupby("bucket")["athlete_id"].nunique().rename("athletes"))
+
+    metrics = MEASUREMENT_METRICS + VOLUME_METRICS
+    table = pd.concat(frames, axis=1).sort_index().reindex(columns=metrics + (["athletes"] if cohort else []))
+    rolling = table[metrics].rolling(window, min_periods=1).mean().add_suffix("_rolling")
+    delta = table[metrics].diff().add_suffix("_delta")
+    table = pd.concat([table, rolling, delta], axis=1).round(2)
+    if cohort:
+        table["athletes"] = table["athletes"].astype("Int64")
+
+    table.index = table.index.strftime("%Y-%m-%d")
+    table = table.rename_axis("bucket").reset_index()
+    return table.astype(object).where(table.notna(), None).to_dict("records")
+
+@connect_first
+def bucketed_analytics(cursor, athlete_id=None, cohort=False):
+    # cohort: read the cohort from the query string instead of one athlete
+    try:
+        bucket, start, end, window = analytics_args()
+        cohort = cohort_arg() if cohort else None
+    except AnalyticsError as e:
+        return jsonify({"error": str(e)}), 400
+
+    measurements = bucket_rows(cursor, MEASUREMENT_BUCKETS_SQL, "bm", "measurement_date",
+                               bucket, start, end, athlete_id, cohort)
+    volume = bucket_rows(cursor, VOLUME_BUCKETS_SQL, "v", "session_date",
+                         bucket, start, end, athlete_id, cohort, "program_id")
+    rows = combine(measurements, volume, window, cohort is not None)
+    return jsonify({"bucket": bucket, "window": window, "rows": rows}), 200
+
+def cohort_arg():
+    # (kind, value) from ?sports_branch= or ?program_id=
+    given = [kind for kind in COHORTS if request.args.get(kind)]
+    if len(given) != 1:
+        raise AnalyticsError("Give exactly one of: " + ", ".join(COHORTS))
+    kind = given[0]
+    value = request.args[kind]
+    if kind == "program_id":
+        if not value.isdigit():
+            raise AnalyticsError("program_id must be an integer")
+        value = int(value)
+    return kind, value
+
+def records(frame):
+    # NaN -> None for JSON
+    return frame.astype(object).where(frame.notna(), None)
+
+def rank_cohort(rows):
+    # ranks (1 = highest) and percentiles (share of the cohort at or below)
+    # of every athlete, plus the cohort quantiles, in whole-column operations
+    if not rows:
+        return {"athletes": 0, "quantiles": {}, "members": {}}
+    values = pd.DataFrame(rows).set_index("athlete_id")[COHORT_METRICS].astype(float)
+    ranks = values.rank(ascending=False, method="min").astype("Int64").add_suffix("_rank")
+    percentiles = (values.rank(pct=True, method="max") * 100).add_suffix("_percentile")
+    members = pd.concat([values, ranks, percentiles], axis=1).round(2)
+    members.index = members.index.astype(str)
+
+    quantiles = values.quantile(COHORT_QUANTILES).round(2)
+    quantiles.index = [f"p{round(q * 100)}" for q in COHORT_QUANTILES]
+    quantiles = quantiles.unstack()
+    quantiles.index = [f"{metric}_{q}" for metric, q in quantiles.index]
+    return {
+        "athletes": len(values),
+        "quantiles": records(quantiles).to_dict(),
+        "members": records(members).to_dict("index")
+    }
+
+@connect_first
+def load_cohort(cursor, cohort):
+    # the volume and adherence are filtered to the cohort before grouping,
+    # so the tables are read once for the cohort's athletes only
+    if COHORTS[cohort[0]][2] is not None:
+        volume_sql, volume_alias = COHORT_LOG_VOLUME_SQL, "v"
+    else:
+        volume_sql, volume_alias = COHORT_SUMMARY_VOLUME_SQL, "aes"
+    volume_join, volume_where, volume_params = cohort_filter(cohort, volume_alias, "program_id")
+    adherence_join, adherence_where, adherence_params = cohort_filter(cohort, "sa", "program_id")
+    join, where, params = cohort_filter(cohort, "a")
+    sql = COHORT_STATS_SQL.format(
+        join=join, where=" AND ".join(where),
+        volume=volume_sql.format(join=volume_join, where=" AND ".join(volume_where)),
+        adherence_join=adherence_join, adherence_where=" AND ".join(adherence_where))
+    cursor.execute(sql, volume_params + adherence_params + params)
+    return rank_cohort(cursor.fetchall())
+
+def cohort_snapshot(cohort, refresh=False):
+    # (snapshot, from_cache)
+    key = "cohort_snapshot|{}={}".format(*cohort)
+    if not refresh:
+        value = backend.get(key)
+        if value is not None:
+            return json.loads(value), True
+    snapshot = load_cohort(cohort)
+    backend.set(key, json.dumps(snapshot).encode("utf-8"), ["cohorts"], CACHE_TTL)
+    return snapshot, False
+
+def cohort_rank(athlete_id):
+    try:
+        cohort = cohort_arg()
+    except AnalyticsError as e:
+        return jsonify({"error": str(e)}), 400
+
+    snapshot, from_cache = cohort_snapshot(cohort)
+    member = snapshot["members"].get(str(athlete_id))
+    if member is None and from_cache:
+        # joined the cohort after the snapshot was taken
+        snapshot, _ = cohort_snapshot(cohort, refresh=True)
+        member = snapshot["members"].get(str(athlete_id))
+    if member is None:
+        return jsonify({"error": "Athlete is not in this cohort"}), 404
+
+    kind, value = cohort
+    return jsonify({
+        "athlete_id": athlete_id,
+        "cohort": {kind: value},
+        "athletes": snapshot["athletes"],
+        "athlete": member,
+        "quantiles": snapshot["quantiles"]
+    }), 200
@@ -1,8 +1,16 @@
 from flask import Flask
 from flask_cors import CORS
+from db import get_pool
+from profiling import init_app
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor", "Server-Timing"])
+
+# SQL timings per route: /metrics, Server-Timing and the slow query log
+init_app(app)
+
+# read the database credentials once and set up the shared connection pool
+get_pool()
 
 # register routes (imports must happen after app creation)
 import routes  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+import aiomysql
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from app import app as flask_app
+from cache import CACHE_MAX_BYTES, backend, decode_entry, encode_entry, entry_key, make_request_key
+from db import POOL_RECYCLE, load_credentials
+from tokens import check_access
+from versions import make_etag, versions_query
+from routes import (
+    MEASUREMENTS_SQL, MEDICAL_ASSESSMENTS_SQL, LAST_TRAINING_SQL, SESSION_ADHERENCE_SQL,
+    TOP_THREE_EXERCISES_SQL, ENROLLED_PROGRAMS_SQL, TRAINER_PROGRAMS_SQL,
+    TRAINER_ATHLETES_SQL, TRAINER_ADHERENCE_SQL, LEADERBOARD_SQL
+)
+
+# ASGI entry point. The hot read endpoints run as coroutines on an aiomysql
+# pool, so many concurrent dashboard requests share a few OS threads.
+# Everything else (writes, auth, and reads that use pagination or streaming
+# formats) is handed to the regular Flask app.
+#
+# The async reads apply the @conditional and @cached settings of the Flask
+# view serving the same URL, with the same ETags and cache entries, so the
+# two paths answer If-None-Match and share cached bodies alike.
+#
+# Serve with: python serve.py --mode async
+
+ASYNC_POOL_SIZE = int(os.environ.get("GYM_ASYNC_POOL_SIZE", 20))
+
+pool = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global pool
+    credentials = load_credentials()
+    pool = await aiomysql.create_pool(
+        host=credentials["host"],
+        user=credentials["user"],
+        password=credentials["password"],
+        db=credentials["database"],
+        minsize=1,
+        maxsize=ASYNC_POOL_SIZE,
+        pool_recycle=int(POOL_RECYCLE),
+        autocommit=True
+    )
+    try:
+        yield
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+async def fetch_all(sql, params):
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+wsgi_app = WsgiToAsgi(flask_app)
+url_adapter = flask_app.url_map.bind("localhost")
+
+def header(scope, name):
+    return dict(scope["headers"]).get(name, b"").decode("latin-1")
+
+def best_accept(scope):
+    return parse_accept_header(header(scope, b"accept"), MIMEAccept).best or ""
+
+async def read_response(scope, load):
+    # versions.conditional and cache.cached of the matching Flask view, then
+    # load() for the payload of a fresh response
+    endpoint, view_args = url_adapter.match(scope["path"], method="GET")
+    view = flask_app.view_functions[endpoint]
+    key = make_request_key(endpoint, view_args, "", best_accept(scope))
+
+    etag, headers = "", {}
+    version_tags = getattr(view, "version_tags", None)
+    if version_tags is not None:
+        sql, tags = versions_query(version_tags(**view_args))
+        etag = make_etag(key, tags, await fetch_all(sql, tags))
+        headers["ETag"] = quote_etag(etag)
+        if parse_etags(header(scope, b"if-none-match")).contains(etag):
+            return Response(status_code=304, headers=headers)
+
+    cache_tags = getattr(view, "cache_tags", None)
+    if cache_tags is not None:
+        value = backend.get(entry_key(key, etag))
+        if value is not None:
+            mimetype, body = decode_entry(value)
+            return Response(body, media_type=mimetype, headers=headers)
+
+    body = flask_app.json.dumps(await load()).encode("utf-8")
+    if cache_tags is not None and len(body) <= CACHE_MAX_BYTES:
+        backend.set(entry_key(key, etag), encode_entry("application/json", body),
+                    cache_tags(**view_args), view.cache_ttl)
+    return Response(body, media_type="application/json", headers=headers)
+
+# roles allowed per URL argument, matching the requires() rules in routes.py;
+# athletes and trainers may only pass their own id
+READERS = {
+    "athlete_id": ("athlete", "trainer", "medical"),
+    "trainer_id": ("trainer",)
+}
+
+def access_error(scope, param):
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    _, error = check_access(authorization, READERS[param], param, scope["path_params"])
+    if error is None:
+        return None
+    status, message = error
+    headers = {"WWW-Authenticate": "Bearer"} if status == 401 else {}
+    return Response(flask_app.json.dumps({"error": message}), status_code=status,
+                    media_type="application/json", headers=headers)
+
+class AsyncRead:
+    # ASGI endpoint for one read query; falls back to the Flask route when
+    # the request needs something only the sync path implements
+    def __init__(self, sql, param, drop=()):
+        self.sql = sql
+        self.param = param
+        self.drop = drop
+
+    def use_sync(self, scope):
+        return bool(scope["query_string"]) or best_accept(scope) == "application/x-ndjson"
+
+    async def load(self, scope):
+        rows = await fetch_all(self.sql, (scope["path_params"][self.param],))
+        for row in rows:
+            for column in self.drop:
+                del row[column]
+        return rows
+
+    async def __call__(self, scope, receive, send):
+        if self.use_sync(scope):
+            await wsgi_app(scope, receive, send)
+            return
+        response = access_error(scope, self.param)
+        if response is None:
+            response = await read_response(scope, lambda: self.load(scope))
+        await response(scope, receive, send)
+
+DASHBOARD_SECTIONS = {
+    "measurements": MEASUREMENTS_SQL + " ORDER BY measurement_date",
+    "medicalAssessments": MEDICAL_ASSESSMENTS_SQL + " ORDER BY date, medical_id",
+    "lastTraining": LAST_TRAINING_SQL,
+    "sessionAdherence": SESSION_ADHERENCE_SQL,
+    "topThreeExercises": TOP_THREE_EXERCISES_SQL,
+    "enrolledPrograms": ENROLLED_PROGRAMS_SQL
+}
+
+async def dashboard(request):
+    # unlike the sync route the sections run in parallel, each on its own connection
+    error = access_error(request.scope, "athlete_id")
+    if error is not None:
+        return error
+    athlete_id = request.path_params["athlete_id"]
+
+    async def section(sql):
+        start = time.perf_counter()
+        rows = await fetch_all(sql, (athlete_id,))
+        return rows, round((time.perf_counter() - start) * 1000, 2)
+
+    async def load():
+        results = await asyncio.gather(*(section(sql) for sql in DASHBOARD_SECTIONS.values()))
+        payload = {}
+        timing = {}
+        for name, (rows, elapsed) in zip(DASHBOARD_SECTIONS, results):
+            payload[name] = rows
+            timing[name] = elapsed
+        payload["timing_ms"] = timing
+        return payload
+
+    return await read_response(request.scope, load)
+
+application = Starlette(
+    routes=[
+        Route("/api/measurements/{athlete_id:int}", AsyncRead(MEASUREMENTS_SQL + " ORDER BY measurement_date", "athlete_id")),
+        Route("/api/medicalAssessments/{athlete_id:int}",
+              AsyncRead(MEDICAL_ASSESSMENTS_SQL + " ORDER BY date, medical_id", "athlete_id", drop=("medical_id",))),
+        Route("/api/lastTraining/{athlete_id:int}", AsyncRead(LAST_TRAINING_SQL, "athlete_id")),
+        Route("/api/sessionAdherence/{athlete_id:int}", AsyncRead(SESSION_ADHERENCE_SQL, "athlete_id")),
+        Route("/api/topThreeExercises/{athlete_id:int}", AsyncRead(TOP_THREE_EXERCISES_SQL, "athlete_id")),
+        Route("/api/athletePrograms/enrolled/{athlete_id:int}", AsyncRead(ENROLLED_PROGRAMS_SQL, "athlete_id")),
+        Route("/api/trainingPrograms/{trainer_id:int}", AsyncRead(TRAINER_PROGRAMS_SQL, "trainer_id")),
+        Route("/api/trainer/{trainer_id:int}/athletes", AsyncRead(TRAINER_ATHLETES_SQL, "trainer_id")),
+        Route("/api/trainer/{trainer_id:int}/sessionAdherence", AsyncRead(TRAINER_ADHERENCE_SQL, "trainer_id")),
+        Route("/api/leaderboard/{trainer_id:int}", AsyncRead(LEADERBOARD_SQL, "trainer_id")),
+        Route("/api/athlete/{athlete_id:int}/dashboard", dashboard),
+        Mount("/", app=wsgi_app)
+    ],
+    lifespan=lifespan
+)
@@ -1,14 +1,34 @@
-from db import connect_first
-import bcrypt
+from db import connect_first, unit_of_work
+from versions import touch
+from cache import invalidate_on_commit
+
+ROLE_SQL = """
+    CASE
+        WHEN t.trainer_id IS NOT NULL THEN 'trainer'
+        WHEN a.athlete_id IS NOT NULL THEN 'athlete'
+        WHEN m.medical_id IS NOT NULL THEN 'medical'
+    END
+"""
+
+ROLE_JOINS = """
+    LEFT JOIN trainer t ON t.trainer_id = u.user_id
+    LEFT JOIN athlete a ON a.athlete_id = u.user_id
+    LEFT JOIN medical m ON m.medical_id = u.user_id
+"""
 
 @connect_first
-def get_user(cursor, email):
-    sql = "SELECT * FROM user WHERE email = %s"
+def get_user_with_role(cursor, email):
+    sql = f"""
+        SELECT u.*, {ROLE_SQL} AS role
+        FROM user u
+        {ROLE_JOINS}
+        WHERE u.email = %s
+    """
     cursor.execute(sql, (email,))
     return cursor.fetchone()
 
 @connect_first
-def insert_user(cursor, data):
+def insert_user(cursor, data, password_hash):
     sql = """INSERT INTO user (
         first_name,
         last_name,
@@ -22,7 +42,6 @@ def insert_user(cursor, data):
     ) VALUES (
         %s,%s,%s,%s,%s,%s,%s,NOW(),'active'
     );"""
-    password_hash = bcrypt.hashpw(data["signup_password"].encode("utf-8"), bcrypt.gensalt())
     cursor.execute(sql, (
         data["first_name"],
         data["last_name"],
@@ -32,37 +51,44 @@ def insert_user(cursor, data):
         data["gender"],
         data["date_of_birth"]
     ))
+    return cursor.lastrowid
 
 @connect_first
-def insert_athlete(cursor, data):
-    user_data = get_user(data["signup_email"])
+def update_password_hash(cursor, user_id, password_hash):
+    sql = "UPDATE user SET password_hash = %s WHERE user_id = %s"
+    cursor.execute(sql, (password_hash, user_id))
+
+@connect_first
+def insert_athlete(cursor, user_id, data):
     sql = "INSERT INTO athlete (athlete_id, sports_branch) VALUES (%s, %s);"
-    cursor.execute(sql, (user_data["user_id"], data["sports_branch"]))
+    cursor.execute(sql, (user_id, data["sports_branch"]))
+    touch(cursor, "athletes")
+    # a new member of the athlete's sports branch
+    invalidate_on_commit("cohorts")
 
 @connect_first
-def insert_medical(cursor, data):
-    user_data = get_user(data["signup_email"])
+def insert_medical(cursor, user_id, data):
     sql = "INSERT INTO medical (medical_id, profession, specialization_area) VALUES (%s, %s, %s);"
-    cursor.execute(sql, (user_data["user_id"], data["profession"], data["specialization_area"]))
+    cursor.execute(sql, (user_id, data["profession"], data["specialization_area"]))
 
 @connect_first
-def insert_trainer(cursor, data):
-    user_data = get_user(data["signup_email"])
+def insert_trainer(cursor, user_id, data):
     sql = "INSERT INTO trainer (trainer_id, specialization, experience_years) VALUES (%s, %s, %s);"
-    cursor.execute(sql, (user_data["user_id"], data["specialization"], data["years_experience"]))
+    cursor.execute(sql, (user_id, data["specialization"], data["years_experience"]))
 
 @connect_first
-def insert_staff(cursor, data):
-    user_data = get_user(data["signup_email"])
+def insert_staff(cursor, user_id, data):
     sql = "INSERT INTO staff (staff_id) VALUES (%s);"
-    cursor.execute(sql, (user_data["user_id"],))
+    cursor.execute(sql, (user_id,))
 
-@connect_first
-def get_role(cursor, user_data):
-    roles = ["trainer", "athlete", "medical"]
-    for role in roles:
-        sql = f"SELECT 1 FROM {role} WHERE {role}_id = %s"
-        cursor.execute(sql, (user_data["user_id"],))
-        if cursor.fetchone():
-            return role
-    return None
\ No newline at end of file
+@unit_of_work
+def create_account(data, password_hash):
+    user_id = insert_user(data, password_hash)
+    role = data.get("role")
+    if role == "athlete":
+        insert_athlete(user_id, data)
+    elif role == "trainer":
+        insert_staff(user_id, data); insert_trainer(user_id, data)
+    elif role == "medical":
+        insert_staff(user_id, data); insert_medical(user_id, data)
+    return user_id
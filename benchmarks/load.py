@@ -0,0 +1,484 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+import httpx
+from serving import ROOT, start_server, wait_until_up, percentile
+
+sys.path.insert(0, ROOT)
+import mysql.connector
+from db import load_credentials
+from gym_faker import DEFAULT_PASSWORD, SPORTS
+from tokens import issue_token
+
+# Load test for the Flask app with role-based traffic.
+#
+#   1. With --scale N the gym database is recreated from gym.sql and seeded
+#      with gym_faker (CSV + --passwords manifest) through loader.py.
+#      Without it the existing database is used.
+#   2. serve.py is started and --clients virtual users replay sessions for
+#      --duration seconds. Each session picks a role by --mix, logs in and
+#      walks that role's routes (athlete dashboard pages, trainer programs
+#      and leaderboard, medical exam entry, ...).
+#   3. Every route is then replayed --profile-requests times on its own while
+#      the server's Questions and Connections counters are sampled, which
+#      gives DB queries and new connections per request.
+#
+# The report (rps, p50/p95/p99, errors, queries and connections per request
+# per route) is written as JSON to benchmarks/results/<commit>-<mode>.json;
+# "--compare OLD.json" prints the p95 and queries per request changes.
+#
+# Usage: python benchmarks/load.py [--scale 1] [--clients 50] [--duration 60]
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_MIX = "athlete=70,trainer=20,medical=10"
+SAMPLE_SIZE = 2000
+
+class Dataset:
+    # ids and logins sampled from the database the server is using
+    def __init__(self, cursor, manifest):
+        passwords = {}
+        if manifest and os.path.exists(manifest):
+            with open(manifest, encoding="utf-8", newline="") as f:
+                passwords = dict(csv.reader(f))
+        self.password = lambda email: passwords.get(email, DEFAULT_PASSWORD)
+
+        def users(table, key):
+            cursor.execute(f"""
+                SELECT r.{key} AS id, u.email FROM {table} r
+                JOIN User u ON u.user_id = r.{key}
+                ORDER BY RAND() LIMIT {SAMPLE_SIZE}
+            """)
+            return cursor.fetchall()
+
+        self.athletes = users("Athlete", "athlete_id")
+        self.trainers = users("Trainer", "trainer_id")
+        self.medical = users("Medical", "medical_id")
+
+        # trainer -> [{trainer_id, program_id, session_id}] with the latest session of each program
+        ids = [t["id"] for t in self.trainers]
+        self.programs = {}
+        if ids:
+            marks = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"""
+                SELECT tp.created_by_trainer AS trainer_id, tp.program_id, MAX(ws.session_id) AS session_id
+                FROM TrainingProgram tp
+                LEFT JOIN WorkoutSession ws ON ws.program_id = tp.program_id
+                WHERE tp.created_by_trainer IN ({marks})
+                GROUP BY tp.created_by_trainer, tp.program_id
+            """, ids)
+            for row in cursor.fetchall():
+                self.programs.setdefault(row["trainer_id"], []).append(row)
+        self.program_ids = [p["program_id"] for programs in self.programs.values() for p in programs]
+        self.trainers = [t for t in self.trainers if t["id"] in self.programs]
+
+        sessions = {p["session_id"] for programs in self.programs.values() for p in programs if p["session_id"]}
+        self.session_exercises = {}
+        self.enrolled = {}
+        if sessions:
+            marks = ", ".join(["%s"] * len(sessions))
+            cursor.execute(f"SELECT session_id, exercise_id FROM SessionExercise WHERE session_id IN ({marks})", list(sessions))
+            for row in cursor.fetchall():
+                self.session_exercises.setdefault(row["session_id"], []).append(row["exercise_id"])
+            cursor.execute(f"""
+                SELECT ws.session_id, pe.athlete_id FROM WorkoutSession ws
+                JOIN ProgramEnrollment pe ON pe.program_id = ws.program_id
+                WHERE ws.session_id IN ({marks})
+            """, list(sessions))
+            for row in cursor.fetchall():
+                self.enrolled.setdefault(row["session_id"], []).append(row["athlete_id"])
+
+        # keys the write routes must not repeat within a run, starting with
+        # the enrollments the sampled athletes already have
+        self.used = set()
+        ids = [a["id"] for a in self.athletes]
+        if ids:
+            marks = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"SELECT athlete_id, program_id FROM ProgramEnrollment WHERE athlete_id IN ({marks})", ids)
+            self.used.update((row["athlete_id"], row["program_id"]) for row in cursor.fetchall())
+
+    def fresh(self, rng, make, attempts=20):
+        # a key from make(rng) that no earlier request used
+        for _ in range(attempts):
+            key = make(rng)
+            if key not in self.used:
+                self.used.add(key)
+                return key
+        return key
+
+# route builders: (user, data, rng) -> (method, url, json)
+def login(user, data, rng):
+    return "POST", "/login", {"email": user["email"], "password": data.password(user["email"])}
+
+def user_get(path):
+    return lambda user, data, rng: ("GET", path.format(id=user["id"]), None)
+
+def any_athlete_get(path):
+    return lambda user, data, rng: ("GET", path.format(id=rng.choice(data.athletes)["id"]), None)
+
+def trainer_program(user, data, rng):
+    return rng.choice(data.programs[user["id"]])
+
+def workout_sessions(user, data, rng):
+    return "GET", f"/api/workoutSessions/{trainer_program(user, data, rng)['program_id']}", None
+
+def trainer_athlete_sessions(user, data, rng):
+    athlete = rng.choice(data.athletes)["id"]
+    return "GET", f"/api/workoutSessions/trainer/{user['id']}/athlete/{athlete}", None
+
+def create_program(user, data, rng):
+    return "POST", "/api/createTrainingProgram", {
+        "name": f"Load test {rng.randrange(10 ** 9)}", "difficulty": "Intermediate", "goal": "Endurance",
+        "start_date": date.today().isoformat(), "end_date": None, "trainer_id": user["id"]
+    }
+
+def add_session(user, data, rng):
+    return "POST", "/api/addWorkoutSession", {
+        "program_id": trainer_program(user, data, rng)["program_id"],
+        "session_date": date.today().isoformat(), "duration": 60, "intensity": "Medium"
+    }
+
+def logged_session(user, data, rng):
+    sessions = [p["session_id"] for p in data.programs[user["id"]]
+                if p["session_id"] in data.session_exercises and p["session_id"] in data.enrolled]
+    return rng.choice(sessions) if sessions else None
+
+def trainer_feedback(user, data, rng):
+    session = logged_session(user, data, rng)
+    if session is None:
+        return add_session(user, data, rng)
+    athlete, _ = data.fresh(rng, lambda r: (r.choice(data.enrolled[session]), ("feedback", user["id"], session)))
+    return "POST", "/api/addTrainerFeedback", {
+        "athlete_id": athlete, "trainer_id": user["id"], "session_id": session,
+        "comments": "Load test", "rating": rng.randint(1, 5)
+    }
+
+def performance_logs(user, data, rng):
+    session = logged_session(user, data, rng)
+    if session is None:
+        return add_session(user, data, rng)
+    rows = [{"athlete_id": athlete, "session_id": session, "exercise_id": exercise,
+             "completed_sets": 3, "completed_reps": rng.randint(5, 15),
+             "weight_used": rng.randint(20, 120), "perceived_exertion": rng.randint(5, 10)}
+            for athlete in rng.sample(data.enrolled[session], min(20, len(data.enrolled[session])))
+            for exercise in data.session_exercises[session]]
+    return "POST", "/api/performanceLogs/bulk", rows
+
+def enroll(user, data, rng):
+    # athletes enroll themselves
+    if not data.program_ids:
+        return user_get("/api/athletePrograms/notEnrolled/{id}")(user, data, rng)
+    _, program = data.fresh(rng, lambda r: (user["id"], r.choice(data.program_ids)))
+    return "POST", "/api/enrollAthlete", {"athlete_id": user["id"], "program_id": program}
+
+def measurements(user, data, rng):
+    # medical staff measure any athlete
+    today = date.today().isoformat()
+    return "POST", "/api/measurements/bulk", [{
+        "athlete_id": rng.choice(data.athletes)["id"], "measurement_date": today, "height": 180,
+        "weight": rng.randint(60, 100), "body_fat_percentage": rng.randint(8, 25)
+    }]
+
+def medical_exam(user, data, rng):
+    athlete, _ = data.fresh(rng, lambda r: (r.choice(data.athletes)["id"], ("exam", user["id"])))
+    return "POST", "/api/addMedicalExam", {
+        "athlete_id": athlete, "medical_id": user["id"], "assessment_type": "Physical",
+        "notes": "Load test", "clearance_status": rng.choice(["Cleared", "Restricted"])
+    }
+
+def athlete_query(user, data, rng):
+    return "POST", "/query", {"category": rng.choice(SPORTS), "status": "active"}
+
+def signup(user, data, rng):
+    return "POST", "/signup", {
+        "first_name": "Load", "last_name": "Test", "signup_email": f"load.{rng.randrange(10 ** 12)}@example.com",
+        "signup_password": DEFAULT_PASSWORD, "phone": "5550000000", "gender": "Other",
+        "date_of_birth": "2000-01-01", "role": "athlete", "sports_branch": rng.choice(SPORTS)
+    }
+
+# (route, builder) in the order a session of that role walks them
+FLOWS = {
+    "athlete": [
+        ("POST /login", login),
+        ("GET /api/athlete/<id>/dashboard", user_get("/api/athlete/{id}/dashboard")),
+        ("GET /api/measurements/<id>", user_get("/api/measurements/{id}")),
+        ("GET /api/lastTraining/<id>", user_get("/api/lastTraining/{id}")),
+        ("GET /api/sessionAdherence/<id>", user_get("/api/sessionAdherence/{id}")),
+        ("GET /api/topThreeExercises/<id>", user_get("/api/topThreeExercises/{id}")),
+        ("GET /api/athletePrograms/enrolled/<id>", user_get("/api/athletePrograms/enrolled/{id}")),
+        ("GET /api/athletePrograms/notEnrolled/<id>", user_get("/api/athletePrograms/notEnrolled/{id}")),
+        ("POST /api/enrollAthlete", enroll),
+    ],
+    "trainer": [
+        ("POST /login", login),
+        ("GET /api/trainingPrograms/<id>", user_get("/api/trainingPrograms/{id}")),
+        ("GET /api/trainer/<id>/athletes", user_get("/api/trainer/{id}/athletes")),
+        ("GET /api/leaderboard/<id>", user_get("/api/leaderboard/{id}")),
+        ("GET /api/trainer/<id>/sessionAdherence", user_get("/api/trainer/{id}/sessionAdherence")),
+        ("GET /api/workoutSessions/<program_id>", workout_sessions),
+        ("GET /api/workoutSessions/trainer/<id>/athlete/<athlete_id>", trainer_athlete_sessions),
+        ("POST /api/performanceLogs/bulk", performance_logs),
+        ("POST /api/addTrainerFeedback", trainer_feedback),
+        ("POST /api/addWorkoutSession", add_session),
+        ("POST /api/createTrainingProgram", create_program),
+    ],
+    "medical": [
+        ("POST /login", login),
+        ("GET /api/athletes", lambda user, data, rng: ("GET", "/api/athletes", None)),
+        ("GET /api/measurements/<id>", any_athlete_get("/api/measurements/{id}")),
+        ("GET /api/medicalAssessments/<id>", any_athlete_get("/api/medicalAssessments/{id}")),
+        ("POST /api/addMedicalExam", medical_exam),
+        ("POST /api/measurements/bulk", measurements),
+        ("POST /query", athlete_query),
+    ],
+    "visitor": [
+        ("GET /", lambda user, data, rng: ("GET", "/", None)),
+        ("POST /signup", signup),
+    ],
+}
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        role, _, weight = part.partition("=")
+        if role not in FLOWS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"bad mix entry {part!r}, expected role=weight with role in {', '.join(FLOWS)}")
+        mix[role] = int(weight)
+    return mix
+
+def role_users(data, role):
+    return {"athlete": data.athletes, "trainer": data.trainers, "medical": data.medical, "visitor": [{}]}[role]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def send(self, client, route, request, headers=None):
+        method, url, body = request
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await client.request(method, url, json=body, headers=headers)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        self.latencies.setdefault(route, []).append(time.perf_counter() - start)
+        if failed:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+async def run_load(base_url, data, mix, clients, duration, seed):
+    recorder = Recorder()
+    roles = [role for role in mix if mix[role] and role_users(data, role)]
+    weights = [mix[role] for role in roles]
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + duration
+
+        async def virtual_user(n):
+            rng = random.Random(f"{seed}:{n}")
+            while time.monotonic() < deadline:
+                role = rng.choices(roles, weights)[0]
+                user = rng.choice(role_users(data, role))
+                headers = None
+                for route, build in FLOWS[role]:
+                    if time.monotonic() >= deadline:
+                        break
+                    response = await recorder.send(client, route, build(user, data, rng), headers)
+                    if route == "POST /login" and response is not None and response.status_code == 200:
+                        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        started = time.monotonic()
+        await asyncio.gather(*(virtual_user(n) for n in range(clients)))
+        elapsed = time.monotonic() - started
+    return recorder, elapsed
+
+def server_counters(cursor):
+    cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Questions', 'Connections')")
+    return {row["Variable_name"]: int(row["Value"]) for row in cursor.fetchall()}
+
+async def profile_route(base_url, cursor, data, route, build, role, users, requests, seed):
+    # per-request server deltas for one route replayed alone, minus what
+    # reading the counters costs; tokens are minted here instead of logging in
+    rng = random.Random(f"{seed}:profile:{route}")
+    before = server_counters(cursor)
+    overhead = server_counters(cursor)
+    overhead = {k: overhead[k] - before[k] for k in before}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        before = server_counters(cursor)
+        for _ in range(requests):
+            user = rng.choice(users)
+            method, url, body = build(user, data, rng)
+            headers = {"Authorization": f"Bearer {issue_token(user['id'], role)}"} if "id" in user else None
+            await client.request(method, url, json=body, headers=headers)
+        after = server_counters(cursor)
+    return {
+        "queries_per_request": round((after["Questions"] - before["Questions"] - overhead["Questions"]) / requests, 2),
+        "connections_per_request": round((after["Connections"] - before["Connections"] - overhead["Connections"]) / requests, 3)
+    }
+
+def reset_schema(credentials):
+    # gym.sql drops and recreates the database; statements end with ";"
+    server = {k: v for k, v in credentials.items() if k != "database"}
+    conn = mysql.connector.connect(**server)
+    cursor = conn.cursor()
+    with open(os.path.join(ROOT, "gym.sql"), encoding="utf-8") as f:
+        for statement in re.split(r";\s*", f.read()):
+            if statement.strip():
+                cursor.execute(statement)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def seed_database(credentials, scale, passwords, manifest, workers):
+    reset_schema(credentials)
+    with tempfile.TemporaryDirectory() as directory:
+        dataset = os.path.join(directory, "dataset")
+        subprocess.run([sys.executable, "gym_faker.py", "--scale", str(scale), "--format", "csv",
+                        "--output", dataset, "--passwords", str(passwords), "--manifest", manifest,
+                        "--workers", str(workers)], cwd=ROOT, check=True)
+        subprocess.run([sys.executable, "loader.py", dataset, "--workers", str(workers)], cwd=ROOT, check=True)
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+def route_report(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(statistics.fmean(latencies)) if latencies else 0.0
+    }
+
+def print_report(results):
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request", "connections_per_request"]
+    width = max(len(route) for route in results["routes"])
+    print(f"{'route':{width}}  " + "  ".join(f"{c.replace('_per_request', '/req'):>11}" for c in columns))
+    for route, row in [*results["routes"].items(), ("total", results["total"])]:
+        print(f"{route:{width}}  " + "  ".join(f"{row.get(c, ''):>11}" for c in columns))
+
+def print_comparison(old, new):
+    print(f"\nCompared with {old['meta']['commit']}:")
+    for route, row in new["routes"].items():
+        before = old["routes"].get(route)
+        if not before:
+            print(f"  {route}: new route")
+            continue
+        changes = []
+        for key in ["p95_ms", "rps", "queries_per_request", "connections_per_request"]:
+            if key in row and key in before and row[key] != before[key]:
+                change = f" ({(row[key] - before[key]) / before[key]:+.0%})" if before[key] else ""
+                changes.append(f"{key} {before[key]} -> {row[key]}{change}")
+        print(f"  {route}: {'; '.join(changes) or 'unchanged'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Role-based load test for the Flask app")
+    parser.add_argument("--scale", type=int, help="recreate and seed the database at this gym_faker scale first")
+    parser.add_argument("--passwords", type=int, default=100, help="distinct passwords when seeding")
+    parser.add_argument("--seed-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--manifest", default=os.path.join(ROOT, "benchmarks", "passwords.csv"),
+                        help="email,password CSV written when seeding and used for logins")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--port", type=int, default=5200)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"role weights (default {DEFAULT_MIX}; roles: {', '.join(FLOWS)})")
+    parser.add_argument("--profile-requests", type=int, default=20, help="0 skips the per-route DB profile")
+    parser.add_argument("--seed", type=int, default=306)
+    parser.add_argument("--output", help="JSON report path (default benchmarks/results/<commit>-<mode>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to compare with")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    credentials = load_credentials()
+    if args.scale:
+        seed_database(credentials, args.scale, args.passwords, args.manifest, args.seed_workers)
+
+    conn = mysql.connector.connect(**credentials)
+    conn.autocommit = True
+    cursor = conn.cursor(dictionary=True)
+    data = Dataset(cursor, args.manifest)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args.mode, args.port)
+    try:
+        asyncio.run(wait_until_up(base_url))
+        before = server_counters(cursor)
+        recorder, elapsed = asyncio.run(run_load(base_url, data, args.mix, args.clients, args.duration, args.seed))
+        after = server_counters(cursor)
+
+        routes = {route: route_report(latencies, recorder.errors.get(route, 0), elapsed)
+                  for route, latencies in sorted(recorder.latencies.items())}
+        if args.profile_requests > 0:
+            for role, flow in FLOWS.items():
+                users = role_users(data, role)
+                for route, build in flow:
+                    if route in routes and "queries_per_request" not in routes[route] and users:
+                        routes[route].update(asyncio.run(profile_route(
+                            base_url, cursor, data, route, build, role, users, args.profile_requests, args.seed)))
+    finally:
+        server.terminate()
+        server.wait()
+        cursor.close()
+        conn.close()
+
+    total = route_report([v for values in recorder.latencies.values() for v in values],
+                         sum(recorder.errors.values()), elapsed)
+    if total["requests"]:
+        total["queries_per_request"] = round((after["Questions"] - before["Questions"]) / total["requests"], 2)
+        total["connections_per_request"] = round((after["Connections"] - before["Connections"]) / total["requests"], 3)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "scale": args.scale,
+            "clients": args.clients,
+            "duration": args.duration,
+            "mix": args.mix,
+            "seed": args.seed,
+            "athletes": len(data.athletes),
+            "trainers": len(data.trainers),
+            "medical": len(data.medical)
+        },
+        "routes": routes,
+        "total": total
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['commit']}-{args.mode}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    print_report(results)
+    print(f"\nWrote {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), results)
+
+    # a route that never succeeded only timed its rejection
+    failing = [route for route, row in routes.items() if row["requests"] and row["errors"] == row["requests"]]
+    if failing:
+        print("\nEvery request failed for: " + ", ".join(failing), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
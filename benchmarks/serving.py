@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from tokens import issue_token
+
+# Compares the sync (waitress) and async (uvicorn) serving modes under many
+# concurrent clients. Each mode is started with serve.py on its own port,
+# hammered with the read endpoints for --duration seconds and stopped again.
+#
+# Requests are sent with a session token of --trainer-id, which may read
+# any athlete's data.
+#
+# Usage: python benchmarks/serving.py --clients 500 --duration 30
+
+ENDPOINTS = [
+    "/api/athlete/{athlete_id}/dashboard",
+    "/api/measurements/{athlete_id}",
+    "/api/topThreeExercises/{athlete_id}",
+    "/api/sessionAdherence/{athlete_id}",
+    "/api/leaderboard/{trainer_id}",
+    "/api/trainer/{trainer_id}/athletes",
+]
+
+def start_server(mode, port):
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--mode", mode, "--port", str(port)],
+        cwd=ROOT
+    )
+
+async def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+async def run_load(base_url, urls, clients, duration, headers=None):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60, headers=headers) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(urls[i % len(urls)])
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                i += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+        elapsed = time.monotonic() - started
+    return latencies, errors, elapsed
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+def report(mode, latencies, errors, elapsed):
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(statistics.fmean(latencies)) if latencies else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async serving")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--athlete-id", type=int, default=1)
+    parser.add_argument("--trainer-id", type=int, default=1)
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args()
+
+    urls = [e.format(athlete_id=args.athlete_id, trainer_id=args.trainer_id) for e in ENDPOINTS]
+    os.chdir(ROOT)
+    headers = {"Authorization": f"Bearer {issue_token(args.trainer_id, 'trainer')}"}
+    results = []
+    for n, mode in enumerate(args.modes.split(",")):
+        port = args.port + n
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(mode, port)
+        try:
+            asyncio.run(wait_until_up(base_url))
+            latencies, errors, elapsed = asyncio.run(run_load(base_url, urls, args.clients, args.duration, headers))
+            results.append(report(mode, latencies, errors, elapsed))
+        finally:
+            server.terminate()
+            server.wait()
+
+    columns = ["mode", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "mean_ms"]
+    print("  ".join(f"{c:>9}" for c in columns))
+    for row in results:
+        print("  ".join(f"{row[c]:>9}" for c in columns))
+
+if __name__ == "__main__":
+    main()
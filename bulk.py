@@ -0,0 +1,261 @@
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from flask import request, jsonify
+from db import connect_first
+from summaries import refresh_exercise_summary, refresh_session_adherence
+from leaderboard import refresh_leaderboard
+from versions import touch
+from cache import invalidate_on_commit
+from tokens import current_role, current_user_id
+
+# Batch writes for PerformanceLog and BodyMeasurement.
+#
+# The request body is a JSON array of rows. Every row is checked on its own
+# (types, ranges, athlete exists, session/exercise pair is in
+# SessionExercise, and the caller may write it: performance logs only for
+# athletes enrolled in the trainer's programs and sessions of those
+# programs, measurements from a trainer only for athletes enrolled in their
+# programs); rows that fail are reported by index and skipped, the rest are
+# written with multi-row INSERTs of BULK_CHUNK_SIZE rows in one transaction.
+# Posting a row whose key already exists overwrites the fields given in
+# the row and keeps the others.
+
+BULK_MAX_ROWS = int(os.environ.get("GYM_BULK_MAX_ROWS", 10000))
+BULK_CHUNK_SIZE = int(os.environ.get("GYM_BULK_CHUNK_SIZE", 1000))
+
+class RowError(ValueError):
+    pass
+
+def integer(low=None, high=None):
+    def convert(value):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise RowError("must be an integer")
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise RowError(f"must be between {low} and {high}" if high is not None else f"must be at least {low}")
+        return value
+    return convert
+
+def decimal(digits, places):
+    limit = Decimal(10) ** (digits - places)
+    def convert(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise RowError("must be a number")
+        try:
+            number = Decimal(str(value)).quantize(Decimal(1).scaleb(-places))
+        except InvalidOperation:
+            raise RowError("must be a number")
+        if not 0 <= number < limit:
+            raise RowError(f"must be between 0 and {limit}")
+        return number
+    return convert
+
+def iso(parse, kind):
+    def convert(value):
+        try:
+            return parse(value)
+        except (TypeError, ValueError):
+            raise RowError(f"must be an ISO {kind}")
+    return convert
+
+# (column, converter, required)
+PERFORMANCE_LOG_FIELDS = [
+    ("athlete_id", integer(1), True),
+    ("session_id", integer(1), True),
+    ("exercise_id", integer(1), True),
+    ("completed_sets", integer(0), False),
+    ("completed_reps", integer(0), False),
+    ("weight_used", decimal(6, 2), False),
+    ("perceived_exertion", integer(1, 10), False),
+    ("log_time", iso(datetime.fromisoformat, "datetime"), False)
+]
+
+BODY_MEASUREMENT_FIELDS = [
+    ("athlete_id", integer(1), True),
+    ("measurement_date", iso(date.fromisoformat, "date"), True),
+    ("height", decimal(5, 2), False),
+    ("weight", decimal(5, 2), False),
+    ("body_fat_percentage", decimal(5, 2), False),
+    ("muscle_mass", decimal(5, 2), False),
+    ("bmi", decimal(5, 2), False)
+]
+
+def parse_row(row, fields):
+    if not isinstance(row, dict):
+        raise RowError("row must be an object")
+    unknown = sorted(set(row) - {name for name, _, _ in fields})
+    if unknown:
+        raise RowError("unknown fields: " + ", ".join(unknown))
+    values = []
+    for name, convert, required in fields:
+        value = row.get(name)
+        if value is None:
+            if required:
+                raise RowError(f"{name} is required")
+            values.append(None)
+            continue
+        try:
+            values.append(convert(value))
+        except RowError as e:
+            raise RowError(f"{name} {e}")
+    return values
+
+def parse_rows(fields, key_size):
+    # returns (rows, errors); rows are (index, values) in request order
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        raise RowError("Expected a non-empty JSON array of rows")
+    if len(data) > BULK_MAX_ROWS:
+        raise RowError(f"At most {BULK_MAX_ROWS} rows per request")
+
+    rows = []
+    errors = []
+    seen = {}
+    for index, row in enumerate(data):
+        try:
+            values = parse_row(row, fields)
+        except RowError as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        key = tuple(values[:key_size])
+        if key in seen:
+            errors.append({"index": index, "error": f"duplicate of row {seen[key]}"})
+            continue
+        seen[key] = index
+        rows.append((index, values))
+    return rows, errors
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def existing_athletes(cursor, athlete_ids):
+    found = set()
+    for part in chunks(sorted(athlete_ids), BULK_CHUNK_SIZE):
+        marks = ", ".join(["%s"] * len(part))
+        cursor.execute(f"SELECT athlete_id FROM Athlete WHERE athlete_id IN ({marks})", part)
+        found.update(row["athlete_id"] for row in cursor.fetchall())
+    return found
+
+def trainer_athletes(cursor, trainer_id, athlete_ids):
+    # the athletes among athlete_ids enrolled in one of the trainer's programs
+    found = set()
+    for part in chunks(sorted(athlete_ids), BULK_CHUNK_SIZE):
+        marks = ", ".join(["%s"] * len(part))
+        cursor.execute(f"""
+            SELECT DISTINCT pe.athlete_id
+            FROM ProgramEnrollment pe
+            JOIN TrainingProgram tp ON tp.program_id = pe.program_id
+            WHERE tp.created_by_trainer = %s AND pe.athlete_id IN ({marks})
+        """, [trainer_id, *part])
+        found.update(row["athlete_id"] for row in cursor.fetchall())
+    return found
+
+def session_exercises(cursor, session_ids):
+    # (session_id, exercise_id) -> (program_id, trainer_id)
+    found = {}
+    for part in chunks(sorted(session_ids), BULK_CHUNK_SIZE):
+        marks = ", ".join(["%s"] * len(part))
+        cursor.execute(f"""
+            SELECT se.session_id, se.exercise_id, ws.program_id, tp.created_by_trainer
+            FROM SessionExercise se
+            JOIN WorkoutSession ws ON ws.session_id = se.session_id
+            JOIN TrainingProgram tp ON tp.program_id = ws.program_id
+            WHERE se.session_id IN ({marks})
+        """, part)
+        for row in cursor.fetchall():
+            found[(row["session_id"], row["exercise_id"])] = (row["program_id"], row["created_by_trainer"])
+    return found
+
+def insert_rows(cursor, table, columns, rows, key_size):
+    # multi-row INSERT ... ON DUPLICATE KEY UPDATE, BULK_CHUNK_SIZE rows per
+    # statement; rows are grouped by the fields they give, which are the only
+    # ones written (missing fields get the column default on insert and keep
+    # their stored value on update)
+    groups = {}
+    for values in rows:
+        given = tuple(i < key_size or v is not None for i, v in enumerate(values))
+        groups.setdefault(given, []).append([v for v, g in zip(values, given) if g])
+    for given, group in groups.items():
+        names = [c for c, g in zip(columns, given) if g]
+        placeholders = "(" + ", ".join(["%s"] * len(names)) + ")"
+        # a row of key fields only still needs an assignment, a no-op one
+        updates = ", ".join(f"{c} = new.{c}" for c in names[key_size:] or names[:1])
+        for part in chunks(group, BULK_CHUNK_SIZE):
+            sql = (f"INSERT INTO {table} ({', '.join(names)}) VALUES "
+                   + ", ".join([placeholders] * len(part))
+                   + f" AS new ON DUPLICATE KEY UPDATE {updates}")
+            cursor.execute(sql, [value for values in part for value in values])
+
+def bulk_response(inserted, errors):
+    errors.sort(key=lambda e: e["index"])
+    status = 201 if not errors else 200 if inserted else 400
+    return jsonify({"inserted": inserted, "errors": errors}), status
+
+@connect_first
+def bulk_performance_logs(cursor):
+    try:
+        rows, errors = parse_rows(PERFORMANCE_LOG_FIELDS, 3)
+    except RowError as e:
+        return jsonify({"error": str(e)}), 400
+
+    trainer_id = current_user_id()
+    athletes = trainer_athletes(cursor, trainer_id, {v[0] for _, v in rows})
+    planned = session_exercises(cursor, {v[1] for _, v in rows})
+    valid = []
+    for index, values in rows:
+        athlete_id, session_id, exercise_id = values[:3]
+        if athlete_id not in athletes:
+            errors.append({"index": index, "error": f"athlete {athlete_id} is not enrolled in one of your programs"})
+        elif (session_id, exercise_id) not in planned:
+            errors.append({"index": index, "error": f"exercise {exercise_id} is not part of session {session_id}"})
+        elif planned[(session_id, exercise_id)][1] != trainer_id:
+            errors.append({"index": index, "error": f"session {session_id} is not in one of your programs"})
+        else:
+            valid.append(values)
+
+    if valid:
+        columns = [name for name, _, _ in PERFORMANCE_LOG_FIELDS]
+        insert_rows(cursor, "PerformanceLog", columns, valid, 3)
+        refresh_exercise_summary(cursor, {(v[0], v[2]) for v in valid})
+        refresh_session_adherence(cursor, {v[1] for v in valid})
+        refresh_leaderboard(cursor, {planned[(v[1], v[2])][0] for v in valid})
+
+        tags = set()
+        for athlete_id, session_id, exercise_id, *_ in valid:
+            program_id, trainer_id = planned[(session_id, exercise_id)]
+            tags.update([f"athlete:{athlete_id}", f"program:{program_id}"])
+            if trainer_id is not None:
+                tags.add(f"trainer:{trainer_id}")
+        touch(cursor, *tags)
+        invalidate_on_commit("cohorts")
+    return bulk_response(len(valid), errors)
+
+@connect_first
+def bulk_body_measurements(cursor):
+    try:
+        rows, errors = parse_rows(BODY_MEASUREMENT_FIELDS, 2)
+    except RowError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # trainers only measure the athletes of their programs, medical staff anyone
+    athlete_ids = {v[0] for _, v in rows}
+    if current_role() == "trainer":
+        athletes = trainer_athletes(cursor, current_user_id(), athlete_ids)
+        missing = "is not enrolled in one of your programs"
+    else:
+        athletes = existing_athletes(cursor, athlete_ids)
+        missing = "does not exist"
+    valid = []
+    for index, values in rows:
+        if values[0] not in athletes:
+            errors.append({"index": index, "error": f"athlete {values[0]} {missing}"})
+        else:
+            valid.append(values)
+
+    if valid:
+        columns = [name for name, _, _ in BODY_MEASUREMENT_FIELDS]
+        insert_rows(cursor, "BodyMeasurement", columns, valid, 2)
+        touch(cursor, *{f"athlete:{v[0]}" for v in valid})
+        invalidate_on_commit("cohorts")
+    return bulk_response(len(valid), errors)
@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, g, request, make_response
+from db import on_commit
+
+# Read-through cache for expensive GET endpoints. Entries are keyed by
+# (endpoint, URL arguments, query string) and tagged (e.g. "athlete:12",
+# "trainer:3") so that write routes can drop everything they affect.
+#
+# GYM_CACHE_URL selects a shared backend (redis://...); without it the
+# cache lives in the process.
+
+CACHE_TTL = float(os.environ.get("GYM_CACHE_TTL", 60))  # seconds
+CACHE_MAX_ENTRIES = int(os.environ.get("GYM_CACHE_MAX_ENTRIES", 1024))
+CACHE_MAX_BYTES = int(os.environ.get("GYM_CACHE_MAX_BYTES", 1024 * 1024))  # larger bodies are not cached
+CACHE_URL = os.environ.get("GYM_CACHE_URL")
+
+class MemoryBackend:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}                # tag -> set of keys
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, tags, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+class RedisBackend:
+    # eviction is left to the redis server (maxmemory-policy allkeys-lru)
+    def __init__(self, url, prefix="gym:cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("GYM_CACHE_URL is set but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, tags, ttl):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=int(ttl))
+        for tag in tags:
+            pipe.sadd(self.prefix + "tag:" + tag, key)
+            pipe.expire(self.prefix + "tag:" + tag, int(ttl))
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            keys = [self.prefix + k.decode("utf-8") for k in self.client.smembers(tag_key)]
+            self.client.delete(tag_key, *keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+backend = RedisBackend(CACHE_URL) if CACHE_URL else MemoryBackend()
+
+def invalidate(*tags):
+    backend.invalidate(tags)
+
+def invalidate_on_commit(*tags):
+    # drop the entries only once the write is visible to other connections
+    on_commit(lambda: invalidate(*tags))
+
+def make_request_key(endpoint, view_args, args, accept):
+    # also used by the async read path of asgi.py, which shares the entries
+    view_args = ",".join(f"{k}={v}" for k, v in sorted(view_args.items()))
+    return f"{endpoint}|{view_args}|{args}|{accept}"
+
+def request_key():
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return make_request_key(request.endpoint, request.view_args or {}, args, request.accept_mimetypes.best or "")
+
+def entry_key(key, etag):
+    # on @conditional routes the ETag (entity versions read before the body)
+    # is part of the key, so a body is never served under newer versions
+    # than the ones it was read after
+    return f"{key}|{etag}"
+
+def cache_key():
+    return entry_key(request_key(), g.get("etag", ""))
+
+def encode_entry(mimetype, body):
+    return mimetype.encode("utf-8") + b"\n" + body
+
+def decode_entry(value):
+    mimetype, body = value.split(b"\n", 1)
+    return mimetype.decode("utf-8"), body
+
+def _encode(response, body):
+    return encode_entry(response.mimetype, body)
+
+def _decode(value):
+    mimetype, body = decode_entry(value)
+    return Response(body, mimetype=mimetype)
+
+def cached(tags, ttl=CACHE_TTL):
+    # tags: function of the route's URL arguments returning the cache tags
+    def decorator(fun):
+        @wraps(fun)
+        def wrapper(*args, **kwargs):
+            key = cache_key()
+            value = backend.get(key)
+            if value is not None:
+                return _decode(value)
+
+            response = make_response(fun(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry_tags = tags(**kwargs)
+
+            if not response.is_streamed:
+                body = response.get_data()
+                if len(body) <= CACHE_MAX_BYTES:
+                    backend.set(key, _encode(response, body), entry_tags, ttl)
+                return response
+
+            # keep streaming to the client and store the body once it is complete
+            chunks = response.response
+
+            def capture():
+                seen = []
+                size = 0
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode("utf-8")
+                    if seen is not None:
+                        size += len(chunk)
+                        if size <= CACHE_MAX_BYTES:
+                            seen.append(chunk)
+                        else:
+                            seen = None
+                    yield chunk
+                if seen is not None:
+                    backend.set(key, _encode(response, b"".join(seen)), entry_tags, ttl)
+
+            response.response = capture()
+            return response
+        wrapper.cache_tags = tags  # read by asgi.py
+        wrapper.cache_ttl = ttl
+        return wrapper
+    return decorator
@@ -1,27 +1,219 @@
+import contextvars
+import os
+import queue
+import threading
+import time
 import mysql.connector
 from functools import wraps
+from profiling import instrument, record_acquire, record_commit
 
-def get_db_connection():
+# Pool configuration (override through environment variables)
+POOL_SIZE = int(os.environ.get("GYM_DB_POOL_SIZE", 10))
+POOL_TIMEOUT = float(os.environ.get("GYM_DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+POOL_RECYCLE = float(os.environ.get("GYM_DB_POOL_RECYCLE", 1800))  # seconds before a connection is reopened
+
+class PoolTimeout(Exception):
+    pass
+
+def load_credentials():
     with open("password.txt", "r") as f:
         password = f.readline().strip()
 
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password=password,
-        database="gym"
-    )
+    return {
+        "host": "localhost",
+        "user": "root",
+        "password": password,
+        "database": "gym"
+    }
 
-def connect_first(fun):
+class PooledConnection:
+    # Thin wrapper so that conn.close() hands the connection back to the pool
+    def __init__(self, pool, conn, opened_at):
+        self._pool = pool
+        self._conn = conn
+        self._opened_at = opened_at
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return instrument(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        self._conn.commit()
+        record_commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn, self._opened_at)
+            self._conn = None
+
+class ConnectionPool:
+    def __init__(self, credentials, size=POOL_SIZE, timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE):
+        self.credentials = credentials
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._opened = 0
+        self._recycled = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        conn = mysql.connector.connect(**self.credentials)
+        with self._lock:
+            self._opened += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        with self._lock:
+            self._recycled += 1
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def _healthy(self, conn, opened_at):
+        if time.monotonic() - opened_at > self.recycle:
+            return False
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+        waited = time.monotonic() - start
+
+        opened = False
+        try:
+            conn, opened_at = self._idle.get_nowait()
+            if not self._healthy(conn, opened_at):
+                self._discard(conn)
+                conn, opened_at = self._open()
+                opened = True
+        except queue.Empty:
+            try:
+                conn, opened_at = self._open()
+                opened = True
+            except Exception:
+                self._slots.release()
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        record_acquire(time.monotonic() - start, opened)
+        return PooledConnection(self, conn, opened_at)
+
+    def release(self, conn, opened_at):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put((conn, opened_at))
+        except mysql.connector.Error:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "opened": self._opened,
+                "recycled": self._recycled,
+                "checkouts": self._checkouts,
+                "checkout_wait_total": round(self._wait_total, 6),
+                "checkout_wait_max": round(self._wait_max, 6),
+                "checkout_wait_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(load_credentials())
+    return _pool
+
+def get_db_connection():
+    return get_pool().acquire()
+
+# connection shared by everything running inside a unit_of_work
+_scope = contextvars.ContextVar("db_scope", default=None)
+# callbacks to run once the current transaction has been committed
+_on_commit = contextvars.ContextVar("db_on_commit", default=None)
+
+def on_commit(callback):
+    pending = _on_commit.get()
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+def _run_after_commit(fun, conn, *args, **kwargs):
+    pending = []
+    token = _on_commit.set(pending)
+    try:
+        result = fun(*args, **kwargs)
+        conn.commit()
+    finally:
+        _on_commit.reset(token)
+    for callback in pending:
+        callback()
+    return result
+
+def unit_of_work(fun):
+    # one connection and one transaction for the whole call; nested
+    # connect_first helpers reuse it instead of opening their own
     @wraps(fun)
     def wrapper(*args, **kwargs):
+        if _scope.get() is not None:
+            return fun(*args, **kwargs)
         conn = get_db_connection()
+        token = _scope.set(conn)
+        try:
+            return _run_after_commit(fun, conn, *args, **kwargs)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            _scope.reset(token)
+            conn.close()
+    return wrapper
+
+def connect_first(fun):
+    @wraps(fun)
+    def wrapper(*args, **kwargs):
+        scoped = _scope.get()
+        conn = scoped if scoped is not None else get_db_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            result = fun(cursor, *args, **kwargs)
-            conn.commit()
-            return result
+            if scoped is not None:
+                return fun(cursor, *args, **kwargs)
+            return _run_after_commit(fun, conn, cursor, *args, **kwargs)
         finally:
             cursor.close()
-            conn.close()
-    return wrapper
\ No newline at end of file
+            if scoped is None:
+                conn.close()
+    return wrapper
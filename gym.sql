@@ -198,6 +198,108 @@ CREATE TABLE TrainerFeedback (
         ON UPDATE CASCADE
 ) ENGINE=InnoDB;
 
+-- Secondary indexes for the queries in routes.py. User is always reached by
+-- primary key from Athlete in /query, so user.status needs no index of its own.
+
+-- /api/trainingPrograms, /api/leaderboard, /api/trainer/<id>/athletes
+CREATE INDEX idx_program_trainer ON TrainingProgram (created_by_trainer, program_id, program_name, start_date, end_date);
+
+-- /api/athletePrograms/notEnrolled
+CREATE INDEX idx_program_start ON TrainingProgram (start_date);
+
+-- /api/workoutSessions/<program_id>
+CREATE INDEX idx_session_program_date ON WorkoutSession (program_id, session_date);
+
+-- per-athlete log history ordered by time
+CREATE INDEX idx_log_athlete_time ON PerformanceLog (athlete_id, log_time);
+
+-- /api/leaderboard (per-session athlete counts and RPE)
+CREATE INDEX idx_log_session_athlete ON PerformanceLog (session_id, athlete_id, perceived_exertion);
+
+-- /api/medicalAssessments
+CREATE INDEX idx_assessment_athlete_date ON MedicalAssessment (athlete_id, assessment_date);
+
+-- /query
+CREATE INDEX idx_athlete_branch ON Athlete (sports_branch);
+
+CREATE TABLE AthleteExerciseSummary (
+    athlete_id INT NOT NULL,
+    exercise_id INT NOT NULL,
+    last_session_id INT,
+    last_weight_used DECIMAL(6,2),
+    last_completed_sets INT,
+    last_completed_reps INT,
+    last_perceived_exertion INT,
+    last_log_time DATETIME,
+    total_volume DECIMAL(14,2) NOT NULL DEFAULT 0,
+    volume_rank INT,
+    PRIMARY KEY (athlete_id, exercise_id),
+    KEY idx_summary_rank (athlete_id, volume_rank),
+    CONSTRAINT fk_summary_athlete
+        FOREIGN KEY (athlete_id) REFERENCES Athlete(athlete_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_summary_exercise
+        FOREIGN KEY (exercise_id) REFERENCES Exercise(exercise_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE SessionAdherence (
+    athlete_id INT NOT NULL,
+    session_id INT NOT NULL,
+    program_id INT NOT NULL,
+    session_date DATE NOT NULL,
+    completed_sets INT,
+    planned_sets INT,
+    completed_reps INT,
+    planned_reps INT,
+    rpe_total INT,
+    rpe_count INT NOT NULL DEFAULT 0,
+    percentage_sets_done DECIMAL(8,2),
+    percentage_reps_done DECIMAL(8,2),
+    average_rate_of_perceived_exertion DECIMAL(4,2),
+    PRIMARY KEY (athlete_id, session_id),
+    KEY idx_adherence_session (session_id),
+    KEY idx_adherence_program (program_id, session_date),
+    CONSTRAINT fk_adherence_athlete
+        FOREIGN KEY (athlete_id) REFERENCES Athlete(athlete_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_adherence_session
+        FOREIGN KEY (session_id) REFERENCES WorkoutSession(session_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE ProgramLeaderboard (
+    program_id INT NOT NULL,
+    athlete_id INT NOT NULL,
+    logged_sessions INT NOT NULL,
+    rpe_total INT,
+    rpe_count INT NOT NULL DEFAULT 0,
+    avg_rpe DECIMAL(4,2),
+    rnk INT,
+    PRIMARY KEY (program_id, athlete_id),
+    KEY idx_leaderboard_rank (program_id, rnk),
+    CONSTRAINT fk_leaderboard_program
+        FOREIGN KEY (program_id) REFERENCES TrainingProgram(program_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_leaderboard_athlete
+        FOREIGN KEY (athlete_id) REFERENCES Athlete(athlete_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE EntityVersion (
+    entity VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL
+) ENGINE=InnoDB;
+
+-- a fresh database gets a new global version so old ETags never match
+INSERT INTO EntityVersion (entity, version) VALUES ('*', UUID_SHORT());
+
 CREATE OR REPLACE VIEW v_log_enriched AS
 SELECT
   pl.athlete_id,
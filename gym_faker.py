@@ -1,26 +1,102 @@
-import itertools
-from faker import Faker
+import argparse
+import csv
+import os
 import random
+import shutil
+import sys
+import time
 from datetime import date, datetime, timedelta
+from itertools import islice
+from multiprocessing import Pool
+from faker import Faker
 import bcrypt
+from hashing import BCRYPT_ROUNDS
 
-# Faker
-fake = Faker()
-Faker.seed(306) # Remove for random data
-random.seed(306) # Remove for random data
+# Generates the dummy dataset. Every table is produced by a generator that
+# streams its rows straight to the output, so "--scale N" (N times the
+# default counts) never holds a whole table in memory.
+#
+# Each table is split into shards of SHARD_SIZE ids (users, athletes,
+# sessions, ...) that are generated in parallel worker processes. A shard
+# has its own Random and Faker seeded from (SEED, table, shard) and the
+# rows other tables refer to (user roles, session exercises) are derived
+# from SEED as well, so the output is the same whatever the worker count.
+# Unique columns are built from ids instead of relying on fake.unique.
+#
+# By default every user's password is 123456. With "--passwords N" users
+# draw from N random passwords instead; each distinct password is hashed
+# once, in a process pool, and an email -> password manifest is written for
+# load-test drivers.
+#
+# Usage: python gym_faker.py [--scale N] [--format sql|csv] [--output PATH] [--workers N]
+
+SEED = 306
 
 # Output file
 OUTPUT_FILE = 'insertion_queries.txt'
+CSV_DIR = 'dataset'
+MANIFEST_FILE = 'passwords.csv'
+DEFAULT_PASSWORD = '123456'
 
-# Configuration
+# Configuration (counts for --scale 1)
 NUM_USERS = 100
 NUM_ATHLETES = 60
 NUM_STAFF = 40
 NUM_TRAINERS = 15
 NUM_MEDICAL = 25
 NUM_PROGRAMS = 20
-NUM_EXERCISES = 30 #Currently maxed at 30 exercises, requries manual addition for more
+NUM_EXERCISES = 30 # exercises past the 30 listed below are numbered variants
 NUM_SESSIONS_PER_PROGRAM = 10
+NUM_FEEDBACK = 200
+LOGS_PER_ATHLETE = 8
+
+ROWS_PER_INSERT = 1000
+SHARD_SIZE = 5000
+
+EXERCISES_DATA = [
+    ('Dips', 'Strength', 'Parallel Bars', 'medium'),
+    ('Turkish Get-Up', 'Strength', 'Kettlebell', 'hard'),
+    ('Running', 'Cardio', 'Treadmill', 'easy'),
+    ('Dead Bug', 'Core', 'None', 'easy'),
+    ('Box Jumps', 'Plyometrics', 'Plyo Box', 'medium'),
+    ('Hanging Leg Raises', 'Core', 'Pull-up Bar', 'medium'),
+    ('Sled Push', 'Conditioning', 'Prowler Sled', 'hard'),
+    ('Lateral Raises', 'Strength', 'Dumbbells', 'easy'),
+    ('Rowing', 'Cardio', 'Rowing Machine', 'medium'),
+    ('Pistol Squat', 'Strength', 'None', 'hard'),
+    ('Incline Bench Press', 'Strength', 'Barbell, Incline Bench', 'medium'),
+    ('Calf Raises', 'Strength', 'Step', 'easy'),
+    ('Burpees', 'Cardio', 'None', 'hard'),
+    ('Kettlebell Swings', 'Strength', 'Kettlebell', 'medium'),
+    ('Battle Ropes', 'Cardio', 'Ropes', 'medium'),
+    ('Shadow Boxing', 'Cardio', 'None', 'medium'),
+    ('Superman', 'Core', 'None', 'easy'),
+    ('Preacher Curls', 'Strength', 'EZ Bar, Preacher Bench', 'easy'),
+    ('Thrusters', 'Strength', 'Barbell', 'hard'),
+    ('Wall Sits', 'Strength', 'Wall', 'easy'),
+    ('Pull-ups', 'Strength', 'Pull-up Bar', 'medium'),
+    ('Face Pulls', 'Strength', 'Cable Machine, Rope', 'easy'),
+    ('Assault Bike', 'Cardio', 'Fan Bike', 'hard'),
+    ('Russian Twists', 'Core', 'Medicine Ball', 'easy'),
+    ('Snatch', 'Olympic Lifting', 'Barbell', 'hard'),
+    ('Hammer Curls', 'Strength', 'Dumbbells', 'easy'),
+    ('Ab Wheel Rollouts', 'Core', 'Ab Wheel', 'hard'),
+    ('Barbell Squat', 'Strength', 'Barbell, Rack', 'hard'),
+    ('Mountain Climbers', 'Cardio', 'None', 'easy'),
+    ('T-Bar Row', 'Strength', 'Barbell, Landmine', 'medium')
+]
+
+SPORTS = ['Basketball', 'Football', 'Swimming', 'Track and Field', 'Tennis', 'Volleyball', 'Boxing', 'Wrestling', 'Gymnastics', 'Cycling']
+SPECIALIZATIONS = ['Strength Training', 'Cardio', 'CrossFit', 'Olympic Lifting', 'Sports Performance', 'Rehabilitation', 'Nutrition', 'HIIT']
+PROFESSIONS = {
+    'doctor': ['Sports Medicine', 'Orthopedics', 'General Practice'],
+    'physiotherapist': ['Sports Rehabilitation', 'Manual Therapy', 'Injury Prevention'],
+    'dietitian': ['Sports Nutrition', 'Weight Management', 'Performance Nutrition']
+}
+PROGRAM_NAMES = [
+    'Strength Building Phase', 'Endurance Training', 'Power Development', 'Speed and Agility', 'Muscle Hypertrophy', 'Fat Loss Program',
+    'Athletic Performance', 'Functional Fitness', 'Olympic Prep', 'Off-Season Conditioning', 'Pre-Season Training', 'Competition Prep']
+ASSESSMENT_TYPES = ['Physical Examination', 'Injury Assessment', 'Clearance Check', 'Nutritional Consultation', 'Recovery Assessment']
 
 def escape_string(s):
     if s is None:
@@ -43,347 +119,421 @@ def format_value(val):
     else:
         return str(val)
 
-def write_insert(output_file, table, columns, values_list):
-    if not values_list:
-        return
-    output_file.write(f"INSERT INTO {table} ({', '.join(columns)}) VALUES \n")
-    
-    for i, values in enumerate(values_list):
-        formatted_values = ', '.join(format_value(v) for v in values)
-        
-        output_file.write(f"({formatted_values})")
-        if i < len(values_list) - 1:
-            output_file.write(",\n")
-        else:
-            output_file.write(";\n\n")
-
-def fake_business_datetime():
-    dt = fake.date_time_between(start_date="-6M", end_date="now")
-    
-    business_hour = random.randint(8, 16) 
-    minute = random.randint(0, 59)
-    second = random.randint(0, 59)
-    
-    return dt.replace(hour=business_hour, minute=minute, second=second)
-
-def generate_users(output_file, n):
-    users = []
-    
-    pw_hash = bcrypt.hashpw('123456'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    
-    for i in range(1, n + 1):
-        gender = random.choice(['male', 'female', 'other'])
+def format_csv_value(val):
+    # matches the FIELDS/LINES clause in load_data_sql
+    if val is None:
+        return '\\N'
+    elif isinstance(val, str):
+        return '"' + val.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r') + '"'
+    elif isinstance(val, datetime):
+        return val.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(val, date):
+        return val.strftime('%Y-%m-%d')
+    else:
+        return str(val)
+
+def write_inserts(output_file, table, columns, rows):
+    # one multi-row INSERT per ROWS_PER_INSERT rows
+    count = 0
+    while True:
+        chunk = list(islice(rows, ROWS_PER_INSERT))
+        if not chunk:
+            return count
+        output_file.write(f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES \n")
+        output_file.write(",\n".join("(" + ", ".join(format_value(v) for v in values) + ")" for values in chunk))
+        output_file.write(";\n\n")
+        count += len(chunk)
+
+def write_csv(output_file, rows):
+    count = 0
+    for values in rows:
+        output_file.write(",".join(format_csv_value(v) for v in values) + "\n")
+        count += 1
+    return count
+
+def load_data_sql(path, table, columns):
+    path = os.path.abspath(path).replace("\\", "/")
+    return (f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table}` CHARACTER SET utf8mb4\n"
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\'\n"
+            f"LINES TERMINATED BY '\\n'\n"
+            f"({', '.join(columns)});\n")
+
+def random_date(rng, start, end):
+    return start + timedelta(days=rng.randint(0, (end - start).days))
+
+def business_datetime(rng, today):
+    day = random_date(rng, today - timedelta(days=182), today)
+    return datetime(day.year, day.month, day.day, rng.randint(8, 16), rng.randint(0, 59), rng.randint(0, 59))
+
+BCRYPT_ALPHABET = './ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+
+def seeded_salt(key, rounds=12):
+    # bcrypt.gensalt() is random; this salt only depends on SEED and key
+    rng = random.Random(f"{SEED}:salt:{key}")
+    chars = ''.join(rng.choice(BCRYPT_ALPHABET) for _ in range(21)) + rng.choice('.Oeu')
+    return f"$2b${rounds:02d}${chars}".encode('ascii')
+
+def hash_password(job):
+    password, rounds = job
+    return password, bcrypt.hashpw(password.encode('utf-8'), seeded_salt(password, rounds)).decode('utf-8')
+
+def make_password_hashes(count, rounds, workers):
+    # {password: hash}; each distinct password is hashed once
+    if count:
+        fake = Faker()
+        fake.seed_instance(f"{SEED}:passwords")
+        passwords = list(dict.fromkeys(fake.password(length=12) for _ in range(count)))
+    else:
+        passwords = [DEFAULT_PASSWORD]
+    jobs = [(password, rounds) for password in passwords]
+    if workers > 1 and len(jobs) > 1:
+        with Pool(workers) as pool:
+            return dict(pool.imap(hash_password, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    return dict(map(hash_password, jobs))
+
+def make_plan(scale, logs_per_athlete, today, password_hashes, manifest):
+    # ids of every role, shared by all the table generators
+    rng = random.Random(f"{SEED}:roles")
+    user_ids = range(1, NUM_USERS * scale + 1)
+    athlete_ids = sorted(rng.sample(user_ids, NUM_ATHLETES * scale))
+    athlete_set = set(athlete_ids)
+    staff_ids = sorted(rng.sample([uid for uid in user_ids if uid not in athlete_set], NUM_STAFF * scale))
+    trainer_ids = sorted(rng.sample(staff_ids, NUM_TRAINERS * scale))
+    trainer_set = set(trainer_ids)
+    medical_ids = sorted(rng.sample([sid for sid in staff_ids if sid not in trainer_set], NUM_MEDICAL * scale))
+    return {
+        "today": today,
+        "users": NUM_USERS * scale,
+        "programs": NUM_PROGRAMS * scale,
+        "sessions": NUM_PROGRAMS * scale * NUM_SESSIONS_PER_PROGRAM,
+        "exercises": NUM_EXERCISES * scale,
+        "feedback": NUM_FEEDBACK * scale,
+        "logs_per_athlete": logs_per_athlete,
+        "athlete_ids": athlete_ids,
+        "staff_ids": staff_ids,
+        "trainer_ids": trainer_ids,
+        "medical_ids": medical_ids,
+        "password_hashes": password_hashes,
+        "passwords": list(password_hashes),
+        "manifest": manifest
+    }
+
+def session_exercises(plan, session_id):
+    # (exercise_id, planned_sets, planned_reps, rest_duration) of a session;
+    # seeded per session so PerformanceLog can recompute it
+    rng = random.Random(f"{SEED}:SessionExercise:{session_id}")
+    count = plan["exercises"]
+    exercise_ids = rng.sample(range(1, count + 1), min(rng.randint(4, 8), count))
+    return [(exercise_id, rng.randint(3, 5), rng.randint(8, 15), rng.randint(30, 120)) for exercise_id in exercise_ids]
+
+def users(plan, rng, fake, start, stop):
+    today = plan["today"]
+    for i in range(start + 1, stop + 1):
+        gender = rng.choice(['male', 'female', 'other'])
         first_name = fake.first_name()
         last_name = fake.last_name()
-        date_of_birth = fake.date_time_between(start_date='-65y', end_date='-18y')
-        registration_datetime = fake_business_datetime()
-        user = (
+        date_of_birth = random_date(rng, today - timedelta(days=365 * 65), today - timedelta(days=365 * 18))
+        yield (
             i,
             first_name,
             last_name,
-            first_name.lower() + '.' + last_name.lower() + str(date_of_birth.year)[2:] + '@' + fake.free_email_domain(),
-            fake.unique.phone_number()[:20],
-            pw_hash,
+            # the id keeps emails unique at any scale
+            f"{first_name.lower()}.{last_name.lower()}{str(date_of_birth.year)[2:]}.{i}@{fake.free_email_domain()}",
+            # the last seven digits are the user id
+            f"{rng.randint(200, 999)}-{i // 10000 % 1000:03d}-{i % 10000:04d}",
+            plan["password_hashes"][rng.choice(plan["passwords"])],
             gender,
             date_of_birth,
-            registration_datetime,
-            random.choice(['active', 'inactive'])
+            business_datetime(rng, today),
+            rng.choice(['active', 'inactive'])
         )
-        users.append(user)
-    
-    write_insert(output_file, '`User`', ['user_id', 'first_name', 'last_name', 'email', 'phone', 'password_hash', 'gender', 'date_of_birth', 'registration_date', 'status'], users)
-    return [u[0] for u in users]
-
-def generate_athletes(output_file, user_ids, n):
-    selected_users = random.sample(user_ids, n)
-    
-    sports = ['Basketball', 'Football', 'Swimming', 'Track and Field', 'Tennis', 'Volleyball', 'Boxing', 'Wrestling', 'Gymnastics', 'Cycling']
-    
-    athletes = [(user_id, random.choice(sports)) for user_id in selected_users]
-    
-    write_insert(output_file, 'Athlete', ['athlete_id', 'sports_branch'], athletes)
-    return selected_users
-
-def generate_staff(output_file, user_ids, athlete_ids, n):
-    available_users = [uid for uid in user_ids if uid not in athlete_ids]
-    selected_users = random.sample(available_users, n)
-    
-    staff = [
-        (user_id, 
-         fake.date_between(start_date='-5y', end_date='today'),
-         round(random.uniform(30000, 80000), 2),
-         random.choice(['full-time', 'part-time']))
-        for user_id in selected_users
-    ]
-    
-    write_insert(output_file, 'Staff', ['staff_id', 'hire_date', 'salary', 'employment_type'], staff)
-    return selected_users
-
-def generate_trainers(output_file, staff_ids, n):
-    selected_staff = random.sample(staff_ids, n)
-    specializations = ['Strength Training', 'Cardio', 'CrossFit', 'Olympic Lifting', 'Sports Performance', 'Rehabilitation', 'Nutrition', 'HIIT']
-    trainers = [
-        (staff_id, random.choice(specializations), random.randint(1, 15))
-        for staff_id in selected_staff
-    ]
-    write_insert(output_file, 'Trainer', ['trainer_id', 'specialization', 'experience_years'], trainers)
-    return selected_staff
-
-def generate_medical(output_file, staff_ids, trainer_ids, n):
-    available_staff = [sid for sid in staff_ids if sid not in trainer_ids]
-    selected_staff = random.sample(available_staff, n)
-    
-    professions = {
-        'doctor': ['Sports Medicine', 'Orthopedics', 'General Practice'],
-        'physiotherapist': ['Sports Rehabilitation', 'Manual Therapy', 'Injury Prevention'],
-        'dietitian': ['Sports Nutrition', 'Weight Management', 'Performance Nutrition']
-    }
-    
-    medical = []
-    for staff_id in selected_staff:
-        profession = random.choice(list(professions.keys()))
-        specialization = random.choice(professions[profession])
-        medical.append((staff_id, profession, specialization))
-    
-    write_insert(output_file, 'Medical', ['medical_id', 'profession', 'specialization_area'], medical)
-    return selected_staff
-
-def generate_training_programs(output_file, trainer_ids, n):
-    program_names = [
-        'Strength Building Phase', 'Endurance Training', 'Power Development', 'Speed and Agility', 'Muscle Hypertrophy', 'Fat Loss Program', 
-        'Athletic Performance', 'Functional Fitness', 'Olympic Prep', 'Off-Season Conditioning', 'Pre-Season Training', 'Competition Prep']
-    programs = []
-    for i in range(1, n + 1):
-        start_date = fake.date_between(start_date='-6M', end_date='today')
-        end_date = start_date + timedelta(days=random.randint(30, 120))
-        
-        program = (
+
+def athletes(plan, rng, fake, start, stop):
+    for athlete_id in plan["athlete_ids"][start:stop]:
+        yield (athlete_id, rng.choice(SPORTS))
+
+def staff(plan, rng, fake, start, stop):
+    today = plan["today"]
+    for staff_id in plan["staff_ids"][start:stop]:
+        yield (
+            staff_id,
+            random_date(rng, today - timedelta(days=365 * 5), today),
+            round(rng.uniform(30000, 80000), 2),
+            rng.choice(['full-time', 'part-time'])
+        )
+
+def trainers(plan, rng, fake, start, stop):
+    for trainer_id in plan["trainer_ids"][start:stop]:
+        yield (trainer_id, rng.choice(SPECIALIZATIONS), rng.randint(1, 15))
+
+def medical(plan, rng, fake, start, stop):
+    for medical_id in plan["medical_ids"][start:stop]:
+        profession = rng.choice(list(PROFESSIONS))
+        yield (medical_id, profession, rng.choice(PROFESSIONS[profession]))
+
+def training_programs(plan, rng, fake, start, stop):
+    today = plan["today"]
+    for i in range(start + 1, stop + 1):
+        start_date = random_date(rng, today - timedelta(days=182), today)
+        yield (
             i,
-            random.choice(program_names),
-            random.choice(['beginner', 'intermediate', 'advanced']),
+            rng.choice(PROGRAM_NAMES),
+            rng.choice(['beginner', 'intermediate', 'advanced']),
             fake.text(max_nb_chars=200),
             start_date,
-            end_date,
-            random.choice(trainer_ids)
+            start_date + timedelta(days=rng.randint(30, 120)),
+            rng.choice(plan["trainer_ids"])
         )
-        programs.append(program)
-    
-    write_insert(output_file, 'TrainingProgram', ['program_id', 'program_name', 'difficulty_level', 'goal', 'start_date', 'end_date', 'created_by_trainer'], programs)
-
-    return [p[0] for p in programs]
-
-def generate_program_enrollments(output_file, athlete_ids, program_ids):
-    enrollments = []
-    for athlete_id in athlete_ids:
-        num_programs = random.randint(1, 3)
-        selected_programs = random.sample(program_ids, min(num_programs, len(program_ids)))
-        
-        for program_id in selected_programs:
-            enrollment = (
+
+def program_enrollments(plan, rng, fake, start, stop):
+    today = plan["today"]
+    program_ids = range(1, plan["programs"] + 1)
+    for athlete_id in plan["athlete_ids"][start:stop]:
+        for program_id in rng.sample(program_ids, min(rng.randint(1, 3), len(program_ids))):
+            yield (
                 athlete_id,
                 program_id,
-                fake.date_between(start_date='-6M', end_date='today'),
-                random.choice(['ongoing', 'completed', 'dropped'])
-            )
-            enrollments.append(enrollment)
-    
-    write_insert(output_file, 'ProgramEnrollment', ['athlete_id', 'program_id', 'enrollment_date', 'completion_status'], enrollments)
-
-def generate_exercises(output_file, n):
-    exercises_data = [
-        ('Dips', 'Strength', 'Parallel Bars', 'medium'),
-        ('Turkish Get-Up', 'Strength', 'Kettlebell', 'hard'),
-        ('Running', 'Cardio', 'Treadmill', 'easy'),
-        ('Dead Bug', 'Core', 'None', 'easy'),
-        ('Box Jumps', 'Plyometrics', 'Plyo Box', 'medium'),
-        ('Hanging Leg Raises', 'Core', 'Pull-up Bar', 'medium'),
-        ('Sled Push', 'Conditioning', 'Prowler Sled', 'hard'),
-        ('Lateral Raises', 'Strength', 'Dumbbells', 'easy'),
-        ('Rowing', 'Cardio', 'Rowing Machine', 'medium'),
-        ('Pistol Squat', 'Strength', 'None', 'hard'),
-        ('Incline Bench Press', 'Strength', 'Barbell, Incline Bench', 'medium'),
-        ('Calf Raises', 'Strength', 'Step', 'easy'),
-        ('Burpees', 'Cardio', 'None', 'hard'),
-        ('Kettlebell Swings', 'Strength', 'Kettlebell', 'medium'),
-        ('Battle Ropes', 'Cardio', 'Ropes', 'medium'),
-        ('Shadow Boxing', 'Cardio', 'None', 'medium'),
-        ('Superman', 'Core', 'None', 'easy'),
-        ('Preacher Curls', 'Strength', 'EZ Bar, Preacher Bench', 'easy'),
-        ('Thrusters', 'Strength', 'Barbell', 'hard'),
-        ('Wall Sits', 'Strength', 'Wall', 'easy'),
-        ('Pull-ups', 'Strength', 'Pull-up Bar', 'medium'),
-        ('Face Pulls', 'Strength', 'Cable Machine, Rope', 'easy'),
-        ('Assault Bike', 'Cardio', 'Fan Bike', 'hard'),
-        ('Russian Twists', 'Core', 'Medicine Ball', 'easy'),
-        ('Snatch', 'Olympic Lifting', 'Barbell', 'hard'),
-        ('Hammer Curls', 'Strength', 'Dumbbells', 'easy'),
-        ('Ab Wheel Rollouts', 'Core', 'Ab Wheel', 'hard'),
-        ('Barbell Squat', 'Strength', 'Barbell, Rack', 'hard'),
-        ('Mountain Climbers', 'Cardio', 'None', 'easy'),
-        ('T-Bar Row', 'Strength', 'Barbell, Landmine', 'medium')
-    ]
-    
-    exercises = []
-    for i in range(1, n+1):
-        ex = (i,) + exercises_data[i-1]
-        exercises.append(ex)
-
-    write_insert(output_file, 'Exercise', ['exercise_id', 'exercise_name', 'type', 'equipment_required', 'difficulty'], exercises)
-    return [e[0] for e in exercises]
-
-def generate_workout_sessions(output_file, program_ids):
-    sessions = []
-    session_id = 1
-    for program_id in program_ids:
-        for i in range(NUM_SESSIONS_PER_PROGRAM):
-            session = (
-                session_id,
-                program_id,
-                fake.date_between(start_date='-6M', end_date='today'),
-                random.randint(30, 120),
-                random.choice(['low', 'medium', 'high'])
-            )
-            sessions.append(session)
-            session_id += 1
-    
-    write_insert(output_file, 'WorkoutSession', ['session_id', 'program_id', 'session_date', 'duration', 'intensity_level'], sessions)
-    return [s[0] for s in sessions]
-
-def generate_session_exercises(output_file, session_ids, exercise_ids):
-    session_exercises = []
-    for session_id in session_ids:
-        num_exercises = random.randint(4, 8)
-        selected_exercises = random.sample(exercise_ids, min(num_exercises, len(exercise_ids)))
-        
-        for exercise_id in selected_exercises:
-            se = (
-                session_id,
-                exercise_id,
-                random.randint(3, 5),
-                random.randint(8, 15),
-                random.randint(30, 120)
+                random_date(rng, today - timedelta(days=182), today),
+                rng.choice(['ongoing', 'completed', 'dropped'])
             )
-            session_exercises.append(se)
-    
-    write_insert(output_file, 'SessionExercise', ['session_id', 'exercise_id', 'planned_sets', 'planned_reps', 'rest_duration'], session_exercises)
-    return session_exercises
-
-def generate_performance_logs(output_file, athlete_ids, session_exercises):
-    se_dict = {}
-    for se in session_exercises:
-        session_id, exercise_id, planned_sets, planned_reps = se[0], se[1], se[2], se[3]
-        se_dict.setdefault(session_id, []).append((exercise_id, planned_sets, planned_reps))
-    
-    candidates = []
-    for athlete_id in athlete_ids:
-        for session_id, exercises in se_dict.items():
-            for exercise_id, planned_sets, planned_reps in exercises:
-                candidates.append((athlete_id, session_id, exercise_id, planned_sets, planned_reps))
-
-    random.shuffle(candidates)
-    max_logs = min(500, len(athlete_ids) * 8, len(candidates))
-    selected_candidates = candidates[:max_logs]
-
-    logs = []
-    for athlete_id, session_id, exercise_id, planned_sets, planned_reps in selected_candidates:
-        log = (
-            athlete_id,
+
+def exercises(plan, rng, fake, start, stop):
+    for i in range(start + 1, stop + 1):
+        name, kind, equipment, difficulty = EXERCISES_DATA[(i - 1) % len(EXERCISES_DATA)]
+        variant = (i - 1) // len(EXERCISES_DATA)
+        yield (i, f"{name} {variant + 1}" if variant else name, kind, equipment, difficulty)
+
+def workout_sessions(plan, rng, fake, start, stop):
+    today = plan["today"]
+    for session_id in range(start + 1, stop + 1):
+        yield (
             session_id,
-            exercise_id,
-            random.randint(max(1, planned_sets - 1), planned_sets),
-            random.randint(max(1, planned_reps - 3), planned_reps + 2),
-            round(random.uniform(10, 200), 2),
-            random.randint(1, 10),
-            fake_business_datetime()
+            (session_id - 1) // NUM_SESSIONS_PER_PROGRAM + 1,
+            random_date(rng, today - timedelta(days=182), today),
+            rng.randint(30, 120),
+            rng.choice(['low', 'medium', 'high'])
         )
-        logs.append(log)
-
-    write_insert(output_file, 'PerformanceLog', ['athlete_id', 'session_id', 'exercise_id', 'completed_sets', 'completed_reps', 'weight_used', 'perceived_exertion', 'log_time'], logs)
-
-def generate_body_measurements(output_file, athlete_ids):
-    measurements = []
-    for athlete_id in athlete_ids:
-        num_measurements = random.randint(2, 5)
-        height = round(random.uniform(150, 200), 2)
-        weight = round(random.uniform(50, 120), 2)
-        body_fat = round(random.uniform(8, 30), 2)
-        muscle_mass = round(random.uniform(30, 70), 2)
-        bmi = round(weight / ((height / 100) ** 2), 2)
-        
-        seen_dates = set()
-        for i in range(num_measurements):
-            measurement_date = fake.date_between(start_date='-1y', end_date='today')
-            while measurement_date in seen_dates:
-                measurement_date = fake.date_between(start_date='-1y', end_date='today')
-            seen_dates.add(measurement_date)
-
-            height = round((height + random.uniform(-0.5, 0.5)), 2)
-            weight = round((weight + random.uniform(-2, 2)), 2)
-            body_fat = round((body_fat + random.uniform(-1, 1)), 2)
-            muscle_mass = round((muscle_mass + random.uniform(-1, 1)), 2)
+
+def session_exercise_rows(plan, rng, fake, start, stop):
+    for session_id in range(start + 1, stop + 1):
+        for exercise in session_exercises(plan, session_id):
+            yield (session_id, *exercise)
+
+def performance_logs(plan, rng, fake, start, stop):
+    # every session is logged by a random set of athletes, sized so that
+    # athletes log about logs_per_athlete exercises on average
+    athlete_ids = plan["athlete_ids"]
+    target = len(athlete_ids) * plan["logs_per_athlete"] / plan["sessions"]
+    for session_id in range(start + 1, stop + 1):
+        planned = session_exercises(plan, session_id)
+        expected = target / len(planned)
+        count = min(len(athlete_ids), int(expected) + (rng.random() < expected % 1))
+        for athlete_id in sorted(rng.sample(athlete_ids, count)):
+            for exercise_id, planned_sets, planned_reps, _ in planned:
+                yield (
+                    athlete_id,
+                    session_id,
+                    exercise_id,
+                    rng.randint(max(1, planned_sets - 1), planned_sets),
+                    rng.randint(max(1, planned_reps - 3), planned_reps + 2),
+                    round(rng.uniform(10, 200), 2),
+                    rng.randint(1, 10),
+                    business_datetime(rng, plan["today"])
+                )
+
+def body_measurements(plan, rng, fake, start, stop):
+    today = plan["today"]
+    for athlete_id in plan["athlete_ids"][start:stop]:
+        height = round(rng.uniform(150, 200), 2)
+        weight = round(rng.uniform(50, 120), 2)
+        body_fat = round(rng.uniform(8, 30), 2)
+        muscle_mass = round(rng.uniform(30, 70), 2)
+        for days_ago in rng.sample(range(366), rng.randint(2, 5)):
+            height = round((height + rng.uniform(-0.5, 0.5)), 2)
+            weight = round((weight + rng.uniform(-2, 2)), 2)
+            body_fat = round((body_fat + rng.uniform(-1, 1)), 2)
+            muscle_mass = round((muscle_mass + rng.uniform(-1, 1)), 2)
             bmi = round(weight / ((height / 100) ** 2), 2)
+            yield (athlete_id, today - timedelta(days=days_ago), height, weight, body_fat, muscle_mass, bmi)
 
-            measurements.append((athlete_id, measurement_date, height, weight, body_fat, muscle_mass, bmi))
-    
-    write_insert(output_file, 'BodyMeasurement', ['athlete_id', 'measurement_date', 'height', 'weight', 'body_fat_percentage', 'muscle_mass', 'bmi'], measurements)
-
-def generate_medical_assessments(output_file, athlete_ids, medical_ids):
-    assessment_types = ['Physical Examination', 'Injury Assessment', 'Clearance Check', 'Nutritional Consultation', 'Recovery Assessment']
-    
-    assessments = []
-    for athlete_id in athlete_ids:
-        num_assessments = random.randint(1, 3)
-        for i in range(num_assessments):
-            assessment = (
+def medical_assessments(plan, rng, fake, start, stop):
+    today = plan["today"]
+    for athlete_id in plan["athlete_ids"][start:stop]:
+        # distinct dates keep (athlete, medical, date) unique
+        for days_ago in rng.sample(range(183), rng.randint(1, 3)):
+            yield (
                 athlete_id,
-                random.choice(medical_ids),
-                fake.date_between(start_date='-6M', end_date='today'),
-                random.choice(assessment_types),
+                rng.choice(plan["medical_ids"]),
+                today - timedelta(days=days_ago),
+                rng.choice(ASSESSMENT_TYPES),
                 fake.text(max_nb_chars=300),
-                random.choice(['cleared', 'restricted', 'not_cleared'])
+                rng.choice(['cleared', 'restricted', 'not_cleared'])
             )
-            assessments.append(assessment)
-    
-    write_insert(output_file, 'MedicalAssessment', ['athlete_id', 'medical_id', 'assessment_date','assessment_type', 'notes', 'clearance_status'], assessments)
-
-def generate_trainer_feedback(output_file, trainer_ids, athlete_ids, session_ids):
-    feedback_list = []
-    keys = list(itertools.product(trainer_ids, athlete_ids, session_ids))
-    sample_size = min(200, len(keys))
-    selected_keys = random.sample(keys, sample_size)
-
-    for trainer_id, athlete_id, session_id in selected_keys:
-        feedback = (
-            trainer_id,
-            athlete_id,
-            session_id,
-            random.randint(1, 5),
+
+def trainer_feedback(plan, rng, fake, start, stop):
+    # sample positions in the trainer x athlete x session product directly;
+    # each shard covers the athletes start..stop and gets their share of rows
+    trainer_ids = plan["trainer_ids"]
+    athlete_ids = plan["athlete_ids"][start:stop]
+    sessions = plan["sessions"]
+    wanted = min(plan["feedback"], len(trainer_ids) * len(plan["athlete_ids"]) * sessions)
+    share = wanted * stop // len(plan["athlete_ids"]) - wanted * start // len(plan["athlete_ids"])
+    for key in rng.sample(range(len(trainer_ids) * len(athlete_ids) * sessions), share):
+        trainer, rest = divmod(key, len(athlete_ids) * sessions)
+        athlete, session = divmod(rest, sessions)
+        yield (
+            trainer_ids[trainer],
+            athlete_ids[athlete],
+            session + 1,
+            rng.randint(1, 5),
             fake.text(max_nb_chars=200)
         )
-        feedback_list.append(feedback)
 
-    write_insert(output_file, 'TrainerFeedback', ['trainer_id', 'athlete_id', 'session_id', 'rating', 'comments'], feedback_list)
+# in load order: (table, columns, generator, number of ids the table is sharded by)
+TABLES = [
+    ('User', ['user_id', 'first_name', 'last_name', 'email', 'phone', 'password_hash', 'gender', 'date_of_birth', 'registration_date', 'status'], users,
+     lambda plan: plan["users"]),
+    ('Athlete', ['athlete_id', 'sports_branch'], athletes,
+     lambda plan: len(plan["athlete_ids"])),
+    ('Staff', ['staff_id', 'hire_date', 'salary', 'employment_type'], staff,
+     lambda plan: len(plan["staff_ids"])),
+    ('Trainer', ['trainer_id', 'specialization', 'experience_years'], trainers,
+     lambda plan: len(plan["trainer_ids"])),
+    ('Medical', ['medical_id', 'profession', 'specialization_area'], medical,
+     lambda plan: len(plan["medical_ids"])),
+    ('TrainingProgram', ['program_id', 'program_name', 'difficulty_level', 'goal', 'start_date', 'end_date', 'created_by_trainer'], training_programs,
+     lambda plan: plan["programs"]),
+    ('ProgramEnrollment', ['athlete_id', 'program_id', 'enrollment_date', 'completion_status'], program_enrollments,
+     lambda plan: len(plan["athlete_ids"])),
+    ('Exercise', ['exercise_id', 'exercise_name', 'type', 'equipment_required', 'difficulty'], exercises,
+     lambda plan: plan["exercises"]),
+    ('WorkoutSession', ['session_id', 'program_id', 'session_date', 'duration', 'intensity_level'], workout_sessions,
+     lambda plan: plan["sessions"]),
+    ('SessionExercise', ['session_id', 'exercise_id', 'planned_sets', 'planned_reps', 'rest_duration'], session_exercise_rows,
+     lambda plan: plan["sessions"]),
+    ('PerformanceLog', ['athlete_id', 'session_id', 'exercise_id', 'completed_sets', 'completed_reps', 'weight_used', 'perceived_exertion', 'log_time'], performance_logs,
+     lambda plan: plan["sessions"]),
+    ('BodyMeasurement', ['athlete_id', 'measurement_date', 'height', 'weight', 'body_fat_percentage', 'muscle_mass', 'bmi'], body_measurements,
+     lambda plan: len(plan["athlete_ids"])),
+    ('MedicalAssessment', ['athlete_id', 'medical_id', 'assessment_date', 'assessment_type', 'notes', 'clearance_status'], medical_assessments,
+     lambda plan: len(plan["athlete_ids"])),
+    ('TrainerFeedback', ['trainer_id', 'athlete_id', 'session_id', 'rating', 'comments'], trainer_feedback,
+     lambda plan: len(plan["athlete_ids"]))
+]
+
+_plan = None
+
+def init_worker(plan):
+    global _plan
+    _plan = plan
+
+def shard_jobs(plan, parts_dir, output_format):
+    jobs = []
+    for index, (table, _, _, size) in enumerate(TABLES):
+        for shard, start in enumerate(range(0, size(plan), SHARD_SIZE)):
+            path = os.path.join(parts_dir, f"{index:02d}_{table}_{shard:05d}.part")
+            jobs.append((index, shard, start, min(start + SHARD_SIZE, size(plan)), path, output_format))
+    return jobs
+
+def generate_shard(job):
+    # runs in a worker: writes one shard of a table to its own part file
+    index, shard, start, stop, path, output_format = job
+    table, columns, generator, _ = TABLES[index]
+    rng = random.Random(f"{SEED}:{table}:{shard}")
+    fake = Faker()
+    fake.seed_instance(f"{SEED}:{table}:{shard}")
+
+    began = time.perf_counter()
+    manifest_path = path + '.manifest' if table == 'User' and _plan["manifest"] else os.devnull
+    with open(path, 'w', encoding='utf-8', newline='\n') as output_file, \
+         open(manifest_path, 'w', encoding='utf-8', newline='') as manifest_file:
+        rows = generator(_plan, rng, fake, start, stop)
+        if manifest_path != os.devnull:
+            rows = with_manifest(rows, manifest_file, columns)
+        if output_format == 'csv':
+            count = write_csv(output_file, rows)
+        else:
+            count = write_inserts(output_file, table, columns, rows)
+    return index, count, time.perf_counter() - began
+
+def with_manifest(rows, manifest_file, columns):
+    # passes User rows through, writing "email,password" for each of them
+    writer = csv.writer(manifest_file, lineterminator='\n')
+    plaintext = {password_hash: password for password, password_hash in _plan["password_hashes"].items()}
+    email, password_hash = columns.index('email'), columns.index('password_hash')
+    for row in rows:
+        writer.writerow((row[email], plaintext[row[password_hash]]))
+        yield row
+
+def concatenate(paths, target):
+    with open(target, 'w', encoding='utf-8', newline='\n') as output_file:
+        for path in paths:
+            with open(path, encoding='utf-8', newline='\n') as part:
+                shutil.copyfileobj(part, output_file)
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate the gym dataset")
+    parser.add_argument("--scale", type=int, default=1, help="multiply every row count by N")
+    parser.add_argument("--logs-per-athlete", type=int, default=LOGS_PER_ATHLETE)
+    parser.add_argument("--format", choices=["sql", "csv"], default="sql")
+    parser.add_argument("--output", help=f"SQL file (default {OUTPUT_FILE}) or CSV directory (default {CSV_DIR})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today(),
+                        help="reference date the generated dates are relative to (YYYY-MM-DD)")
+    parser.add_argument("--passwords", type=int, default=0,
+                        help=f"number of distinct random passwords (default: everyone uses {DEFAULT_PASSWORD})")
+    parser.add_argument("--password-rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost of the password hashes")
+    parser.add_argument("--manifest", help=f"email,password CSV for load tests (default {MANIFEST_FILE} with --passwords)")
+    args = parser.parse_args()
+    manifest = args.manifest or (MANIFEST_FILE if args.passwords else None)
+
+    output = args.output or (CSV_DIR if args.format == 'csv' else OUTPUT_FILE)
+    parts_dir = os.path.join(output, '.parts') if args.format == 'csv' else output + '.parts'
+    os.makedirs(parts_dir, exist_ok=True)
+
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as output_file:
-            user_ids = generate_users(output_file, NUM_USERS)
-            athlete_ids = generate_athletes(output_file, user_ids, NUM_ATHLETES)
-            staff_ids = generate_staff(output_file, user_ids, athlete_ids, NUM_STAFF)
-            trainer_ids = generate_trainers(output_file, staff_ids, NUM_TRAINERS)
-            medical_ids = generate_medical(output_file, staff_ids, trainer_ids, NUM_MEDICAL)
-            program_ids = generate_training_programs(output_file, trainer_ids, NUM_PROGRAMS)
-            generate_program_enrollments(output_file, athlete_ids, program_ids)
-            exercise_ids = generate_exercises(output_file, NUM_EXERCISES)
-            session_ids = generate_workout_sessions(output_file, program_ids)
-            session_exercises = generate_session_exercises(output_file, session_ids, exercise_ids)
-            generate_performance_logs(output_file, athlete_ids, session_exercises)
-            generate_body_measurements(output_file, athlete_ids)
-            generate_medical_assessments(output_file, athlete_ids, medical_ids)
-            generate_trainer_feedback(output_file, trainer_ids, athlete_ids, session_ids)
-            print(f"Data generation complete. SQL queries written to {OUTPUT_FILE}")
+        began = time.perf_counter()
+        password_hashes = make_password_hashes(args.passwords, args.password_rounds, args.workers)
+        print(f"Hashed {len(password_hashes)} password(s) in {time.perf_counter() - began:.1f}s")
+        plan = make_plan(args.scale, args.logs_per_athlete, args.today, password_hashes, manifest)
+        jobs = shard_jobs(plan, parts_dir, args.format)
+        if args.workers > 1:
+            with Pool(args.workers, initializer=init_worker, initargs=(plan,)) as pool:
+                # biggest tables first so they do not finish last
+                results = list(pool.imap_unordered(generate_shard, reversed(jobs)))
+        else:
+            init_worker(plan)
+            results = [generate_shard(job) for job in jobs]
+
+        # shards are joined in (table, shard) order, independent of which worker made them
+        if args.format == 'csv':
+            with open(os.path.join(output, 'load_data.sql'), 'w', encoding='utf-8') as load_file:
+                for index, (table, columns, _, _) in enumerate(TABLES):
+                    path = os.path.join(output, f"{table}.csv")
+                    concatenate([job[4] for job in jobs if job[0] == index], path)
+                    load_file.write(load_data_sql(path, table, columns))
+        else:
+            concatenate([job[4] for job in jobs], output)
+        if manifest:
+            with open(manifest, 'w', encoding='utf-8', newline='') as manifest_file:
+                manifest_file.write("email,password\n")
+                for job in jobs:
+                    if TABLES[job[0]][0] == 'User':
+                        with open(job[4] + '.manifest', encoding='utf-8', newline='') as part:
+                            shutil.copyfileobj(part, manifest_file)
+        shutil.rmtree(parts_dir)
+
+        for index, (table, _, _, _) in enumerate(TABLES):
+            count = sum(r[1] for r in results if r[0] == index)
+            seconds = sum(r[2] for r in results if r[0] == index)
+            print(f"{table:20} {count:>10} rows  {seconds:7.2f}s")
+        print(f"Data generation complete in {time.perf_counter() - began:.1f}s. Output written to {output}")
+        if manifest:
+            print(f"Passwords written to {manifest}")
     except Exception as e:
+        shutil.rmtree(parts_dir, ignore_errors=True)
         print(f"Error occurred: {e}")
-        
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+# Hashing configuration (override through environment variables)
+BCRYPT_ROUNDS = int(os.environ.get("GYM_BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("GYM_HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_LIMIT = int(os.environ.get("GYM_HASH_QUEUE_LIMIT", 32))  # jobs allowed to wait behind the busy workers
+
+class HashingBusy(Exception):
+    pass
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+def _checkpw(password, stored_hash):
+    return bcrypt.checkpw(password, stored_hash)
+
+class HashingExecutor:
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._jobs = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def run(self, fun, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy("Password hashing queue is full")
+
+        with self._lock:
+            self._pending += 1
+        start = time.monotonic()
+        try:
+            return self._get_executor().submit(fun, *args).result()
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._pending -= 1
+                self._jobs += 1
+                self._latency_total += elapsed
+                self._latency_max = max(self._latency_max, elapsed)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "queue_depth": self._pending,
+                "rejected": self._rejected,
+                "jobs": self._jobs,
+                "latency_total": round(self._latency_total, 6),
+                "latency_max": round(self._latency_max, 6),
+                "latency_avg": round(self._latency_total / self._jobs, 6) if self._jobs else 0.0
+            }
+
+executor = HashingExecutor()
+
+def hash_password(password):
+    return executor.run(_hashpw, password.encode("utf-8"), BCRYPT_ROUNDS)
+
+def check_password(password, stored_hash):
+    if isinstance(stored_hash, str):
+        stored_hash = stored_hash.encode("utf-8")
+    return executor.run(_checkpw, password.encode("utf-8"), stored_hash)
+
+def needs_rehash(stored_hash):
+    # bcrypt hashes look like $2b$12$..., the second field is the cost
+    if isinstance(stored_hash, bytes):
+        stored_hash = stored_hash.decode("utf-8")
+    try:
+        return int(stored_hash.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
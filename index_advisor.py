@@ -0,0 +1,113 @@
+import sys
+from app import app
+from cache import backend
+from db import get_db_connection
+from gym_faker import DEFAULT_PASSWORD
+from profiling import fingerprint, watch
+from query_budget import ROUTES, sample_values, route_request
+
+# Requests every route through the Flask test client against the local
+# (seeded) database and runs EXPLAIN / EXPLAIN ANALYZE on each statement the
+# routes actually executed, whichever module built it (routes.py,
+# pagination.py, analytics.py, bulk.py, summaries.py, leaderboard.py, ...).
+# GET routes are also requested as a first and a second page (?limit, then
+# ?after) so the keyset SQL built by pagination.py is checked as it runs.
+# Fails if any statement reads a base table with a full scan.
+#
+# The routes and sample values are the ones of query_budget.py. The write
+# routes really write, so run it against a scratch database or pass
+# --read-only (which leaves the bulk and rollup statements unchecked).
+#
+# Usage: python index_advisor.py [--analyze] [--read-only] [--password PASSWORD]
+
+PAGE_SIZE = 2
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE")
+
+# endpoints that list a whole table on purpose
+ALLOWED_SCANS = {
+    "get_athletes": {"a", "athlete"},
+    "get_available_training_programs": {"tp", "trainingprogram"},
+}
+
+def page_urls(client, url, headers):
+    # the first page, then the page after it when there is one
+    first = url + ("&" if "?" in url else "?") + f"limit={PAGE_SIZE}"
+    response = client.get(first, headers=headers)
+    response.get_data()
+    cursor = response.headers.get("X-Next-Cursor")
+    response.close()
+    return [first + f"&after={cursor}"] if cursor else []
+
+def route_statements(read_only, password):
+    # endpoint -> {fingerprint: (sql, params)} of the statements its requests ran
+    values = sample_values(password)
+    client = app.test_client()
+    found = {}
+    for endpoint, user, method, url, body, write, _ in ROUTES:
+        if (write and read_only) or endpoint not in app.view_functions:
+            continue
+        try:
+            request_url, request_body, headers = route_request(values, user, url, body)
+        except KeyError as e:
+            print(f"{endpoint:40} skipped, no sample value for {e}")
+            continue
+
+        backend.clear()
+        with watch() as seen:
+            response = client.open(request_url, method=method, json=request_body, headers=headers)
+            response.get_data()
+            response.close()
+            if method == "GET":
+                for page_url in page_urls(client, request_url, headers):
+                    client.get(page_url, headers=headers).close()
+        statements = found.setdefault(endpoint, {})
+        for stats in seen:
+            for sql, params in stats.executed:
+                if sql.split(None, 1)[0].upper() in EXPLAINABLE:
+                    statements.setdefault(fingerprint(sql), (sql, params))
+    return found
+
+def full_scans(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    scans = []
+    for row in cursor.fetchall():
+        table = row["table"] or ""
+        if row["type"] == "ALL" and not table.startswith("<"):
+            scans.append(table)
+    return scans
+
+def main():
+    args = sys.argv[1:]
+    analyze = "--analyze" in args
+    read_only = "--read-only" in args
+    password = args[args.index("--password") + 1] if "--password" in args else DEFAULT_PASSWORD
+
+    found = route_statements(read_only, password)
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    failures = 0
+    try:
+        for endpoint, statements in found.items():
+            for statement, (sql, params) in statements.items():
+                scans = [t for t in full_scans(cursor, sql, params)
+                         if t.lower() not in ALLOWED_SCANS.get(endpoint, set())]
+                status = "FULL SCAN on " + ", ".join(scans) if scans else "ok"
+                print(f"{endpoint:40} {status}  {statement[:100]}")
+                if scans:
+                    failures += 1
+
+                # EXPLAIN ANALYZE runs the statement, so only for reads
+                if analyze and sql.split(None, 1)[0].upper() in ("SELECT", "WITH"):
+                    cursor.execute("EXPLAIN ANALYZE " + sql, params)
+                    for row in cursor.fetchall():
+                        print("    " + list(row.values())[0].replace("\n", "\n    "))
+    finally:
+        cursor.close()
+        conn.close()
+
+    if failures:
+        print(f"{failures} statements do a full table scan")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import sys
+from db import connect_first
+from summaries import refresh_session_adherence
+from versions import GLOBAL_TAG, touch
+
+# Per-program leaderboard kept in ProgramLeaderboard: one row per
+# (program, athlete) with the logged session count, the RPE sum/count and
+# the athlete's rank in the program. Rows are recomputed per program from
+# SessionAdherence when logs for that program arrive, so the endpoint only
+# reads the top ranked rows of the trainer's programs.
+#
+# Usage: python leaderboard.py rebuild
+#        python leaderboard.py check [--repair]
+
+LEADERBOARD_COLUMNS = "program_id, athlete_id, logged_sessions, rpe_total, rpe_count, avg_rpe"
+
+LEADERBOARD_SELECT = """
+    SELECT
+        program_id,
+        athlete_id,
+        COUNT(*),
+        SUM(rpe_total),
+        SUM(rpe_count),
+        ROUND(SUM(rpe_total) / NULLIF(SUM(rpe_count), 0), 2)
+    FROM SessionAdherence
+    {where}
+    GROUP BY program_id, athlete_id
+"""
+
+LEADERBOARD_RANK_UPDATE = """
+    UPDATE ProgramLeaderboard lb
+    JOIN (
+        SELECT
+            program_id,
+            athlete_id,
+            RANK() OVER (
+                PARTITION BY program_id
+                ORDER BY logged_sessions DESC, avg_rpe DESC
+            ) AS rnk
+        FROM ProgramLeaderboard
+        {where}
+    ) r ON r.program_id = lb.program_id AND r.athlete_id = lb.athlete_id
+    SET lb.rnk = r.rnk
+"""
+
+# the leaderboard as defined over the raw logs; "check" compares against it
+LEADERBOARD_DEFINITION_SQL = """
+    WITH per_prog AS (
+        SELECT
+            ws.program_id,
+            pl.athlete_id,
+            COUNT(DISTINCT pl.session_id) AS logged_sessions,
+            ROUND(AVG(pl.perceived_exertion), 2) AS avg_rpe
+        FROM PerformanceLog pl
+        JOIN WorkoutSession ws ON ws.session_id = pl.session_id
+        GROUP BY ws.program_id, pl.athlete_id
+    )
+    SELECT
+        *,
+        RANK() OVER (
+            PARTITION BY program_id
+            ORDER BY logged_sessions DESC, avg_rpe DESC
+        ) AS rnk
+    FROM per_prog
+"""
+
+def refresh_leaderboard(cursor, program_ids):
+    # program_ids: programs whose sessions got new or changed logs;
+    # SessionAdherence must already be up to date for them
+    program_ids = sorted(set(program_ids))
+    if not program_ids:
+        return
+    marks = ", ".join(["%s"] * len(program_ids))
+    where = f"WHERE program_id IN ({marks})"
+    cursor.execute(f"DELETE FROM ProgramLeaderboard {where}", program_ids)
+    cursor.execute(
+        f"INSERT INTO ProgramLeaderboard ({LEADERBOARD_COLUMNS}) {LEADERBOARD_SELECT.format(where=where)}",
+        program_ids)
+    cursor.execute(LEADERBOARD_RANK_UPDATE.format(where=where), program_ids)
+
+@connect_first
+def rebuild_leaderboard(cursor):
+    cursor.execute("DELETE FROM ProgramLeaderboard")
+    cursor.execute(f"INSERT INTO ProgramLeaderboard ({LEADERBOARD_COLUMNS}) {LEADERBOARD_SELECT.format(where='')}")
+    rows = cursor.rowcount
+    cursor.execute(LEADERBOARD_RANK_UPDATE.format(where=""))
+    touch(cursor, GLOBAL_TAG)
+    return rows
+
+@connect_first
+def check_leaderboard(cursor):
+    # returns the program ids whose stored rows differ from the definition
+    fields = ("logged_sessions", "avg_rpe", "rnk")
+    cursor.execute(LEADERBOARD_DEFINITION_SQL)
+    expected = {(r["program_id"], r["athlete_id"]): tuple(r[f] for f in fields) for r in cursor.fetchall()}
+    cursor.execute("SELECT program_id, athlete_id, logged_sessions, avg_rpe, rnk FROM ProgramLeaderboard")
+    stored = {(r["program_id"], r["athlete_id"]): tuple(r[f] for f in fields) for r in cursor.fetchall()}
+
+    mismatched = set()
+    for key in sorted(expected.keys() | stored.keys()):
+        if expected.get(key) != stored.get(key):
+            print(f"program {key[0]} athlete {key[1]}: expected {expected.get(key)}, stored {stored.get(key)}")
+            mismatched.add(key[0])
+    return sorted(mismatched)
+
+@connect_first
+def repair_leaderboard(cursor, program_ids):
+    marks = ", ".join(["%s"] * len(program_ids))
+    cursor.execute(f"SELECT session_id FROM WorkoutSession WHERE program_id IN ({marks})", program_ids)
+    refresh_session_adherence(cursor, [row["session_id"] for row in cursor.fetchall()])
+    refresh_leaderboard(cursor, program_ids)
+    touch(cursor, *[f"program:{p}" for p in program_ids])
+    cursor.execute(
+        f"SELECT DISTINCT created_by_trainer FROM TrainingProgram WHERE program_id IN ({marks}) AND created_by_trainer IS NOT NULL",
+        program_ids)
+    touch(cursor, *[f"trainer:{row['created_by_trainer']}" for row in cursor.fetchall()])
+
+if __name__ == "__main__":
+    command = sys.argv[1:]
+    if command == ["rebuild"]:
+        print(f"Rebuilt ProgramLeaderboard: {rebuild_leaderboard()} rows")
+    elif command and command[0] == "check" and set(command[1:]) <= {"--repair"}:
+        mismatched = check_leaderboard()
+        if not mismatched:
+            print("ProgramLeaderboard matches the logs")
+        elif "--repair" in command:
+            repair_leaderboard(mismatched)
+            print(f"Repaired programs: {', '.join(map(str, mismatched))}")
+        else:
+            print(f"{len(mismatched)} program(s) out of date, run with --repair to fix them")
+            sys.exit(1)
+    else:
+        print("Usage: python leaderboard.py rebuild | check [--repair]")
+        sys.exit(1)
@@ -0,0 +1,223 @@
+import argparse
+import os
+import queue
+import re
+import threading
+import time
+from db import ConnectionPool, load_credentials
+from gym_faker import OUTPUT_FILE, TABLES, load_data_sql
+
+# Loads gym_faker output into the database.
+#
+#   python loader.py [insertion_queries.txt]   runs the multi-row INSERTs
+#   python loader.py dataset                   LOAD DATA LOCAL INFILE per CSV
+#
+# The input is read one statement at a time and executed by --workers
+# threads, each on its own pooled connection with foreign_key_checks and
+# unique_checks turned off (and back on before the connection is
+# returned). Secondary indexes that no foreign key depends on are dropped
+# before the load and recreated afterwards in one ALTER TABLE per table.
+# Finally the summary tables are rebuilt.
+
+LOAD_WORKERS = int(os.environ.get("GYM_LOAD_WORKERS", 4))
+
+INSERT_TABLE = re.compile(r"INSERT\s+INTO\s+`?(\w+)`?", re.IGNORECASE)
+
+def sql_statements(path):
+    # yields (table, statement); gym_faker ends every statement with ";" at the end of a line
+    lines = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not lines and not line.strip():
+                continue
+            lines.append(line)
+            if line.rstrip().endswith(";"):
+                statement = "".join(lines)
+                lines = []
+                match = INSERT_TABLE.match(statement.lstrip())
+                yield (match.group(1) if match else "other"), statement
+    if lines and "".join(lines).strip():
+        raise ValueError(f"{path} ends with an unterminated statement")
+
+def csv_statements(directory):
+    for table, columns, _, _ in TABLES:
+        path = os.path.join(directory, f"{table}.csv")
+        if os.path.exists(path):
+            yield table, load_data_sql(path, table, columns)
+
+def deferrable_indexes(cursor, tables):
+    # {table: [(index, [column sql])]} for non-unique secondary indexes
+    # that can be dropped without leaving a foreign key unindexed
+    cursor.execute("""
+        SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """)
+    indexes = {}
+    for row in cursor.fetchall():
+        column = f"`{row['COLUMN_NAME']}`" + (f"({row['SUB_PART']})" if row["SUB_PART"] else "")
+        index = indexes.setdefault((row["TABLE_NAME"], row["INDEX_NAME"]), {"unique": not row["NON_UNIQUE"], "columns": [], "sql": []})
+        index["columns"].append(row["COLUMN_NAME"])
+        index["sql"].append(column)
+
+    cursor.execute("""
+        SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+        ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+    """)
+    foreign_keys = {}
+    for row in cursor.fetchall():
+        foreign_keys.setdefault((row["TABLE_NAME"], row["CONSTRAINT_NAME"]), []).append(row["COLUMN_NAME"])
+
+    keep = {key for key, index in indexes.items() if index["unique"]}
+    for (table, _), columns in foreign_keys.items():
+        covering = sorted(key for key, index in indexes.items()
+                          if key[0] == table and index["columns"][:len(columns)] == columns)
+        if covering and not keep.intersection(covering):
+            keep.add(covering[0])
+
+    # information_schema reports lowercase names under lower_case_table_names=1
+    # (the Windows default), so match the tables case-insensitively
+    wanted = {t.lower() for t in tables}
+    deferred = {}
+    for key in sorted(indexes):
+        if key[0].lower() in wanted and key not in keep:
+            deferred.setdefault(key[0], []).append((key[1], indexes[key]["sql"]))
+    return deferred
+
+def drop_indexes(cursor, deferred, dropped):
+    # dropped collects what has to be restored, even if a later ALTER fails
+    for table, indexes in deferred.items():
+        drops = ", ".join(f"DROP INDEX `{name}`" for name, _ in indexes)
+        cursor.execute(f"ALTER TABLE `{table}` {drops}")
+        dropped[table] = indexes
+        print(f"Deferred {len(indexes)} index(es) on {table}: {', '.join(name for name, _ in indexes)}")
+
+def restore_indexes(cursor, deferred):
+    for table, indexes in deferred.items():
+        start = time.perf_counter()
+        adds = ", ".join(f"ADD INDEX `{name}` ({', '.join(columns)})" for name, columns in indexes)
+        cursor.execute(f"ALTER TABLE `{table}` {adds}")
+        print(f"Rebuilt {len(indexes)} index(es) on {table} in {time.perf_counter() - start:.1f}s")
+
+class LoadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tables = {}
+
+    def record(self, table, rows, start, end):
+        with self._lock:
+            stats = self.tables.setdefault(table, {"rows": 0, "statements": 0, "start": start, "end": end})
+            stats["rows"] += rows
+            stats["statements"] += 1
+            stats["start"] = min(stats["start"], start)
+            stats["end"] = max(stats["end"], end)
+
+def load_worker(pool, statements, stats, errors):
+    conn = pool.acquire()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        while True:
+            item = statements.get()
+            if item is None:
+                return
+            if errors:
+                # another worker failed; keep draining so the reader is not blocked
+                continue
+            table, statement = item
+            try:
+                start = time.perf_counter()
+                cursor.execute(statement)
+                rows = cursor.rowcount
+                conn.commit()
+                stats.record(table, rows, start, time.perf_counter())
+            except Exception as e:
+                conn.rollback()
+                errors.append(e)
+    finally:
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        cursor.close()
+        conn.close()
+
+def load(pool, statements, workers):
+    stats = LoadStats()
+    errors = []
+    pending = queue.Queue(maxsize=workers * 2)
+    threads = [threading.Thread(target=load_worker, args=(pool, pending, stats, errors)) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for item in statements:
+            if errors:
+                break
+            pending.put(item)
+    finally:
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return stats
+
+def rebuild_summaries():
+    from summaries import rebuild_exercise_summary, rebuild_session_adherence
+    from leaderboard import rebuild_leaderboard
+    for name, rebuild in [("AthleteExerciseSummary", rebuild_exercise_summary),
+                          ("SessionAdherence", rebuild_session_adherence),
+                          ("ProgramLeaderboard", rebuild_leaderboard)]:
+        start = time.perf_counter()
+        rows = rebuild()
+        print(f"Rebuilt {name}: {rows} rows in {time.perf_counter() - start:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load gym_faker output")
+    parser.add_argument("path", nargs="?", default=OUTPUT_FILE, help="SQL file or CSV directory")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS)
+    parser.add_argument("--keep-indexes", action="store_true", help="do not defer secondary index builds")
+    parser.add_argument("--skip-summaries", action="store_true", help="do not rebuild the summary tables")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.path):
+        statements = csv_statements(args.path)
+    else:
+        statements = sql_statements(args.path)
+
+    credentials = dict(load_credentials(), allow_local_infile=True)
+    pool = ConnectionPool(credentials, size=args.workers + 1)
+    admin = pool.acquire()
+    cursor = admin.cursor(dictionary=True)
+    try:
+        deferred = {} if args.keep_indexes else deferrable_indexes(cursor, {t[0] for t in TABLES})
+        if not args.keep_indexes and not deferred:
+            print("No secondary indexes to defer")
+        dropped = {}
+        try:
+            drop_indexes(cursor, deferred, dropped)
+            start = time.perf_counter()
+            stats = load(pool, statements, args.workers)
+            elapsed = time.perf_counter() - start
+        finally:
+            restore_indexes(cursor, dropped)
+    finally:
+        cursor.close()
+        admin.close()
+
+    total = 0
+    for table in [t[0] for t in TABLES] + sorted(set(stats.tables) - {t[0] for t in TABLES}):
+        if table not in stats.tables:
+            continue
+        table_stats = stats.tables[table]
+        seconds = max(table_stats["end"] - table_stats["start"], 1e-9)
+        total += table_stats["rows"]
+        print(f"{table:20} {table_stats['rows']:>10} rows  {seconds:7.2f}s  {table_stats['rows'] / seconds:>10.0f} rows/s")
+    print(f"Loaded {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s)")
+
+    if not args.skip_summaries:
+        rebuild_summaries()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+USE gym;
+
+CREATE TABLE IF NOT EXISTS AthleteExerciseSummary (
+    athlete_id INT NOT NULL,
+    exercise_id INT NOT NULL,
+    last_session_id INT,
+    last_weight_used DECIMAL(6,2),
+    last_completed_sets INT,
+    last_completed_reps INT,
+    last_perceived_exertion INT,
+    last_log_time DATETIME,
+    total_volume DECIMAL(14,2) NOT NULL DEFAULT 0,
+    volume_rank INT,
+    PRIMARY KEY (athlete_id, exercise_id),
+    KEY idx_summary_rank (athlete_id, volume_rank),
+    CONSTRAINT fk_summary_athlete
+        FOREIGN KEY (athlete_id) REFERENCES Athlete(athlete_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_summary_exercise
+        FOREIGN KEY (exercise_id) REFERENCES Exercise(exercise_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+-- fill it from the existing logs with: python summaries.py rebuild
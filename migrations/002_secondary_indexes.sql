@@ -0,0 +1,25 @@
+USE gym;
+
+-- Secondary indexes for the queries in routes.py. User is always reached by
+-- primary key from Athlete in /query, so user.status needs no index of its own.
+
+-- /api/trainingPrograms, /api/leaderboard, /api/trainer/<id>/athletes
+CREATE INDEX idx_program_trainer ON TrainingProgram (created_by_trainer, program_id, program_name, start_date, end_date);
+
+-- /api/athletePrograms/notEnrolled
+CREATE INDEX idx_program_start ON TrainingProgram (start_date);
+
+-- /api/workoutSessions/<program_id>
+CREATE INDEX idx_session_program_date ON WorkoutSession (program_id, session_date);
+
+-- per-athlete log history ordered by time
+CREATE INDEX idx_log_athlete_time ON PerformanceLog (athlete_id, log_time);
+
+-- /api/leaderboard (per-session athlete counts and RPE)
+CREATE INDEX idx_log_session_athlete ON PerformanceLog (session_id, athlete_id, perceived_exertion);
+
+-- /api/medicalAssessments
+CREATE INDEX idx_assessment_athlete_date ON MedicalAssessment (athlete_id, assessment_date);
+
+-- /query
+CREATE INDEX idx_athlete_branch ON Athlete (sports_branch);
@@ -0,0 +1,9 @@
+USE gym;
+
+CREATE TABLE IF NOT EXISTS EntityVersion (
+    entity VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL
+) ENGINE=InnoDB;
+
+-- a fresh database gets a new global version so old ETags never match
+INSERT IGNORE INTO EntityVersion (entity, version) VALUES ('*', UUID_SHORT());
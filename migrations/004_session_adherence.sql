@@ -0,0 +1,30 @@
+USE gym;
+
+CREATE TABLE IF NOT EXISTS SessionAdherence (
+    athlete_id INT NOT NULL,
+    session_id INT NOT NULL,
+    program_id INT NOT NULL,
+    session_date DATE NOT NULL,
+    completed_sets INT,
+    planned_sets INT,
+    completed_reps INT,
+    planned_reps INT,
+    rpe_total INT,
+    rpe_count INT NOT NULL DEFAULT 0,
+    percentage_sets_done DECIMAL(8,2),
+    percentage_reps_done DECIMAL(8,2),
+    average_rate_of_perceived_exertion DECIMAL(4,2),
+    PRIMARY KEY (athlete_id, session_id),
+    KEY idx_adherence_session (session_id),
+    KEY idx_adherence_program (program_id, session_date),
+    CONSTRAINT fk_adherence_athlete
+        FOREIGN KEY (athlete_id) REFERENCES Athlete(athlete_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_adherence_session
+        FOREIGN KEY (session_id) REFERENCES WorkoutSession(session_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+-- fill it from the existing logs with: python summaries.py rebuild
@@ -0,0 +1,23 @@
+USE gym;
+
+CREATE TABLE IF NOT EXISTS ProgramLeaderboard (
+    program_id INT NOT NULL,
+    athlete_id INT NOT NULL,
+    logged_sessions INT NOT NULL,
+    rpe_total INT,
+    rpe_count INT NOT NULL DEFAULT 0,
+    avg_rpe DECIMAL(4,2),
+    rnk INT,
+    PRIMARY KEY (program_id, athlete_id),
+    KEY idx_leaderboard_rank (program_id, rnk),
+    CONSTRAINT fk_leaderboard_program
+        FOREIGN KEY (program_id) REFERENCES TrainingProgram(program_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_leaderboard_athlete
+        FOREIGN KEY (athlete_id) REFERENCES Athlete(athlete_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+-- fill it with: python summaries.py rebuild
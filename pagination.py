@@ -0,0 +1,106 @@
+import base64
+import json
+from flask import request, jsonify
+from db import connect_first
+from streaming import stream_json
+
+# Keyset pagination for list endpoints.
+#
+#   ?limit=N      page size (at most MAX_PAGE_SIZE), all rows when omitted
+#   ?after=TOKEN  continue after the row the token was issued for
+#   ?fields=a,b   only return these columns
+#
+# Rows are still returned as a plain JSON array; when more rows are
+# available the token for the next page is sent in the X-Next-Cursor header.
+# Endpoints can ask for the unlimited case to be streamed (see streaming.py).
+
+MAX_PAGE_SIZE = 500
+
+class PageError(ValueError):
+    pass
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise PageError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise PageError("Invalid cursor")
+    # the values become SQL parameters, so only one scalar per key column
+    if any(isinstance(v, bool) or not isinstance(v, (str, int, float)) for v in values):
+        raise PageError("Invalid cursor")
+    return values
+
+def page_args(columns):
+    limit = request.args.get("limit")
+    if limit is not None:
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            raise PageError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        limit = int(limit)
+
+    fields = request.args.get("fields")
+    if fields:
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise PageError("Unknown fields: " + ", ".join(unknown))
+    else:
+        fields = list(columns)
+
+    return limit, request.args.get("after"), fields
+
+def keyset_sql(sql, keys, fields, after, limit):
+    # sql is the unordered base query, keys a list of (column, "ASC"/"DESC")
+    # that is unique across its rows
+    names = [k for k, _ in keys]
+    select = ", ".join(f"`{c}`" for c in dict.fromkeys(fields + names))
+    params = []
+    where = ""
+    if after is not None:
+        alternatives = []
+        for i, (key, direction) in enumerate(keys):
+            terms = [f"`{k}` = %s" for k in names[:i]]
+            terms.append(f"`{key}` {'<' if direction == 'DESC' else '>'} %s")
+            alternatives.append("(" + " AND ".join(terms) + ")")
+            params.extend(after[:i + 1])
+        where = "WHERE " + " OR ".join(alternatives)
+    order = ", ".join(f"`{k}` {d}" for k, d in keys)
+    page = f"SELECT {select} FROM ({sql}) page {where} ORDER BY {order}"
+    if limit is not None:
+        page += f" LIMIT {limit + 1}"
+    return page, params
+
+@connect_first
+def fetch_page(cursor, sql, params, keys, limit, hidden):
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor([rows[-1][k] for k, _ in keys])
+
+    for row in rows:
+        for k in hidden:
+            del row[k]
+    return jsonify(rows), 200, headers
+
+def paginate(sql, params, keys, columns, stream=False):
+    try:
+        limit, after, fields = page_args(columns)
+        if after is not None:
+            after = decode_cursor(after, len(keys))
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
+    page_sql, page_params = keyset_sql(sql, keys, fields, after, limit)
+    params = tuple(params) + tuple(page_params)
+    hidden = [k for k, _ in keys if k not in fields]
+    if stream and limit is None:
+        return stream_json(page_sql, params, drop=hidden)
+    return fetch_page(page_sql, params, keys, limit, hidden)
@@ -0,0 +1,384 @@
+import contextvars
+import hmac
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from flask import Response, g, request
+
+# Per-request SQL instrumentation. While a Flask request is running, every
+# cursor handed out by the connection pool (connect_first, unit_of_work and
+# raw get_db_connection callers alike) is wrapped in a TimedCursor that
+# records each statement's fingerprint, duration (execute plus fetches) and
+# rows returned, and the pool reports how long the connection took to
+# acquire. Everything is attributed to the request's Flask endpoint.
+#
+#   /metrics        (with GYM_METRICS_TOKEN set, for requests carrying
+#                   "Authorization: Bearer <GYM_METRICS_TOKEN>")
+#                   Prometheus text format: per-route histograms of request
+#                   time, DB time, queries and acquire time, and per
+#                   statement fingerprint totals, plus the connection pool
+#                   and password hashing queue counters
+#   Server-Timing   db, acquire and app durations on every response
+#   slow queries    statements slower than GYM_SLOW_QUERY_MS are logged to
+#                   the "gym.slow_queries" logger (GYM_SLOW_QUERY_LOG=path
+#                   writes them to a file); GYM_EXPLAIN_SAMPLE_RATE of the
+#                   slow SELECTs also get their EXPLAIN plan logged
+#
+# watch() hands the stats of finished requests to query_budget.py, which
+# checks every route against a declared query budget, and to
+# index_advisor.py, which EXPLAINs the statements they ran.
+#
+# Cursors created outside a request (CLI tools, loader.py) are not wrapped.
+# Rows fetched by a streamed response arrive after Server-Timing is sent and
+# only show up in the metrics.
+
+PROFILING = os.environ.get("GYM_PROFILING", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("GYM_SLOW_QUERY_MS", 200))
+SLOW_QUERY_LOG = os.environ.get("GYM_SLOW_QUERY_LOG")
+EXPLAIN_SAMPLE_RATE = float(os.environ.get("GYM_EXPLAIN_SAMPLE_RATE", 0))  # 0..1 of the slow SELECTs
+METRICS_TOKEN = os.environ.get("GYM_METRICS_TOKEN")  # /metrics is only served with this bearer token
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_log = logging.getLogger("gym.slow_queries")
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_log.addHandler(_handler)
+    slow_log.setLevel(logging.INFO)
+
+# stats of the request running in this context
+_current = contextvars.ContextVar("profiling_request", default=None)
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+ROW_LIST = re.compile(r"\(\(\?\+\)(?: ?, ?\(\?\+\))*\)")  # IN ((?, ?), (?, ?), ...)
+REPEATED_ROWS = re.compile(r"(VALUES )(\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\))(?: ?, ?\2)+", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    # the statement with literals and placeholders replaced by "?", IN lists
+    # and multi-row VALUES collapsed, and whitespace normalized
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = PLACEHOLDER.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = WHITESPACE.sub(" ", sql).strip().rstrip(";").strip()
+    sql = PLACEHOLDER_LIST.sub("(?+)", sql)
+    sql = ROW_LIST.sub("((?+)+)", sql)
+    return REPEATED_ROWS.sub(r"\1\2+", sql)
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = format_labels(label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{{{base},le=\"{bound}\"}} {count}")
+            lines.append(f"{self.name}_bucket{{{base},le=\"+Inf\"}} {series[-1]}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+
+    def inc(self, labels, value=1):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{format_labels(label_names, labels)}}} {format_value(value)}")
+        return lines
+
+def format_value(value):
+    # every digit, never an exponent: long-running totals lose precision with :g
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def format_labels(names, values):
+    escape = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+_metrics_lock = threading.Lock()
+ROUTE_METRICS = [
+    Histogram("gym_request_duration_seconds", "Time spent handling the request", DURATION_BUCKETS),
+    Histogram("gym_request_db_seconds", "Time spent in SQL statements per request", DURATION_BUCKETS),
+    Histogram("gym_request_queries", "SQL statements per request", COUNT_BUCKETS),
+    Histogram("gym_request_connections", "Pool checkouts per request", COUNT_BUCKETS),
+    Histogram("gym_db_acquire_seconds", "Time to acquire a pooled connection", DURATION_BUCKETS),
+    Histogram("gym_db_query_seconds", "Duration of a single SQL statement", DURATION_BUCKETS),
+    Counter("gym_db_rows_returned_total", "Rows fetched by SQL statements"),
+    Counter("gym_db_connections_opened_total", "New database connections opened"),
+    Counter("gym_db_slow_queries_total", f"Statements slower than {SLOW_QUERY_MS:g} ms"),
+]
+(request_seconds, request_db_seconds, request_queries, request_connections,
+ acquire_seconds, query_seconds, rows_returned, connections_opened, slow_queries) = ROUTE_METRICS
+statement_count = Counter("gym_db_statements_total", "Executions per statement fingerprint")
+statement_seconds = Counter("gym_db_statement_seconds_total", "Time spent per statement fingerprint")
+POOL_METRICS = [
+    ("gym_db_pool_size", "size", "gauge"),
+    ("gym_db_pool_in_use", "in_use", "gauge"),
+    ("gym_db_pool_idle", "idle", "gauge"),
+    ("gym_db_pool_opened_total", "opened", "counter"),
+    ("gym_db_pool_recycled_total", "recycled", "counter"),
+    ("gym_db_pool_checkouts_total", "checkouts", "counter"),
+    ("gym_db_pool_checkout_wait_seconds_total", "checkout_wait_total", "counter"),
+]
+HASH_METRICS = [
+    ("gym_hash_workers", "workers", "gauge"),
+    ("gym_hash_queue_limit", "queue_limit", "gauge"),
+    ("gym_hash_queue_depth", "queue_depth", "gauge"),
+    ("gym_hash_rejected_total", "rejected", "counter"),
+    ("gym_hash_jobs_total", "jobs", "counter"),
+    ("gym_hash_job_seconds_total", "latency_total", "counter"),
+    ("gym_hash_job_seconds_max", "latency_max", "gauge"),
+]
+
+class RequestStats:
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.acquire_time = 0.0
+        self.checkouts = 0
+        self.opened = 0
+        self.commits = 0
+        self.statements = []  # fingerprints in execution order
+        self.explains = []  # (sql, params) of sampled slow SELECTs
+        self.executed = [] if _watchers else None  # (sql, params) of every statement, only under watch()
+        self.finished = False
+
+    def record_statement(self, sql, params, duration, rows):
+        route = (self.route,)
+        key = (self.route, fingerprint(sql))
+        self.queries += 1
+        self.statements.append(key[1])
+        if self.executed is not None and params is not None:
+            self.executed.append((sql, params))
+        self.db_time += duration
+        self.rows += rows
+        with _metrics_lock:
+            query_seconds.observe(route, duration)
+            rows_returned.inc(route, rows)
+            statement_count.inc(key)
+            statement_seconds.inc(key, duration)
+            if duration * 1000 >= SLOW_QUERY_MS:
+                slow_queries.inc(route)
+        if duration * 1000 >= SLOW_QUERY_MS:
+            slow_log.warning("slow query %.1f ms route=%s rows=%d: %s", duration * 1000, self.route, rows, key[1])
+            if (not self.finished and random.random() < EXPLAIN_SAMPLE_RATE
+                    and sql.lstrip()[:6].upper() in ("SELECT", "WITH")):
+                self.explains.append((sql, params))
+
+    def record_acquire(self, duration, opened):
+        self.acquire_time += duration
+        self.checkouts += 1
+        self.opened += opened
+        with _metrics_lock:
+            acquire_seconds.observe((self.route,), duration)
+            if opened:
+                connections_opened.inc((self.route,))
+
+    def server_timing(self):
+        app_time = time.perf_counter() - self.started
+        return (f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+                f"acquire;dur={self.acquire_time * 1000:.1f}, app;dur={app_time * 1000:.1f}")
+
+def current():
+    return _current.get()
+
+class TimedCursor:
+    # cursor proxy; a statement is recorded once the next one starts or the
+    # cursor is closed, so that its fetches are included
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+        self._statement = None  # [sql, params, seconds, rows]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        if self._statement is not None:
+            self._stats.record_statement(*self._statement)
+            self._statement = None
+
+    def _timed(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if self._statement is not None:
+                self._statement[2] += time.perf_counter() - start
+
+    def execute(self, operation, *args, **kwargs):
+        self._finish()
+        params = args[0] if args else kwargs.get("params")
+        self._statement = [operation, () if params is None else params, 0.0, 0]
+        return self._timed(self._cursor.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        self._finish()
+        self._statement = [operation, None, 0.0, 0]  # no params: not EXPLAINable
+        return self._timed(self._cursor.executemany, operation, *args, **kwargs)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None and self._statement is not None:
+            self._statement[3] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cursor.fetchmany, *args, **kwargs)
+        if self._statement is not None:
+            self._statement[3] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._statement is not None:
+            self._statement[3] += len(rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+def instrument(cursor):
+    stats = _current.get()
+    return cursor if stats is None else TimedCursor(cursor, stats)
+
+def record_acquire(duration, opened):
+    stats = _current.get()
+    if stats is not None:
+        stats.record_acquire(duration, opened)
+
+def record_commit():
+    stats = _current.get()
+    if stats is not None:
+        stats.commits += 1
+
+# lists that collect the RequestStats of every finished request (see watch)
+_watchers = []
+_watchers_lock = threading.Lock()
+
+@contextmanager
+def watch():
+    # with watch() as seen: ... -> seen holds one RequestStats per request
+    # finished inside the block; read them after the response body has been
+    # consumed so that streamed statements are included
+    seen = []
+    with _watchers_lock:
+        _watchers.append(seen)
+    try:
+        yield seen
+    finally:
+        with _watchers_lock:
+            _watchers.remove(seen)
+
+def run_explains(stats):
+    from db import get_db_connection
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for sql, params in stats.explains:
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = cursor.fetchall()
+            slow_log.warning("explain route=%s: %s\n%s", stats.route, fingerprint(sql),
+                             "\n".join(str(row) for row in plan))
+    except Exception as e:
+        slow_log.warning("explain failed route=%s: %s", stats.route, e)
+    finally:
+        cursor.close()
+        conn.close()
+
+def start_request():
+    if request.endpoint not in (None, "metrics", "static"):
+        g.profiling = RequestStats(request.endpoint)
+        _current.set(g.profiling)
+
+def finish_request(response):
+    stats = g.get("profiling")
+    if stats is None:
+        return response
+    route = (stats.route,)
+    with _metrics_lock:
+        request_seconds.observe(route, time.perf_counter() - stats.started)
+        request_db_seconds.observe(route, stats.db_time)
+        request_queries.observe(route, stats.queries)
+        request_connections.observe(route, stats.checkouts)
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
+def end_request(error=None):
+    stats = g.pop("profiling", None)
+    _current.set(None)
+    if stats is not None:
+        stats.finished = True
+        with _watchers_lock:
+            for seen in _watchers:
+                seen.append(stats)
+        if stats.explains:
+            run_explains(stats)
+
+def metrics():
+    from db import get_pool
+    from hashing import executor
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), METRICS_TOKEN):
+        return Response("Missing or wrong metrics token\n", status=401, mimetype="text/plain",
+                        headers={"WWW-Authenticate": "Bearer"})
+    lines = []
+    with _metrics_lock:
+        for metric in ROUTE_METRICS:
+            lines += metric.render(("route",))
+        for metric in (statement_count, statement_seconds):
+            lines += metric.render(("route", "statement"))
+    for gauges, stats in ((POOL_METRICS, get_pool().stats()), (HASH_METRICS, executor.stats())):
+        for name, key, kind in gauges:
+            lines += [f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+def init_app(app):
+    if not PROFILING:
+        return
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    if METRICS_TOKEN:
+        app.add_url_rule("/metrics", "metrics", metrics)
@@ -0,0 +1,281 @@
+import os
+import sys
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+import mysql.connector
+from cache import backend
+from db import get_db_connection
+from gym_faker import DEFAULT_PASSWORD
+from profiling import watch
+from tokens import issue_token
+
+# Requests every route once through the Flask test client against the local
+# (seeded) database, with the response cache emptied first, and compares the
+# SQL statements, pool checkouts and commits it caused with the budget
+# declared below. Routes over budget fail the run and have their statements
+# listed, repeated ones first, which is where N+1 loops show up.
+#
+# The write routes really write (a new user, program, session, ...), so run
+# it against a scratch database or pass --read-only.
+#
+# Usage: python query_budget.py [--read-only] [--password PASSWORD]
+#
+# In CI: python -m pytest tests query_budget.py. The test is skipped when no
+# database is configured (password.txt) or reachable, and only checks the
+# read routes unless GYM_BUDGET_WRITES=1.
+
+# one row of sample values each, merged into the names the routes use
+SAMPLES = [
+    "SELECT athlete_id FROM PerformanceLog LIMIT 1",
+    "SELECT created_by_trainer AS trainer_id FROM TrainingProgram WHERE created_by_trainer IS NOT NULL LIMIT 1",
+    "SELECT program_id FROM WorkoutSession LIMIT 1",
+    "SELECT medical_id FROM Medical LIMIT 1",
+    "SELECT email FROM User LIMIT 1",
+    "SELECT sports_branch AS category FROM Athlete LIMIT 1",
+    """SELECT pl.athlete_id AS log_athlete, pl.session_id AS log_session, pl.exercise_id AS log_exercise,
+              pl.completed_sets, pl.completed_reps, pl.weight_used, pl.perceived_exertion, pl.log_time,
+              tp.created_by_trainer AS log_trainer
+       FROM PerformanceLog pl
+       JOIN WorkoutSession ws ON ws.session_id = pl.session_id
+       JOIN TrainingProgram tp ON tp.program_id = ws.program_id
+       JOIN ProgramEnrollment pe ON pe.athlete_id = pl.athlete_id AND pe.program_id = ws.program_id
+       WHERE tp.created_by_trainer IS NOT NULL
+       LIMIT 1""",
+    """SELECT program_id AS own_program, created_by_trainer AS program_trainer
+       FROM TrainingProgram WHERE created_by_trainer IS NOT NULL LIMIT 1""",
+    """SELECT bm.athlete_id AS measured_athlete, bm.measurement_date, bm.height, bm.weight,
+              bm.body_fat_percentage, bm.muscle_mass, bm.bmi, tp.created_by_trainer AS measuring_trainer
+       FROM BodyMeasurement bm
+       JOIN ProgramEnrollment pe ON pe.athlete_id = bm.athlete_id
+       JOIN TrainingProgram tp ON tp.program_id = pe.program_id
+       WHERE tp.created_by_trainer IS NOT NULL
+       LIMIT 1""",
+    """SELECT a.athlete_id AS exam_athlete FROM Athlete a
+       WHERE a.athlete_id NOT IN (SELECT athlete_id FROM MedicalAssessment WHERE assessment_date = CURDATE())
+       LIMIT 1""",
+    """SELECT tp.created_by_trainer AS feedback_trainer, a.athlete_id AS feedback_athlete, ws.session_id AS feedback_session
+       FROM WorkoutSession ws
+       JOIN TrainingProgram tp ON tp.program_id = ws.program_id
+       JOIN Athlete a
+       LEFT JOIN TrainerFeedback tf
+           ON tf.trainer_id = tp.created_by_trainer AND tf.athlete_id = a.athlete_id AND tf.session_id = ws.session_id
+       WHERE tp.created_by_trainer IS NOT NULL AND tf.athlete_id IS NULL
+       LIMIT 1""",
+    """SELECT a.athlete_id AS enroll_athlete, tp.program_id AS enroll_program
+       FROM Athlete a
+       JOIN TrainingProgram tp
+       LEFT JOIN ProgramEnrollment pe ON pe.athlete_id = a.athlete_id AND pe.program_id = tp.program_id
+       WHERE pe.athlete_id IS NULL
+       LIMIT 1""",
+]
+
+def signup_body(v):
+    return {
+        "first_name": "Budget", "last_name": "Check", "signup_email": f"budget.{uuid.uuid4().hex}@example.com",
+        "signup_password": v["password"], "phone": "5550000000", "gender": "Other",
+        "date_of_birth": "2000-01-01", "role": "athlete", "sports_branch": v["category"]
+    }
+
+def performance_log_body(v):
+    return [{
+        "athlete_id": v["log_athlete"], "session_id": v["log_session"], "exercise_id": v["log_exercise"],
+        "completed_sets": v["completed_sets"], "completed_reps": v["completed_reps"],
+        "weight_used": v["weight_used"], "perceived_exertion": v["perceived_exertion"], "log_time": v["log_time"]
+    }]
+
+def measurement_body(v):
+    return [{
+        "athlete_id": v["measured_athlete"], "measurement_date": v["measurement_date"], "height": v["height"],
+        "weight": v["weight"], "body_fat_percentage": v["body_fat_percentage"],
+        "muscle_mass": v["muscle_mass"], "bmi": v["bmi"]
+    }]
+
+# (endpoint, (role, sample id) of the caller, method, url, body, write,
+# budget); url and body are filled from the sample values, a budget is the
+# most statements, pool checkouts and commits one request may cause
+ROUTES = [
+    ("index", None, "GET", "/", None, False,
+     {"queries": 0, "connections": 0, "transactions": 0}),
+    ("login", None, "POST", "/login", lambda v: {"email": v["email"], "password": v["password"]}, False,
+     {"queries": 1, "connections": 1, "transactions": 1}),
+    ("signup", None, "POST", "/signup", signup_body, True,
+     {"queries": 3, "connections": 1, "transactions": 1}),
+    ("get_athletes", ("trainer", "trainer_id"), "GET", "/api/athletes", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_measurements", ("athlete", "athlete_id"), "GET", "/api/measurements/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 1}),
+    ("get_medical_assessments", ("athlete", "athlete_id"), "GET", "/api/medicalAssessments/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_lastTraining", ("athlete", "athlete_id"), "GET", "/api/lastTraining/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_sessionAdherence", ("athlete", "athlete_id"), "GET", "/api/sessionAdherence/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 1}),
+    ("get_topThreeExercises", ("athlete", "athlete_id"), "GET", "/api/topThreeExercises/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_athlete_dashboard", ("athlete", "athlete_id"), "GET", "/api/athlete/{athlete_id}/dashboard", None, False,
+     {"queries": 7, "connections": 2, "transactions": 2}),
+    ("get_athlete_analytics", ("athlete", "athlete_id"), "GET", "/api/athlete/{athlete_id}/analytics?bucket=month", None, False,
+     {"queries": 3, "connections": 2, "transactions": 2}),
+    ("get_cohort_analytics", ("trainer", "trainer_id"), "GET", "/api/analytics/cohort?sports_branch={category}", None, False,
+     {"queries": 2, "connections": 1, "transactions": 1}),
+    ("get_athlete_cohort_rank", ("athlete", "athlete_id"), "GET", "/api/athlete/{athlete_id}/cohortRank?program_id={program_id}", None, False,
+     {"queries": 1, "connections": 1, "transactions": 1}),
+    ("addMedicalExam", ("medical", "medical_id"), "POST", "/api/addMedicalExam",
+     lambda v: {"athlete_id": v["exam_athlete"], "medical_id": v["medical_id"], "assessment_type": "Budget check",
+                "notes": "", "clearance_status": "Cleared"}, True,
+     {"queries": 2, "connections": 1, "transactions": 1}),
+    ("add_performance_logs", ("trainer", "log_trainer"), "POST", "/api/performanceLogs/bulk", performance_log_body, True,
+     {"queries": 12, "connections": 1, "transactions": 1}),
+    ("add_measurements", ("trainer", "measuring_trainer"), "POST", "/api/measurements/bulk", measurement_body, True,
+     {"queries": 3, "connections": 1, "transactions": 1}),
+    ("query", ("athlete", "athlete_id"), "POST", "/query", lambda v: {"category": v["category"], "status": "active"}, False,
+     {"queries": 1, "connections": 1, "transactions": 0}),
+    ("create_training_program", ("trainer", "trainer_id"), "POST", "/api/createTrainingProgram",
+     lambda v: {"name": "Budget check", "difficulty": "Beginner", "goal": "", "start_date": None,
+                "end_date": None, "trainer_id": v["trainer_id"]}, True,
+     {"queries": 2, "connections": 1, "transactions": 1}),
+    ("get_trainer_programs", ("trainer", "trainer_id"), "GET", "/api/trainingPrograms/{trainer_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_enrolled_training_programs", ("athlete", "athlete_id"), "GET", "/api/athletePrograms/enrolled/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_available_training_programs", ("athlete", "athlete_id"), "GET", "/api/athletePrograms/notEnrolled/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_workout_sessions", ("athlete", "athlete_id"), "GET", "/api/workoutSessions/{program_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_trainer_athletes", ("trainer", "trainer_id"), "GET", "/api/trainer/{trainer_id}/athletes", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("get_trainer_session_adherence", ("trainer", "trainer_id"), "GET", "/api/trainer/{trainer_id}/sessionAdherence", None, False,
+     {"queries": 2, "connections": 2, "transactions": 1}),
+    ("get_athlete_workout_sessions", ("trainer", "trainer_id"), "GET", "/api/workoutSessions/trainer/{trainer_id}/athlete/{athlete_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 2}),
+    ("add_trainer_feedback", ("trainer", "feedback_trainer"), "POST", "/api/addTrainerFeedback",
+     lambda v: {"athlete_id": v["feedback_athlete"], "trainer_id": v["feedback_trainer"],
+                "session_id": v["feedback_session"], "comments": "Budget check", "rating": 5}, True,
+     {"queries": 3, "connections": 1, "transactions": 1}),
+    ("add_workout_session", ("trainer", "program_trainer"), "POST", "/api/addWorkoutSession",
+     lambda v: {"program_id": v["own_program"], "session_date": date.today().isoformat(),
+                "duration": 60, "intensity": "Low"}, True,
+     {"queries": 3, "connections": 1, "transactions": 1}),
+    ("enroll_athlete", ("athlete", "enroll_athlete"), "POST", "/api/enrollAthlete",
+     lambda v: {"athlete_id": v["enroll_athlete"], "program_id": v["enroll_program"]}, True,
+     {"queries": 4, "connections": 1, "transactions": 1}),
+    ("get_leaderboard", ("trainer", "trainer_id"), "GET", "/api/leaderboard/{trainer_id}", None, False,
+     {"queries": 2, "connections": 2, "transactions": 1}),
+]
+
+def json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def sample_values(password):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    values = {"password": password}
+    try:
+        for sql in SAMPLES:
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            cursor.fetchall()
+            if row:
+                values.update((k, json_value(v)) for k, v in row.items())
+    finally:
+        cursor.close()
+        conn.close()
+    return values
+
+def route_request(values, user, url, body):
+    # (url, body, headers) of one ROUTES entry; KeyError when a sample value is missing
+    headers = {"Authorization": f"Bearer {issue_token(values[user[1]], user[0])}"} if user else {}
+    return url.format(**values), body(values) if body else None, headers
+
+class BudgetError(Exception):
+    pass
+
+def measure(client, method, url, body, headers):
+    backend.clear()
+    with watch() as seen:
+        response = client.open(url, method=method, json=body, headers=headers)
+        response.get_data()
+        response.close()
+    if not seen:
+        # no RequestStats: the URL matched no route or GYM_PROFILING=0
+        raise BudgetError(f"{method} {url} answered {response.status_code} without being profiled")
+    stats = seen[-1]
+    return response.status_code, {
+        "queries": stats.queries,
+        "connections": stats.checkouts,
+        "transactions": stats.commits
+    }, stats.statements
+
+def check_budgets(read_only, password):
+    # prints one line per route and returns the number of failures
+    from app import app  # reads password.txt, so only once a database is configured
+    missing = {endpoint for endpoint, *_ in ROUTES} - set(app.view_functions)
+    undeclared = set(app.view_functions) - {endpoint for endpoint, *_ in ROUTES} - {"static", "metrics"}
+    values = sample_values(password)
+    client = app.test_client()
+    failures = 0
+    for endpoint in sorted(missing):
+        print(f"{endpoint:36} has a budget but no route")
+        failures += 1
+    for endpoint in sorted(undeclared):
+        print(f"{endpoint:36} has no budget")
+        failures += 1
+
+    for endpoint, user, method, url, body, write, budget in ROUTES:
+        if endpoint in missing or (write and read_only):
+            continue
+        try:
+            request_url, request_body, headers = route_request(values, user, url, body)
+        except KeyError as e:
+            print(f"{endpoint:36} skipped, no sample value for {e}")
+            continue
+
+        try:
+            status, used, statements = measure(client, method, request_url, request_body, headers)
+        except BudgetError as e:
+            print(f"{endpoint:36} {e}")
+            failures += 1
+            continue
+        over = [k for k in budget if used[k] > budget[k]]
+        summary = "  ".join(f"{k} {used[k]}/{budget[k]}" for k in budget)
+        print(f"{endpoint:36} {status}  {summary}  {'OVER BUDGET' if over else 'ok'}")
+        if over:
+            failures += 1
+            for statement, count in Counter(statements).most_common():
+                print(f"    {count} x {statement}")
+
+    if failures:
+        print(f"{failures} route(s) failed their query budget")
+    return failures
+
+def database_configured():
+    if not os.path.exists("password.txt"):
+        return False
+    try:
+        get_db_connection().close()
+    except mysql.connector.Error:
+        return False
+    return True
+
+def test_query_budgets():
+    import pytest
+    if not database_configured():
+        pytest.skip("no database configured")
+    read_only = os.environ.get("GYM_BUDGET_WRITES") != "1"
+    assert check_budgets(read_only, os.environ.get("GYM_BUDGET_PASSWORD", DEFAULT_PASSWORD)) == 0
+
+def main():
+    args = sys.argv[1:]
+    read_only = "--read-only" in args
+    password = args[args.index("--password") + 1] if "--password" in args else DEFAULT_PASSWORD
+    if check_budgets(read_only, password):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
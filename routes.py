@@ -1,68 +1,74 @@
+import time
 from app import app
 from flask import request, jsonify, render_template
-from db import connect_first, get_db_connection
-from auth import (
-    get_user, insert_user, insert_athlete, insert_trainer,
-    insert_medical, insert_staff, get_role
-)
-import bcrypt
+from db import PoolTimeout, connect_first, get_db_connection
+from auth import get_user_with_role, create_account, update_password_hash
+from hashing import HashingBusy, hash_password, check_password, needs_rehash
+from pagination import paginate
+from bulk import bulk_performance_logs, bulk_body_measurements
+from streaming import stream_json
+from cache import cached, invalidate_on_commit
+from versions import conditional, touch
+from tokens import issue_token, requires, current_user_id
+from analytics import bucketed_analytics, cohort_rank
 
 @app.route("/")
 def index():
     return render_template("app.html")
 
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return jsonify({"error": "Server is busy, please try again"}), 503, {"Retry-After": "1"}
+
+@app.errorhandler(PoolTimeout)
+def pool_timeout(e):
+    return jsonify({"error": "Server is busy, please try again"}), 503, {"Retry-After": "1"}
+
 @app.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
     email = data["email"]
-    user = get_user(email)
+    user = get_user_with_role(email)
     if not user:
         return jsonify({"error": "Email not found"}), 401
 
-    password = data["password"].encode("utf-8")
+    password = data["password"]
     stored_hash = user["password_hash"]
 
-    if isinstance(stored_hash, str):
-        stored_hash = stored_hash.encode("utf-8")
-
-    if not bcrypt.checkpw(password, stored_hash):
+    if not check_password(password, stored_hash):
         return jsonify({"error": "Wrong password"}), 401
 
-    user["role"] = get_role(user)
+    if needs_rehash(stored_hash):
+        try:
+            update_password_hash(user["user_id"], hash_password(password))
+        except HashingBusy:
+            pass
+
     user.pop("password_hash", None)
+    user["token"] = issue_token(user["user_id"], user["role"])
     return jsonify(user), 200
 
 @app.route("/signup", methods=["POST"])
 def signup():
     data = request.get_json()
-    insert_user(data)
-    role = data.get("role")
-    if role == "athlete":
-        insert_athlete(data)
-    elif role == "trainer":
-        insert_staff(data); insert_trainer(data)
-    elif role == "medical":
-        insert_staff(data); insert_medical(data)
+    password_hash = hash_password(data["signup_password"])
+    create_account(data, password_hash)
     return jsonify({"status": "ok"})
 
 @app.route("/api/athletes", methods=["GET"])
-@connect_first
-def get_athletes(cursor):
-    cursor.execute("""
+@requires()
+@conditional(lambda: ["athletes"])
+def get_athletes():
+    sql = """
         SELECT 
             a.athlete_id AS id,
             CONCAT(u.first_name, ' ', u.last_name) AS name
         FROM athlete a
         JOIN user u ON u.user_id = a.athlete_id
-        ORDER BY name
-    """)
-    athletes = cursor.fetchall()
-    return jsonify(athletes), 200
+    """
+    return paginate(sql, (), [("name", "ASC"), ("id", "ASC")], ["id", "name"])
 
-@app.route("/api/measurements/<int:athlete_id>", methods=["GET"])
-@connect_first
-def get_measurements(cursor, athlete_id):
-    cursor.execute("""
+MEASUREMENTS_SQL = """
         SELECT
             measurement_date,
             height,
@@ -72,110 +78,151 @@ def get_measurements(cursor, athlete_id):
             bmi
         FROM bodymeasurement
         WHERE athlete_id = %s
-        ORDER BY measurement_date
-    """, (athlete_id,))
-    rows = cursor.fetchall()
-    return jsonify(rows)
+"""
 
-@app.route("/api/medicalAssessments/<int:athlete_id>", methods=["GET"])
-@connect_first
-def get_medical_assessments(cursor, athlete_id):
-    cursor.execute("""
+@app.route("/api/measurements/<int:athlete_id>", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+def get_measurements(athlete_id):
+    columns = ["measurement_date", "height", "weight", "body_fat_percentage", "muscle_mass", "bmi"]
+    return paginate(MEASUREMENTS_SQL, (athlete_id,), [("measurement_date", "ASC")], columns, stream=True)
+
+MEDICAL_ASSESSMENTS_SQL = """
         SELECT
             CONCAT(u.first_name, ' ', u.last_name) AS doctor,
+            ma.medical_id,
             ma.assessment_date as date,
             ma.assessment_type as type,
             ma.notes as notes,
             ma.clearance_status as clearance
         FROM medicalassessment ma JOIN user u ON u.user_id = ma.medical_id
         WHERE athlete_id = %s
-        ORDER BY assessment_date
-    """, (athlete_id,))
-    rows = cursor.fetchall()
-    return jsonify(rows)
+"""
+
+@app.route("/api/medicalAssessments/<int:athlete_id>", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+def get_medical_assessments(athlete_id):
+    columns = ["doctor", "date", "type", "notes", "clearance"]
+    return paginate(MEDICAL_ASSESSMENTS_SQL, (athlete_id,), [("date", "ASC"), ("medical_id", "ASC")], columns)
+
+LAST_TRAINING_SQL = """
+        SELECT
+            s.athlete_id,
+            s.exercise_id,
+            e.exercise_name,
+            s.last_weight_used AS weight_used,
+            s.last_completed_sets AS completed_sets,
+            s.last_completed_reps AS completed_reps,
+            s.last_perceived_exertion AS perceived_exertion,
+            s.last_log_time AS log_time
+        FROM AthleteExerciseSummary s
+        JOIN Exercise e ON e.exercise_id = s.exercise_id
+        WHERE s.athlete_id = %s
+        ORDER BY s.last_log_time DESC
+"""
 
 @app.route("/api/lastTraining/<int:athlete_id>", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
 @connect_first
 def get_lastTraining(cursor, athlete_id):
-    cursor.execute("""
-        WITH x AS (
-        SELECT
-            athlete_id,
-            exercise_id,
-            exercise_name,
-            weight_used,
-            completed_sets,
-            completed_reps,
-            perceived_exertion,
-            log_time,
-            ROW_NUMBER() OVER (
-            PARTITION BY athlete_id, exercise_id
-            ORDER BY log_time DESC
-            ) AS rn
-        FROM v_log_enriched
-        )
-        SELECT *
-        FROM x
-        WHERE rn = 1 AND athlete_id = %s
-        ORDER BY log_time DESC;
-    """, (athlete_id,))
+    cursor.execute(LAST_TRAINING_SQL, (athlete_id,))
     rows = cursor.fetchall()
     return jsonify(rows)
 
-@app.route("/api/sessionAdherence/<int:athlete_id>", methods=["GET"])
-@connect_first
-def get_sessionAdherence(cursor, athlete_id):
-    cursor.execute("""
+SESSION_ADHERENCE_SQL = """
     SELECT
-        pl.athlete_id,
-        pl.session_id,
-        ws.session_date,
-        ROUND(100 * SUM(pl.completed_sets) / NULLIF(SUM(se.planned_sets), 0), 2) AS percentage_sets_done,
-        ROUND(100 * SUM(pl.completed_reps) / NULLIF(SUM(se.planned_reps), 0), 2) AS percentage_reps_done,
-        ROUND(AVG(pl.perceived_exertion), 2) AS average_rate_of_perceived_exertion
-    FROM PerformanceLog pl
-    JOIN SessionExercise se
-    ON se.session_id = pl.session_id AND se.exercise_id = pl.exercise_id
-    JOIN WorkoutSession ws
-    ON ws.session_id = pl.session_id
+        athlete_id,
+        session_id,
+        session_date,
+        percentage_sets_done,
+        percentage_reps_done,
+        average_rate_of_perceived_exertion
+    FROM SessionAdherence
     WHERE athlete_id = %s
-    GROUP BY pl.athlete_id, pl.session_id, ws.session_date
-    ORDER BY ws.session_date DESC, pl.athlete_id;
-    """, (athlete_id,))
-    rows = cursor.fetchall()
-    return jsonify(rows)
+    ORDER BY session_date DESC, session_id DESC
+"""
+
+@app.route("/api/sessionAdherence/<int:athlete_id>", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+@cached(lambda athlete_id: [f"athlete:{athlete_id}"])
+def get_sessionAdherence(athlete_id):
+    return stream_json(SESSION_ADHERENCE_SQL, (athlete_id,))
+
+TOP_THREE_EXERCISES_SQL = """
+    SELECT
+        s.athlete_id,
+        s.exercise_id,
+        e.exercise_name,
+        s.total_volume,
+        s.volume_rank AS rnk
+    FROM AthleteExerciseSummary s
+    JOIN Exercise e ON e.exercise_id = s.exercise_id
+    WHERE s.athlete_id = %s AND s.volume_rank <= 3
+    ORDER BY rnk, s.total_volume DESC
+"""
 
 @app.route("/api/topThreeExercises/<int:athlete_id>", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+@cached(lambda athlete_id: [f"athlete:{athlete_id}"])
 @connect_first
 def get_topThreeExercises(cursor, athlete_id):
-    cursor.execute("""
-    WITH vol AS (
-    SELECT
-        athlete_id,
-        exercise_id,
-        exercise_name,
-        ROUND(SUM(completed_sets * completed_reps * IFNULL(weight_used, 0)), 2) AS total_volume
-    FROM v_log_enriched
-    GROUP BY athlete_id, exercise_id, exercise_name
-    ),
-    ranked AS (
-    SELECT
-        *,
-        DENSE_RANK() OVER (
-        PARTITION BY athlete_id
-        ORDER BY total_volume DESC
-        ) AS rnk
-    FROM vol
-    )
-    SELECT athlete_id, exercise_id, exercise_name, total_volume, rnk
-    FROM ranked
-    WHERE rnk <= 3 AND athlete_id = %s
-    ORDER BY athlete_id, rnk, total_volume DESC;
-    """, (athlete_id,))
+    cursor.execute(TOP_THREE_EXERCISES_SQL, (athlete_id,))
     rows = cursor.fetchall()
     return jsonify(rows)
 
+@app.route("/api/athlete/<int:athlete_id>/dashboard", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+@cached(lambda athlete_id: [f"athlete:{athlete_id}"])
+@connect_first
+def get_athlete_dashboard(cursor, athlete_id):
+    # everything the training tab shows for one athlete, on one connection
+    sections = {
+        "measurements": MEASUREMENTS_SQL + " ORDER BY measurement_date",
+        "medicalAssessments": MEDICAL_ASSESSMENTS_SQL + " ORDER BY date, medical_id",
+        "lastTraining": LAST_TRAINING_SQL,
+        "sessionAdherence": SESSION_ADHERENCE_SQL,
+        "topThreeExercises": TOP_THREE_EXERCISES_SQL,
+        "enrolledPrograms": ENROLLED_PROGRAMS_SQL
+    }
+    payload = {}
+    timing = {}
+    for name, sql in sections.items():
+        start = time.perf_counter()
+        cursor.execute(sql, (athlete_id,))
+        payload[name] = cursor.fetchall()
+        timing[name] = round((time.perf_counter() - start) * 1000, 2)
+    payload["timing_ms"] = timing
+    return jsonify(payload), 200
+
+@app.route("/api/athlete/<int:athlete_id>/analytics", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+@cached(lambda athlete_id: [f"athlete:{athlete_id}"])
+def get_athlete_analytics(athlete_id):
+    return bucketed_analytics(athlete_id=athlete_id)
+
+@app.route("/api/analytics/cohort", methods=["GET"])
+@requires("trainer", "medical")
+@cached(lambda: ["cohorts"])
+def get_cohort_analytics():
+    # ?sports_branch= or ?program_id=; the "cohorts" tag is dropped by the
+    # writes that change cohort data (logs, measurements, enrollments,
+    # sessions, new athletes)
+    return bucketed_analytics(cohort=True)
+
+@app.route("/api/athlete/<int:athlete_id>/cohortRank", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+def get_athlete_cohort_rank(athlete_id):
+    # ?sports_branch= or ?program_id=; the cohort snapshot is shared by its athletes
+    return cohort_rank(athlete_id)
+
 @app.route("/api/addMedicalExam", methods=["POST"])
+@requires("medical")
 @connect_first
 def addMedicalExam(cursor):
     data = request.get_json()
@@ -186,14 +233,26 @@ def addMedicalExam(cursor):
     """
     cursor.execute(sql, (
         data["athlete_id"],
-        data["medical_id"],
+        current_user_id(),
         data["assessment_type"],
         data["notes"],
         data["clearance_status"]
     ))
+    touch(cursor, f"athlete:{data['athlete_id']}")
     return jsonify({"message": "Medical exam submitted successfully"}), 201
 
+@app.route("/api/performanceLogs/bulk", methods=["POST"])
+@requires("trainer")
+def add_performance_logs():
+    return bulk_performance_logs()
+
+@app.route("/api/measurements/bulk", methods=["POST"])
+@requires("trainer", "medical")
+def add_measurements():
+    return bulk_body_measurements()
+
 @app.route("/query", methods=["POST"])
+@requires()
 def query():
     data = request.get_json()
     category = data.get("category")
@@ -203,19 +262,22 @@ def query():
 
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
-    sql = """
-        SELECT u.first_name, u.last_name
-        FROM user u
-        JOIN athlete a ON u.user_id = a.athlete_id
-        WHERE a.sports_branch = %s AND u.status = %s
-    """
-    cursor.execute(sql, (category, status))
-    results = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    try:
+        sql = """
+            SELECT u.first_name, u.last_name
+            FROM user u
+            JOIN athlete a ON u.user_id = a.athlete_id
+            WHERE a.sports_branch = %s AND u.status = %s
+        """
+        cursor.execute(sql, (category, status))
+        results = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
     return jsonify(results)
 
 @app.route("/api/createTrainingProgram", methods=["POST"])
+@requires("trainer")
 @connect_first
 def create_training_program(cursor):
     data = request.get_json() or {}
@@ -224,7 +286,7 @@ def create_training_program(cursor):
     goal = data.get("goal")
     start_date = data.get("start_date")
     end_date = data.get("end_date")
-    created_by = data.get("trainer_id")
+    created_by = current_user_id()
 
     if not name:
         return jsonify({"error": "Program name is required"}), 400
@@ -235,71 +297,78 @@ def create_training_program(cursor):
         VALUES (%s, %s, %s, %s, %s, %s)
     """
     cursor.execute(sql, (name, difficulty, goal, start_date, end_date, created_by))
+    touch(cursor, f"trainer:{created_by}", "programs")
     return jsonify({"message": "Training program created successfully"}), 201
 
-@app.route("/api/trainingPrograms/<int:trainer_id>", methods=["GET"])
-@connect_first
-def get_trainer_programs(cursor, trainer_id):
-    cursor.execute("""
+TRAINER_PROGRAMS_SQL = """
         SELECT
         program_id, program_name, start_date, end_date
         FROM trainingprogram
         WHERE created_by_trainer = %s
-    """, (trainer_id,))
+"""
+
+@app.route("/api/trainingPrograms/<int:trainer_id>", methods=["GET"])
+@requires("trainer", owns="trainer_id")
+@conditional(lambda trainer_id: [f"trainer:{trainer_id}"])
+@connect_first
+def get_trainer_programs(cursor, trainer_id):
+    cursor.execute(TRAINER_PROGRAMS_SQL, (trainer_id,))
     rows = cursor.fetchall()
     return jsonify(rows), 200
 
-@app.route("/api/athletePrograms/enrolled/<int:athlete_id>", methods=["GET"])
-@connect_first
-def get_enrolled_training_programs(cursor, athlete_id):
-    cursor.execute("""
+ENROLLED_PROGRAMS_SQL = """
         SELECT
         tp.program_id, tp.program_name, tp.start_date, tp.end_date
         FROM trainingprogram tp
         NATURAL JOIN programenrollment pe
         WHERE pe.athlete_id = %s
-    """, (athlete_id,))
+"""
+
+@app.route("/api/athletePrograms/enrolled/<int:athlete_id>", methods=["GET"])
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}"])
+@connect_first
+def get_enrolled_training_programs(cursor, athlete_id):
+    cursor.execute(ENROLLED_PROGRAMS_SQL, (athlete_id,))
     rows = cursor.fetchall()
     return jsonify(rows), 200
 
 
 @app.route("/api/athletePrograms/notEnrolled/<int:athlete_id>", methods=["GET"])
-@connect_first
-def get_available_training_programs(cursor, athlete_id):
-    cursor.execute("""
+@requires("athlete", "trainer", "medical", owns="athlete_id")
+@conditional(lambda athlete_id: [f"athlete:{athlete_id}", "programs"])
+def get_available_training_programs(athlete_id):
+    sql = """
         SELECT
             tp.program_id,
             tp.program_name,
             tp.start_date,
-            tp.end_date
+            tp.end_date,
+            COALESCE(tp.start_date, DATE('1000-01-01')) AS start_sort
         FROM trainingprogram tp
         WHERE tp.program_id NOT IN (
             SELECT program_id 
             FROM programenrollment 
             WHERE athlete_id = %s
         )
-        ORDER BY tp.start_date DESC
-    """, (athlete_id,))
-    programs = cursor.fetchall()
-    return jsonify(programs)
+    """
+    columns = ["program_id", "program_name", "start_date", "end_date"]
+    return paginate(sql, (athlete_id,), [("start_sort", "DESC"), ("program_id", "DESC")], columns)
 
 @app.route("/api/workoutSessions/<int:program_id>", methods=["GET"])
-@connect_first
-def get_workout_sessions(cursor, program_id):
-    cursor.execute("""
+@requires()
+@conditional(lambda program_id: [f"program:{program_id}"])
+def get_workout_sessions(program_id):
+    sql = """
         SELECT
-        *
+        session_id, program_id, session_date, duration, intensity_level
         FROM workoutsession
         WHERE program_id = %s
-        ORDER BY (session_date) DESC
-    """, (program_id,))
-    rows = cursor.fetchall()
-    return jsonify(rows), 200
+    """
+    columns = ["session_id", "program_id", "session_date", "duration", "intensity_level"]
+    return paginate(sql, (program_id,), [("session_date", "DESC"), ("session_id", "DESC")], columns)
 
-@app.route("/api/trainer/<int:trainer_id>/athletes", methods=["GET"])
-@connect_first
-def get_trainer_athletes(cursor, trainer_id):
-    cursor.execute("""
+TRAINER_ATHLETES_SQL = """
     SELECT DISTINCT
     u.user_id,
     u.first_name,
@@ -309,12 +378,46 @@ def get_trainer_athletes(cursor, trainer_id):
     JOIN ProgramEnrollment pe ON a.athlete_id = pe.athlete_id
     JOIN TrainingProgram tp ON pe.program_id = tp.program_id
     JOIN WorkoutSession ws ON tp.program_id = ws.program_id
-    WHERE tp.created_by_trainer = %s;
-    """, (trainer_id,))
+    WHERE tp.created_by_trainer = %s
+"""
+
+@app.route("/api/trainer/<int:trainer_id>/athletes", methods=["GET"])
+@requires("trainer", owns="trainer_id")
+@conditional(lambda trainer_id: [f"trainer:{trainer_id}"])
+@cached(lambda trainer_id: [f"trainer:{trainer_id}"])
+@connect_first
+def get_trainer_athletes(cursor, trainer_id):
+    cursor.execute(TRAINER_ATHLETES_SQL, (trainer_id,))
     athletes = cursor.fetchall()
     return jsonify(athletes), 200
 
+TRAINER_ADHERENCE_SQL = """
+    SELECT
+        sa.program_id,
+        tp.program_name,
+        sa.session_id,
+        sa.session_date,
+        COUNT(*) AS athletes_logged,
+        ROUND(100 * SUM(sa.completed_sets) / NULLIF(SUM(sa.planned_sets), 0), 2) AS percentage_sets_done,
+        ROUND(100 * SUM(sa.completed_reps) / NULLIF(SUM(sa.planned_reps), 0), 2) AS percentage_reps_done,
+        ROUND(SUM(sa.rpe_total) / NULLIF(SUM(sa.rpe_count), 0), 2) AS average_rate_of_perceived_exertion
+    FROM TrainingProgram tp
+    JOIN SessionAdherence sa ON sa.program_id = tp.program_id
+    WHERE tp.created_by_trainer = %s
+    GROUP BY sa.program_id, tp.program_name, sa.session_id, sa.session_date
+    ORDER BY sa.session_date DESC, sa.session_id DESC
+"""
+
+@app.route("/api/trainer/<int:trainer_id>/sessionAdherence", methods=["GET"])
+@requires("trainer", owns="trainer_id")
+@conditional(lambda trainer_id: [f"trainer:{trainer_id}"])
+@cached(lambda trainer_id: [f"trainer:{trainer_id}"])
+def get_trainer_session_adherence(trainer_id):
+    return stream_json(TRAINER_ADHERENCE_SQL, (trainer_id,))
+
 @app.route('/api/workoutSessions/trainer/<int:trainer_id>/athlete/<int:athlete_id>', methods=['GET'])
+@requires("trainer", owns="trainer_id")
+@conditional(lambda trainer_id, athlete_id: [f"trainer:{trainer_id}", f"athlete:{athlete_id}"])
 @connect_first
 def get_athlete_workout_sessions(cursor, trainer_id, athlete_id):
     cursor.execute("""
@@ -330,27 +433,48 @@ def get_athlete_workout_sessions(cursor, trainer_id, athlete_id):
     sessions = cursor.fetchall()
     return jsonify(sessions), 200
 
+def touch_program(cursor, program_id, *tags):
+    cursor.execute("SELECT created_by_trainer FROM trainingprogram WHERE program_id = %s", (program_id,))
+    program = cursor.fetchone()
+    tags = [f"program:{program_id}", *tags]
+    if program and program["created_by_trainer"] is not None:
+        tags.append(f"trainer:{program['created_by_trainer']}")
+    touch(cursor, *tags)
+
 @app.route("/api/addTrainerFeedback", methods=["POST"])
+@requires("trainer")
 @connect_first
 def add_trainer_feedback(cursor):
     data = request.get_json()
     athlete_id = data.get("athlete_id")
-    trainer_id = data.get("trainer_id")
+    trainer_id = current_user_id()
     session_id = data.get("session_id")
     comments = data.get("comments")
     rating = data.get("rating")
-    
+
+    cursor.execute("""
+        SELECT tp.created_by_trainer
+        FROM workoutsession ws
+        JOIN trainingprogram tp ON tp.program_id = ws.program_id
+        WHERE ws.session_id = %s
+    """, (session_id,))
+    session = cursor.fetchone()
+    if not session or session["created_by_trainer"] != trainer_id:
+        return jsonify({"error": "Not allowed for this session"}), 403
+
     sql = """
         INSERT INTO trainerfeedback
         (athlete_id, trainer_id, session_id, comments, rating)
         VALUES (%s, %s , %s, %s, %s)
     """
     cursor.execute(sql, (athlete_id, trainer_id, session_id, comments, rating))
+    touch(cursor, f"trainer:{trainer_id}", f"athlete:{athlete_id}")
     return jsonify({"message": "Trainer feedback added successfully"}), 201
 
 
 
 @app.route("/api/addWorkoutSession", methods=["POST"])
+@requires("trainer")
 @connect_first
 def add_workout_session(cursor):
     data = request.get_json()
@@ -362,19 +486,28 @@ def add_workout_session(cursor):
     if not program_id or not session_date:
         return jsonify({"error": "Missing parameters"}), 400
 
+    trainer_id = current_user_id()
+    cursor.execute("SELECT created_by_trainer FROM trainingprogram WHERE program_id = %s", (program_id,))
+    program = cursor.fetchone()
+    if not program or program["created_by_trainer"] != trainer_id:
+        return jsonify({"error": "Not allowed for this program"}), 403
+
     sql = """
         INSERT INTO workoutsession
         (program_id, session_date, duration, intensity_level)
         VALUES (%s, %s , %s, %s)
     """
     cursor.execute(sql, (program_id, session_date, duration, intensity))
+    touch(cursor, f"program:{program_id}", f"trainer:{trainer_id}")
+    invalidate_on_commit("cohorts")
     return jsonify({"message": "Workout session added successfully"}), 201
 
 @app.route("/api/enrollAthlete", methods=["POST"])
+@requires("athlete")
 @connect_first
 def enroll_athlete(cursor):
     data = request.get_json()
-    athlete_id = data.get("athlete_id")
+    athlete_id = current_user_id()
     program_id = data.get("program_id")
     
     if not athlete_id or not program_id:
@@ -395,45 +528,30 @@ def enroll_athlete(cursor):
         VALUES (%s, %s, NOW(), 'ongoing')
     """
     cursor.execute(sql, (athlete_id, program_id))
+    touch_program(cursor, program_id, f"athlete:{athlete_id}")
+    invalidate_on_commit("cohorts")
     return jsonify({"message": "Successfully enrolled in program"}), 201
 
-@app.route("/api/leaderboard/<int:trainer_id>", methods=["GET"])
-@connect_first
-def get_leaderboard(cursor, trainer_id):
-    cursor.execute("""
-        WITH per_prog AS (
-            SELECT
-                ws.program_id,
-                pl.athlete_id,
-                COUNT(DISTINCT pl.session_id) AS logged_sessions,
-                ROUND(AVG(pl.perceived_exertion), 2) AS avg_rpe
-            FROM PerformanceLog pl
-            JOIN WorkoutSession ws ON ws.session_id = pl.session_id
-            GROUP BY ws.program_id, pl.athlete_id
-        ),
-        ranked AS (
-            SELECT
-                *,
-                RANK() OVER (
-                    PARTITION BY program_id
-                    ORDER BY logged_sessions DESC, avg_rpe DESC
-                ) AS rnk
-            FROM per_prog
-        )
+LEADERBOARD_SQL = """
         SELECT
-            r.program_id,
+            lb.program_id,
             tp.program_name,
-            r.athlete_id,
+            lb.athlete_id,
             CONCAT(u.first_name, ' ', u.last_name) AS athlete_name,
-            r.logged_sessions,
-            r.avg_rpe,
-            r.rnk
-        FROM ranked r
-        JOIN TrainingProgram tp ON tp.program_id = r.program_id
-        JOIN User u ON u.user_id = r.athlete_id
-        WHERE r.rnk <= 5 AND tp.created_by_trainer = %s
-        ORDER BY r.program_id, r.rnk, r.athlete_id
-    """, (trainer_id,))
-    rows = cursor.fetchall()
-    return jsonify(rows), 200
+            lb.logged_sessions,
+            lb.avg_rpe,
+            lb.rnk
+        FROM TrainingProgram tp
+        JOIN ProgramLeaderboard lb ON lb.program_id = tp.program_id
+        JOIN User u ON u.user_id = lb.athlete_id
+        WHERE lb.rnk <= 5 AND tp.created_by_trainer = %s
+        ORDER BY lb.program_id, lb.rnk, lb.athlete_id
+"""
+
+@app.route("/api/leaderboard/<int:trainer_id>", methods=["GET"])
+@requires("trainer", owns="trainer_id")
+@conditional(lambda trainer_id: [f"trainer:{trainer_id}"])
+@cached(lambda trainer_id: [f"trainer:{trainer_id}"])
+def get_leaderboard(trainer_id):
+    return stream_json(LEADERBOARD_SQL, (trainer_id,))
 
@@ -0,0 +1,33 @@
+import argparse
+import os
+
+# Production entry point. run.py stays the development server.
+#
+#   python serve.py --mode sync   Flask app on waitress (one thread per request)
+#   python serve.py --mode async  asgi.py on uvicorn (async read endpoints)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the gym app")
+    parser.add_argument("--mode", choices=["sync", "async"], default="async")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (async mode)")
+    parser.add_argument("--threads", type=int, default=32, help="waitress threads (sync mode)")
+    args = parser.parse_args()
+
+    if args.mode == "sync":
+        from waitress import serve
+        from app import app
+        serve(app, host=args.host, port=args.port, threads=args.threads)
+    else:
+        import uvicorn
+        uvicorn.run(
+            "asgi:application",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=os.environ.get("GYM_LOG_LEVEL", "warning")
+        )
+
+if __name__ == "__main__":
+    main()
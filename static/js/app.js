@@ -7,7 +7,17 @@ const TABS = [
 
 const savedUser = JSON.parse(localStorage.getItem("user"));
 
-if (savedUser) {
+// API calls carry the session token handed out by /login
+function apiFetch(url, options = {}) {
+    const user = JSON.parse(localStorage.getItem("user"));
+    const headers = { ...(options.headers || {}) };
+    if (user && user.token) {
+        headers["Authorization"] = `Bearer ${user.token}`;
+    }
+    return fetch(url, { ...options, headers });
+}
+
+if (savedUser && savedUser.token) {
     showDashboard(savedUser);
     toggleView('dashboard-view');
 } else {
@@ -228,6 +238,28 @@ async function switchTab(tabId) {
     if (clickedBtn) clickedBtn.classList.add('active');
 }
 
+// Athlete dashboard: one request per selection, shared by the panels below.
+// This listener is registered first so the previous athlete's data is dropped
+// before any panel asks for it.
+let dashboardRequest = null;
+
+function fetchDashboard(athleteId) {
+    if (!dashboardRequest || dashboardRequest.athleteId !== athleteId) {
+        dashboardRequest = {
+            athleteId: athleteId,
+            data: apiFetch(`/api/athlete/${athleteId}/dashboard`).then(res => {
+                if (!res.ok) throw new Error("Dashboard request failed.");
+                return res.json();
+            })
+        };
+    }
+    return dashboardRequest.data;
+}
+
+document.getElementById("athlete-select").addEventListener("change", function () {
+    dashboardRequest = null;
+});
+
 // Enrolled Programs dropdown for selected athlete
 document.getElementById("athlete-select").addEventListener("change", async function () {
     const athleteId = this.value;
@@ -238,9 +270,7 @@ document.getElementById("athlete-select").addEventListener("change", async funct
     if (!athleteId) return;
 
     try {
-        const res = await fetch(`/api/athletePrograms/enrolled/${athleteId}`);
-        if (!res.ok) return;
-        const programs = await res.json();
+        const programs = (await fetchDashboard(athleteId)).enrolledPrograms;
         enrolledSelect.innerHTML = '<option value="">Select an enrolled program</option>';
         programs.forEach(p => {
             const option = document.createElement('option');
@@ -270,7 +300,10 @@ document.getElementById(`${roleSelect.value}-fields`).style.display = "block";
 
 // Load Athletes into dropdown
 async function loadAthletes(id) {
-    const result = await fetch("http://127.0.0.1:5000/api/athletes");
+    const result = await apiFetch("http://127.0.0.1:5000/api/athletes");
+    if (!result.ok) {
+        return;
+    }
     const athletes = await result.json();
 
     const select = document.getElementById(id);
@@ -306,8 +339,7 @@ document.getElementById("athlete-select").addEventListener("change", async funct
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/measurements/${athleteId}`);
-    const data = await response.json();
+    const data = (await fetchDashboard(athleteId)).measurements;
 
     const labels = [];
     const bmiData = [];
@@ -416,8 +448,7 @@ document.getElementById("athlete-select").addEventListener("change", async funct
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/medicalAssessments/${athleteId}`);
-    const data = await response.json();
+    const data = (await fetchDashboard(athleteId)).medicalAssessments;
 
     data.forEach(row => {
         const tr = document.createElement("tr");
@@ -443,8 +474,7 @@ document.getElementById("athlete-select").addEventListener("change", async funct
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/lastTraining/${athleteId}`);
-    const data = await response.json();
+    const data = (await fetchDashboard(athleteId)).lastTraining;
 
     data.forEach(row => {
         const tr = document.createElement("tr");
@@ -471,8 +501,7 @@ document.getElementById("athlete-select").addEventListener("change", async funct
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/sessionAdherence/${athleteId}`);
-    const data = await response.json();
+    const data = (await fetchDashboard(athleteId)).sessionAdherence;
 
     data.forEach(row => {
         const tr = document.createElement("tr");
@@ -497,8 +526,7 @@ document.getElementById("athlete-select").addEventListener("change", async funct
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/topThreeExercises/${athleteId}`);
-    const data = await response.json();
+    const data = (await fetchDashboard(athleteId)).topThreeExercises;
 
     data.forEach(row => {
         const tr = document.createElement("tr");
@@ -539,7 +567,7 @@ document.getElementById('create-program-btn').addEventListener('click', async (e
     };
 
     try {
-        const res = await fetch('/api/createTrainingProgram', {
+        const res = await apiFetch('/api/createTrainingProgram', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload)
@@ -564,7 +592,7 @@ document.getElementById('create-program-btn').addEventListener('click', async (e
 });
 
 async function loadTrainerPrograms(trainer_id) {
-    const result = await fetch(`api/trainingPrograms/${trainer_id}`);
+    const result = await apiFetch(`api/trainingPrograms/${trainer_id}`);
     const programs = await result.json();
 
     const select = document.getElementById('trainer-program-select');
@@ -595,7 +623,7 @@ async function submitWorkoutSession() {
         intensity
     };
     try {
-        const res = await fetch('/api/addWorkoutSession', {
+        const res = await apiFetch('/api/addWorkoutSession', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload)
@@ -624,7 +652,7 @@ document.getElementById('add-session-btn').addEventListener('click', async (e) =
 });
 
 async function loadAthletesInPrograms(trainer_id) {
-    const result = await fetch(`/api/trainer/${trainer_id}/athletes`);
+    const result = await apiFetch(`/api/trainer/${trainer_id}/athletes`);
     const athletes = await result.json();
     const select = document.getElementById('athlete-feedback-select');
 
@@ -651,7 +679,7 @@ async function loadWorkoutSessionsForAthlete(athleteId, trainerId) {
     }
 
     try {
-        const result = await fetch(`/api/workoutSessions/trainer/${trainerId}/athlete/${athleteId}`);
+        const result = await apiFetch(`/api/workoutSessions/trainer/${trainerId}/athlete/${athleteId}`);
         if (!result.ok) {
             console.error('Failed to fetch workout sessions');
             return;
@@ -699,7 +727,7 @@ async function submitTrainerFeedback() {
         rating
     };
     try {
-        const res = await fetch('/api/addTrainerFeedback', {
+        const res = await apiFetch('/api/addTrainerFeedback', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload)
@@ -744,7 +772,7 @@ document.getElementById("athlete-select-medical").addEventListener("change", asy
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/measurements/${athleteId}`);
+    const response = await apiFetch(`/api/measurements/${athleteId}`);
     const data = await response.json();
 
     data.forEach(row => {
@@ -771,7 +799,7 @@ document.getElementById("athlete-select-medical").addEventListener("change", asy
 
     if (!athleteId) return;
 
-    const response = await fetch(`/api/medicalAssessments/${athleteId}`);
+    const response = await apiFetch(`/api/medicalAssessments/${athleteId}`);
     const data = await response.json();
 
     data.forEach(row => {
@@ -806,7 +834,7 @@ async function submitMedicalExam() {
             clearance_status: clearance 
         }
     
-        const response = await fetch("/api/addMedicalExam", {
+        const response = await apiFetch("/api/addMedicalExam", {
             method: "POST",
             headers: {
                 "Content-Type": "application/json"
@@ -834,7 +862,7 @@ async function loadEnrolledPrograms(athleteId) {
     }
 
     try {
-        const res = await fetch(`/api/athletePrograms/enrolled/${athleteId}`);
+        const res = await apiFetch(`/api/athletePrograms/enrolled/${athleteId}`);
         if (!res.ok) {
             select.innerHTML = '<option value="">Failed to load</option>';
             return;
@@ -873,7 +901,7 @@ async function loadAvailablePrograms(athleteId) {
     }
 
     try {
-        const res = await fetch(`/api/athletePrograms/notEnrolled/${athleteId}`);
+        const res = await apiFetch(`/api/athletePrograms/notEnrolled/${athleteId}`);
         if (!res.ok) {
             select.innerHTML = '<option value="">Failed to load</option>';
             return;
@@ -916,7 +944,7 @@ async function enrollInProgram() {
     };
 
     try {
-        const res = await fetch('/api/enrollAthlete', {
+        const res = await apiFetch('/api/enrollAthlete', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload)
@@ -966,7 +994,7 @@ async function loadWorkoutSessionsForProgram(programId) {
     }
 
     try {
-        const res = await fetch(`/api/workoutSessions/${programId}`);
+        const res = await apiFetch(`/api/workoutSessions/${programId}`);
         if (!res.ok) {
             tbody.innerHTML = '<tr><td colspan="3">Failed to load sessions</td></tr>';
             return;
@@ -1001,7 +1029,7 @@ async function loadLeaderboard(trainerId) {
     container.innerHTML = '<p>Loading...</p>';
 
     try {
-        const response = await fetch(`/api/leaderboard/${trainerId}`);
+        const response = await apiFetch(`/api/leaderboard/${trainerId}`);
         const data = await response.json();
 
         container.innerHTML = '';
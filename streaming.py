@@ -0,0 +1,63 @@
+import mysql.connector
+from flask import Response, current_app, request
+from db import get_db_connection
+
+# Streams a query result to the client in batches instead of building the
+# whole row list and JSON string in memory. The response is a JSON array by
+# default, or newline-delimited JSON with ?format=ndjson or
+# "Accept: application/x-ndjson".
+
+STREAM_BATCH_SIZE = 500
+
+def wants_ndjson():
+    return (request.args.get("format") == "ndjson"
+            or request.accept_mimetypes.best == "application/x-ndjson")
+
+def stream_json(sql, params=(), drop=()):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    def close():
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            pass
+        conn.close()
+
+    try:
+        cursor.execute(sql, params)
+    except Exception:
+        close()
+        raise
+
+    dumps = current_app.json.dumps
+    ndjson = wants_ndjson()
+
+    def encode(rows):
+        for row in rows:
+            for column in drop:
+                del row[column]
+        return [dumps(row) for row in rows]
+
+    def generate():
+        try:
+            first = True
+            if not ndjson:
+                yield "["
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                if ndjson:
+                    yield "\n".join(encode(rows)) + "\n"
+                else:
+                    yield ("" if first else ",") + ",".join(encode(rows))
+                first = False
+            if not ndjson:
+                yield "]"
+        finally:
+            close()
+
+    response = Response(generate(), mimetype="application/x-ndjson" if ndjson else "application/json")
+    response.call_on_close(close)
+    return response
@@ -0,0 +1,139 @@
+import sys
+from db import connect_first
+from versions import GLOBAL_TAG, touch
+
+# Per-athlete exercise aggregates (last log, total volume, volume rank) kept
+# in AthleteExerciseSummary, and per-(athlete, session) adherence kept in
+# SessionAdherence, so the dashboard reads them by primary key. Writes to
+# PerformanceLog refresh the affected rows; "rebuild" recomputes everything.
+
+SUMMARY_COLUMNS = """
+    athlete_id, exercise_id, last_session_id, last_weight_used, last_completed_sets,
+    last_completed_reps, last_perceived_exertion, last_log_time, total_volume
+"""
+
+SUMMARY_SELECT = """
+    SELECT
+        athlete_id, exercise_id, session_id, weight_used, completed_sets,
+        completed_reps, perceived_exertion, log_time, total_volume
+    FROM (
+        SELECT
+            pl.*,
+            ROW_NUMBER() OVER (
+                PARTITION BY athlete_id, exercise_id
+                ORDER BY log_time DESC
+            ) AS rn,
+            ROUND(SUM(completed_sets * completed_reps * IFNULL(weight_used, 0)) OVER (
+                PARTITION BY athlete_id, exercise_id
+            ), 2) AS total_volume
+        FROM PerformanceLog pl
+        {where}
+    ) x
+    WHERE rn = 1
+"""
+
+RANK_UPDATE = """
+    UPDATE AthleteExerciseSummary s
+    JOIN (
+        SELECT
+            athlete_id,
+            exercise_id,
+            DENSE_RANK() OVER (
+                PARTITION BY athlete_id
+                ORDER BY total_volume DESC
+            ) AS rnk
+        FROM AthleteExerciseSummary
+        {where}
+    ) r ON r.athlete_id = s.athlete_id AND r.exercise_id = s.exercise_id
+    SET s.volume_rank = r.rnk
+"""
+
+def refresh_exercise_summary(cursor, pairs):
+    # pairs: (athlete_id, exercise_id) touched by a PerformanceLog write;
+    # three statements however many athletes and exercises were touched
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return
+    pair_marks = ", ".join(["(%s, %s)"] * len(pairs))
+    pair_params = [value for pair in pairs for value in pair]
+    athlete_ids = sorted({athlete_id for athlete_id, _ in pairs})
+    athlete_marks = ", ".join(["%s"] * len(athlete_ids))
+
+    cursor.execute(
+        f"DELETE FROM AthleteExerciseSummary WHERE (athlete_id, exercise_id) IN ({pair_marks})",
+        pair_params)
+    where = f"WHERE (pl.athlete_id, pl.exercise_id) IN ({pair_marks})"
+    cursor.execute(
+        f"INSERT INTO AthleteExerciseSummary ({SUMMARY_COLUMNS}) {SUMMARY_SELECT.format(where=where)}",
+        pair_params)
+    cursor.execute(RANK_UPDATE.format(where=f"WHERE athlete_id IN ({athlete_marks})"), athlete_ids)
+
+ADHERENCE_COLUMNS = """
+    athlete_id, session_id, program_id, session_date, completed_sets, planned_sets,
+    completed_reps, planned_reps, rpe_total, rpe_count, percentage_sets_done,
+    percentage_reps_done, average_rate_of_perceived_exertion
+"""
+
+# the sums are kept so adherence can be aggregated over athletes and programs
+ADHERENCE_SELECT = """
+    SELECT
+        pl.athlete_id,
+        pl.session_id,
+        ws.program_id,
+        ws.session_date,
+        SUM(pl.completed_sets),
+        SUM(se.planned_sets),
+        SUM(pl.completed_reps),
+        SUM(se.planned_reps),
+        SUM(pl.perceived_exertion),
+        COUNT(pl.perceived_exertion),
+        ROUND(100 * SUM(pl.completed_sets) / NULLIF(SUM(se.planned_sets), 0), 2),
+        ROUND(100 * SUM(pl.completed_reps) / NULLIF(SUM(se.planned_reps), 0), 2),
+        ROUND(AVG(pl.perceived_exertion), 2)
+    FROM PerformanceLog pl
+    JOIN SessionExercise se
+    ON se.session_id = pl.session_id AND se.exercise_id = pl.exercise_id
+    JOIN WorkoutSession ws
+    ON ws.session_id = pl.session_id
+    {where}
+    GROUP BY pl.athlete_id, pl.session_id, ws.program_id, ws.session_date
+"""
+
+def refresh_session_adherence(cursor, session_ids):
+    # session_ids: sessions whose logs or planned exercises changed
+    session_ids = sorted(set(session_ids))
+    if not session_ids:
+        return
+    marks = ", ".join(["%s"] * len(session_ids))
+    cursor.execute(f"DELETE FROM SessionAdherence WHERE session_id IN ({marks})", session_ids)
+    where = f"WHERE pl.session_id IN ({marks})"
+    cursor.execute(
+        f"INSERT INTO SessionAdherence ({ADHERENCE_COLUMNS}) {ADHERENCE_SELECT.format(where=where)}",
+        session_ids)
+
+@connect_first
+def rebuild_exercise_summary(cursor):
+    cursor.execute("DELETE FROM AthleteExerciseSummary")
+    cursor.execute(f"INSERT INTO AthleteExerciseSummary ({SUMMARY_COLUMNS}) {SUMMARY_SELECT.format(where='')}")
+    rows = cursor.rowcount
+    cursor.execute(RANK_UPDATE.format(where=""))
+    touch(cursor, GLOBAL_TAG)
+    return rows
+
+@connect_first
+def rebuild_session_adherence(cursor):
+    cursor.execute("DELETE FROM SessionAdherence")
+    cursor.execute(f"INSERT INTO SessionAdherence ({ADHERENCE_COLUMNS}) {ADHERENCE_SELECT.format(where='')}")
+    rows = cursor.rowcount
+    touch(cursor, GLOBAL_TAG)
+    return rows
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python summaries.py rebuild")
+        sys.exit(1)
+    print(f"Rebuilt AthleteExerciseSummary: {rebuild_exercise_summary()} rows")
+    print(f"Rebuilt SessionAdherence: {rebuild_session_adherence()} rows")
+    # the leaderboard is derived from SessionAdherence
+    from leaderboard import rebuild_leaderboard
+    print(f"Rebuilt ProgramLeaderboard: {rebuild_leaderboard()} rows")
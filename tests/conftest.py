@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules live in the repository root; tests never open a database
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GYM_TOKEN_KEYS", "test:test-secret")
@@ -0,0 +1,87 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from flask import Flask
+from bulk import BODY_MEASUREMENT_FIELDS, PERFORMANCE_LOG_FIELDS, RowError, insert_rows, parse_row, parse_rows
+
+app = Flask(__name__)
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+def columns(fields):
+    return [name for name, _, _ in fields]
+
+def test_partial_reupload_keeps_missing_fields():
+    cursor = RecordingCursor()
+    insert_rows(cursor, "BodyMeasurement", columns(BODY_MEASUREMENT_FIELDS),
+                [[7, "2024-01-01", None, "80.00", None, None, None]], 2)
+    [(sql, params)] = cursor.statements
+    insert, update = sql.split(" AS new ON DUPLICATE KEY UPDATE ")
+    assert insert.startswith("INSERT INTO BodyMeasurement (athlete_id, measurement_date, weight) VALUES")
+    assert update == "weight = new.weight"
+    assert params == [7, "2024-01-01", "80.00"]
+
+def test_rows_are_grouped_by_the_fields_they_give():
+    cursor = RecordingCursor()
+    full = [7, "2024-01-01", "180.00", "80.00", "15.00", "35.00", "24.70"]
+    partial = [8, "2024-01-01", None, "70.00", None, None, None]
+    later = [7, "2024-01-02"] + full[2:]
+    insert_rows(cursor, "BodyMeasurement", columns(BODY_MEASUREMENT_FIELDS), [full, partial, later], 2)
+    assert len(cursor.statements) == 2
+    (full_sql, full_params), (partial_sql, partial_params) = cursor.statements
+    assert "height = new.height" in full_sql and full_sql.count("(%s, %s, %s, %s, %s, %s, %s)") == 2
+    assert len(full_params) == 14
+    assert "height" not in partial_sql and partial_params == [8, "2024-01-01", "70.00"]
+
+def test_key_only_row_does_not_overwrite():
+    cursor = RecordingCursor()
+    insert_rows(cursor, "PerformanceLog", columns(PERFORMANCE_LOG_FIELDS),
+                [[1, 2, 3, None, None, None, None, None]], 3)
+    [(sql, params)] = cursor.statements
+    # log_time is left to its column default
+    assert "log_time" not in sql
+    assert sql.endswith("ON DUPLICATE KEY UPDATE athlete_id = new.athlete_id")
+    assert params == [1, 2, 3]
+
+def test_parse_row_converts_and_fills_missing_fields():
+    values = parse_row({"athlete_id": 7, "measurement_date": "2024-01-01", "weight": "80.126"}, BODY_MEASUREMENT_FIELDS)
+    assert values == [7, date(2024, 1, 1), None, Decimal("80.13"), None, None, None]
+
+@pytest.mark.parametrize("row, error", [
+    ([], "row must be an object"),
+    ({"athlete_id": 7, "measurement_date": "2024-01-01", "age": 3}, "unknown fields: age"),
+    ({"measurement_date": "2024-01-01"}, "athlete_id is required"),
+    ({"athlete_id": True, "measurement_date": "2024-01-01"}, "athlete_id must be an integer"),
+    ({"athlete_id": 0, "measurement_date": "2024-01-01"}, "athlete_id must be at least 1"),
+    ({"athlete_id": 7, "measurement_date": "01/01/2024"}, "measurement_date must be an ISO date"),
+    ({"athlete_id": 7, "measurement_date": "2024-01-01", "bmi": "1000"}, "bmi must be between 0 and 1000"),
+    ({"athlete_id": 7, "measurement_date": "2024-01-01", "bmi": "abc"}, "bmi must be a number"),
+])
+def test_parse_row_errors(row, error):
+    with pytest.raises(RowError, match=error):
+        parse_row(row, BODY_MEASUREMENT_FIELDS)
+
+def test_parse_rows_reports_bad_and_duplicate_rows_by_index():
+    body = [
+        {"athlete_id": 1, "session_id": 2, "exercise_id": 3, "perceived_exertion": 11},
+        {"athlete_id": 1, "session_id": 2, "exercise_id": 3},
+        {"athlete_id": 1, "session_id": 2, "exercise_id": 3, "completed_sets": 4},
+    ]
+    with app.test_request_context(json=body):
+        rows, errors = parse_rows(PERFORMANCE_LOG_FIELDS, 3)
+    assert [index for index, _ in rows] == [1]
+    assert errors == [
+        {"index": 0, "error": "perceived_exertion must be between 1 and 10"},
+        {"index": 2, "error": "duplicate of row 1"},
+    ]
+
+@pytest.mark.parametrize("body", [{}, [], "rows"])
+def test_parse_rows_needs_a_non_empty_array(body):
+    with app.test_request_context(json=body):
+        with pytest.raises(RowError):
+            parse_rows(PERFORMANCE_LOG_FIELDS, 3)
@@ -0,0 +1,31 @@
+from cache import MemoryBackend, invalidate_on_commit, backend
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = MemoryBackend()
+    cache.set("a", b"1", ["athlete:1", "cohorts"], 60)
+    cache.set("b", b"2", ["athlete:2"], 60)
+    cache.invalidate(["cohorts"])
+    assert cache.get("a") is None
+    assert cache.get("b") == b"2"
+    # the tag index no longer points at the dropped entry
+    assert "cohorts" not in cache._tags and "athlete:1" not in cache._tags
+
+def test_entries_expire():
+    cache = MemoryBackend()
+    cache.set("a", b"1", [], -1)
+    assert cache.get("a") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoryBackend(max_entries=2)
+    cache.set("a", b"1", ["t"], 60)
+    cache.set("b", b"2", ["t"], 60)
+    cache.get("a")
+    cache.set("c", b"3", ["t"], 60)
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+    assert cache._tags["t"] == {"a", "c"}
+
+def test_invalidate_on_commit_outside_a_transaction_runs_at_once():
+    backend.set("k", b"1", ["cohorts"], 60)
+    invalidate_on_commit("cohorts")
+    assert backend.get("k") is None
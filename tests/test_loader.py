@@ -0,0 +1,29 @@
+from loader import TABLES, deferrable_indexes
+
+class SchemaCursor:
+    # answers the two information_schema queries of deferrable_indexes
+    def __init__(self, statistics, foreign_keys):
+        self.statistics = statistics
+        self.foreign_keys = foreign_keys
+        self.last = ""
+
+    def execute(self, sql, params=None):
+        self.last = sql
+
+    def fetchall(self):
+        return self.statistics if "STATISTICS" in self.last else self.foreign_keys
+
+def index(table, name, column, unique=False):
+    return {"TABLE_NAME": table, "INDEX_NAME": name, "NON_UNIQUE": 0 if unique else 1,
+            "COLUMN_NAME": column, "SUB_PART": None}
+
+def test_lowercase_table_names_are_deferred():
+    # lower_case_table_names=1 reports "performancelog" for PerformanceLog
+    cursor = SchemaCursor(
+        [index("performancelog", "PRIMARY", "athlete_id", unique=True),
+         index("performancelog", "idx_log_session", "session_id"),
+         index("performancelog", "idx_log_time", "log_time")],
+        [{"TABLE_NAME": "performancelog", "CONSTRAINT_NAME": "fk_log_session", "COLUMN_NAME": "session_id"}])
+    deferred = deferrable_indexes(cursor, {table for table, *_ in TABLES})
+    # the foreign key keeps the only index covering it
+    assert deferred == {"performancelog": [("idx_log_time", ["`log_time`"])]}
@@ -0,0 +1,30 @@
+import base64
+import pytest
+from pagination import PageError, decode_cursor, encode_cursor, keyset_sql
+
+def raw_cursor(text):
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(["2024-01-02", 17]), 2) == ["2024-01-02", 17]
+
+@pytest.mark.parametrize("token", [
+    "%%%",
+    raw_cursor("not json"),
+    raw_cursor('{"a": 1}'),
+    raw_cursor("[1]"),
+    raw_cursor("[1, 2, 3]"),
+    raw_cursor('[{"a": 1}, 2]'),
+    raw_cursor("[[1], 2]"),
+    raw_cursor("[null, 2]"),
+    raw_cursor("[true, 2]"),
+])
+def test_invalid_cursors_are_rejected(token):
+    with pytest.raises(PageError):
+        decode_cursor(token, 2)
+
+def test_keyset_sql_continues_after_the_cursor():
+    sql, params = keyset_sql("SELECT * FROM t", [("d", "DESC"), ("id", "ASC")], ["name"], ["2024-01-02", 17], 10)
+    assert sql == ("SELECT `name`, `d`, `id` FROM (SELECT * FROM t) page "
+                   "WHERE (`d` < %s) OR (`d` = %s AND `id` > %s) ORDER BY `d` DESC, `id` ASC LIMIT 11")
+    assert params == ["2024-01-02", "2024-01-02", 17]
@@ -0,0 +1,26 @@
+from profiling import Counter, fingerprint
+
+def test_fingerprint_replaces_literals_and_placeholders():
+    assert fingerprint("SELECT * FROM t  WHERE a = 12 AND b = 'x''y' AND c = %s;") == \
+        "SELECT * FROM t WHERE a = ? AND b = ? AND c = ?"
+
+def test_fingerprint_collapses_lists_of_any_length():
+    assert fingerprint("SELECT * FROM t WHERE id IN (%s, %s)") == fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3)")
+    assert fingerprint("DELETE FROM t WHERE (a, b) IN ((%s, %s))") == \
+        fingerprint("DELETE FROM t WHERE (a, b) IN ((%s, %s), (%s, %s), (%s, %s))")
+    assert fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == \
+        fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)")
+
+def test_counter_keeps_every_digit():
+    counter = Counter("gym_test_total", "Test")
+    counter.inc(("a",), 1234567)
+    counter.inc(("b",), 1.5)
+    counter.inc(("b",), 1.5)
+    counter.inc(("c",), 12345678.25)
+    assert counter.render(["label"]) == [
+        "# HELP gym_test_total Test",
+        "# TYPE gym_test_total counter",
+        'gym_test_total{label="a"} 1234567',
+        'gym_test_total{label="b"} 3',
+        'gym_test_total{label="c"} 12345678.25',
+    ]
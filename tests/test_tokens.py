@@ -0,0 +1,56 @@
+import time
+import pytest
+import tokens
+from tokens import TokenError, b64encode, check_access, issue_token, verify_token
+
+def bearer(token):
+    return f"Bearer {token}"
+
+def test_issued_token_verifies():
+    assert verify_token(issue_token(7, "athlete")) == {"user_id": 7, "role": "athlete"}
+
+def test_tampered_token_is_rejected():
+    kid, payload, signature = issue_token(7, "athlete").split(".")
+    forged = b64encode(b'{"sub":8,"role":"trainer","exp":9999999999}')
+    with pytest.raises(TokenError):
+        verify_token(f"{kid}.{forged}.{signature}")
+    with pytest.raises(TokenError):
+        verify_token("not-a-token")
+
+def test_unknown_key_is_rejected():
+    _, payload, signature = issue_token(7, "athlete").split(".")
+    with pytest.raises(TokenError):
+        verify_token(f"old.{payload}.{signature}")
+
+def test_expired_token_is_rejected_even_when_cached():
+    token = issue_token(7, "athlete", ttl=60)
+    verify_token(token)
+    assert token in tokens._verified
+    real_time = time.time
+    try:
+        tokens.time.time = lambda: real_time() + 120
+        with pytest.raises(TokenError, match="expired"):
+            verify_token(token)
+    finally:
+        tokens.time.time = real_time
+
+def test_check_access_needs_a_bearer_token():
+    assert check_access(None, (), None, {}) == (None, (401, "Missing session token"))
+    assert check_access("Basic abc", (), None, {})[1][0] == 401
+    assert check_access(bearer("x.y.z"), (), None, {})[1][0] == 401
+
+def test_check_access_roles():
+    token = bearer(issue_token(7, "athlete"))
+    assert check_access(token, ("trainer",), None, {}) == (None, (403, "Not allowed for this role"))
+    identity, error = check_access(token, ("athlete", "trainer"), None, {})
+    assert error is None and identity == {"user_id": 7, "role": "athlete"}
+
+def test_check_access_owns_scopes_the_named_role_only():
+    athlete = bearer(issue_token(7, "athlete"))
+    trainer = bearer(issue_token(9, "trainer"))
+    roles = ("athlete", "trainer")
+    assert check_access(athlete, roles, "athlete_id", {"athlete_id": 7})[1] is None
+    assert check_access(athlete, roles, "athlete_id", {"athlete_id": 8}) == (None, (403, "Not allowed for this user"))
+    # staff read any athlete
+    assert check_access(trainer, roles, "athlete_id", {"athlete_id": 8})[1] is None
+    assert check_access(trainer, ("trainer",), "trainer_id", {"trainer_id": 10})[1][0] == 403
@@ -0,0 +1,141 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import g, jsonify, request
+
+# Signed, stateless session tokens. /login hands out a token carrying the
+# user id and the role resolved at login; routes decorated with requires()
+# check the "Authorization: Bearer <token>" header against it without a
+# database lookup. A token is "<key id>.<payload>.<signature>" signed with
+# HMAC-SHA256, and verified tokens are kept in a small LRU so repeat calls
+# skip the HMAC and JSON work (expiry is still checked every time).
+#
+# Keys come from GYM_TOKEN_KEYS ("id:secret,id:secret") or else from
+# token_keys.txt (one "id secret" per line, created on first use). The
+# first key signs new tokens, all of them verify. To rotate, put a new key
+# first, restart, and drop the old one once GYM_TOKEN_TTL has passed.
+
+TOKEN_TTL = int(os.environ.get("GYM_TOKEN_TTL", 12 * 3600))  # seconds
+TOKEN_CACHE_SIZE = int(os.environ.get("GYM_TOKEN_CACHE_SIZE", 4096))
+TOKEN_KEYS_FILE = "token_keys.txt"
+
+class TokenError(Exception):
+    pass
+
+def read_keys():
+    configured = os.environ.get("GYM_TOKEN_KEYS")
+    if configured:
+        pairs = [item.split(":", 1) for item in configured.split(",") if item.strip()]
+    else:
+        try:
+            # O_EXCL so that concurrent workers agree on a single first key
+            fd = os.open(TOKEN_KEYS_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{secrets.token_hex(4)} {secrets.token_urlsafe(32)}\n")
+        except FileExistsError:
+            pass
+        with open(TOKEN_KEYS_FILE, "r") as f:
+            pairs = [line.split(None, 1) for line in f if line.strip()]
+    keys = [(kid.strip(), secret.strip().encode("utf-8")) for kid, secret in pairs]
+    if not keys:
+        raise RuntimeError("No session token keys configured")
+    return keys
+
+_keys = None
+_keys_lock = threading.Lock()
+
+def get_keys():
+    global _keys
+    if _keys is None:
+        with _keys_lock:
+            if _keys is None:
+                _keys = read_keys()
+    return _keys
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def sign(secret, message):
+    return b64encode(hmac.new(secret, message.encode("ascii"), hashlib.sha256).digest())
+
+def issue_token(user_id, role, ttl=TOKEN_TTL):
+    kid, secret = get_keys()[0]
+    claims = {"sub": user_id, "role": role, "exp": int(time.time()) + ttl}
+    message = f"{kid}.{b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))}"
+    return f"{message}.{sign(secret, message)}"
+
+# token -> claims of tokens whose signature has been checked
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+
+def verify_token(token):
+    with _verified_lock:
+        claims = _verified.get(token)
+        if claims is not None:
+            _verified.move_to_end(token)
+    if claims is None:
+        try:
+            kid, payload, signature = token.split(".")
+        except ValueError:
+            raise TokenError("Malformed session token")
+        secret = dict(get_keys()).get(kid)
+        if secret is None or not hmac.compare_digest(sign(secret, f"{kid}.{payload}"), signature):
+            raise TokenError("Invalid session token")
+        claims = json.loads(b64decode(payload))
+        with _verified_lock:
+            _verified[token] = claims
+            if len(_verified) > TOKEN_CACHE_SIZE:
+                _verified.popitem(last=False)
+    if claims["exp"] < time.time():
+        raise TokenError("Session token expired")
+    return {"user_id": claims["sub"], "role": claims["role"]}
+
+def check_access(authorization, roles, owns, args):
+    # returns (identity, None) or (None, (status, message)); owns names a URL
+    # argument ("athlete_id", "trainer_id") that callers of that role may
+    # only set to their own user id. Other roles allowed on the route are not
+    # scoped: trainers and medical staff, as gym staff, read the data of any
+    # athlete (writes check program ownership in the routes)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None, (401, "Missing session token")
+    try:
+        identity = verify_token(token.strip())
+    except TokenError as e:
+        return None, (401, str(e))
+    if roles and identity["role"] not in roles:
+        return None, (403, "Not allowed for this role")
+    if owns and identity["role"] == owns.split("_")[0] and args.get(owns) != identity["user_id"]:
+        return None, (403, "Not allowed for this user")
+    return identity, None
+
+def requires(*roles, owns=None):
+    # no roles: any logged-in user
+    def decorator(fun):
+        @wraps(fun)
+        def wrapper(*args, **kwargs):
+            identity, error = check_access(request.headers.get("Authorization"), roles, owns, kwargs)
+            if error:
+                status, message = error
+                headers = {"WWW-Authenticate": "Bearer"} if status == 401 else {}
+                return jsonify({"error": message}), status, headers
+            g.identity = identity
+            return fun(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_user_id():
+    return g.identity["user_id"]
+
+def current_role():
+    return g.identity["role"]
@@ -0,0 +1,74 @@
+import hashlib
+from functools import wraps
+from flask import Response, g, request, make_response
+from db import connect_first, on_commit
+from cache import backend, request_key, invalidate_on_commit
+
+# Per-entity version counters (EntityVersion table) used to build ETags.
+# Write routes bump the tags they affect inside their transaction; GET
+# routes compare If-None-Match against the current versions and answer
+# 304 without running their query. The "*" row is bumped by bulk loads and
+# rebuilds and is part of every ETag. The ETag is also part of the response
+# cache key, so a cached body always belongs to the versions it was read
+# after, even if a write commits between the version read and the body.
+
+GLOBAL_TAG = "*"
+
+def bump_versions(cursor, tags):
+    # one statement for all tags, rows in sorted order so concurrent writers lock them alike
+    tags = sorted(set(tags))
+    if not tags:
+        return
+    cursor.execute(f"""
+        INSERT INTO EntityVersion (entity, version) VALUES {", ".join(["(%s, UUID_SHORT())"] * len(tags))}
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, tags)
+
+def touch(cursor, *tags):
+    # record a write: new ETags for the tags and drop their cached responses
+    bump_versions(cursor, tags)
+    if GLOBAL_TAG in tags:
+        on_commit(backend.clear)
+    else:
+        invalidate_on_commit(*tags)
+
+def versions_query(tags):
+    # (sql, tags) reading the versions of tags and of the global tag
+    tags = sorted(set(tags) | {GLOBAL_TAG})
+    marks = ", ".join(["%s"] * len(tags))
+    return f"SELECT entity, version FROM EntityVersion WHERE entity IN ({marks})", tags
+
+def make_etag(key, tags, rows):
+    # also used by the async read path of asgi.py
+    found = {row["entity"]: row["version"] for row in rows}
+    raw = key + "|" + ",".join(f"{t}={found.get(t, 0)}" for t in tags)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+@connect_first
+def get_versions(cursor, sql, tags):
+    cursor.execute(sql, tags)
+    return cursor.fetchall()
+
+def current_etag(tags):
+    sql, tags = versions_query(tags)
+    return make_etag(request_key(), tags, get_versions(sql, tags))
+
+def conditional(tags):
+    # tags: function of the route's URL arguments returning the entity tags
+    def decorator(fun):
+        @wraps(fun)
+        def wrapper(*args, **kwargs):
+            etag = current_etag(tags(**kwargs))
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            g.etag = etag  # part of the cache key, see cache.cache_key
+            response = make_response(fun(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        wrapper.version_tags = tags  # read by asgi.py
+        return wrapper
+    return decorator